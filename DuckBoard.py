@@ -1,9 +1,12 @@
 import streamlit as st
 from helpers import data_loading as dl
-# from helpers.st_dev import developer_sidebar
+from helpers.shadow_parquet import shadow_enabled_by_default
+from helpers.catalog_store import CatalogStore
+from helpers import profiler
+from helpers.st_dev import developer_sidebar, record_rerun, DEVELOPER_SIDEBAR
 
 st.set_page_config(page_title="Duckboard", page_icon="assets/duckboard.ico.png", layout="centered")
-CACHE_FILE = "file_cache.json"
+profile = profiler.start_rerun()
 
 def main_page():
     st.title("🦆 Duckboard")
@@ -39,7 +42,8 @@ def main_page():
             ```sql
             SELECT * FROM {{sales_data}} JOIN {{customers}} USING (customer_id)
             ```
-        - Saved queries are automatically wrapped in parentheses if needed.
+        - Saved queries can use `{{alias}}` too, including other saved queries.
+        - Each saved query is compiled once into a named CTE, however often it is used.
         """)
 
     with st.expander("📁 Supported File Types"):
@@ -49,21 +53,22 @@ def main_page():
 
     
 if cache_loaded := st.session_state.get("cache_loaded", False) is False:
-    cache = dl.load_cache(cache_file="file_cache.json")
-
-    st.session_state["saved_queries"] = dl.load_queries_from_cache("query_cache.json")
-    st.session_state["tables"] = cache["tables"]
-    st.session_state["pending_parquet_partitions"] = []
-    st.session_state["pending_files"] = []
-    st.session_state["available_files"] = []
-    st.session_state['uploaded_files'] = [] 
-
-    st.session_state["session_files"] = []    
-    st.session_state["loaded_file_dfs"] = []
-
-    st.session_state['validated'] = False
-    st.session_state['debug_mode'] = False
-    st.session_state["cache_loaded"] = True  # Ensure cache is only loaded once
+    with profiler.stage("load caches"):
+        st.session_state["saved_queries"] = dl.load_queries_from_cache("query_cache.json")
+        st.session_state["materialized_queries"] = dl.load_queries_from_cache("materialized_queries.json")
+        st.session_state["tables"] = CatalogStore().load()
+        st.session_state["pending_parquet_partitions"] = []
+        st.session_state["pending_files"] = []
+        st.session_state["available_files"] = []
+        st.session_state['uploaded_files'] = [] 
+
+        st.session_state["session_files"] = []    
+        st.session_state["loaded_file_dfs"] = []
+
+        st.session_state['validated'] = False
+        st.session_state['debug_mode'] = False
+        st.session_state["shadow_parquet"] = shadow_enabled_by_default()
+        st.session_state["cache_loaded"] = True  # Ensure cache is only loaded once
 
 # with st.sidebar:
 
@@ -79,5 +84,13 @@ pg = st.navigation([
     st.Page("pages/2_Query Data.py", icon="📊"),
     st.Page("pages/3_Custom Scripts.py", icon="🧩"),
 ])
-pg.run()
+profile.page = pg.title
+try:
+    with profiler.stage("page"):
+        pg.run()
+finally:
+    # st.rerun() and st.switch_page() leave the page early; the rerun is still recorded
+    record_rerun(profiler.finish_rerun())
+if DEVELOPER_SIDEBAR:
+    developer_sidebar()
 
@@ -0,0 +1,237 @@
+import duckdb
+import pyarrow as pa
+import json
+import threading
+import time
+from helpers import data_loading as dl
+from helpers.workbook import LazySheet
+from helpers.memory_manager import SpilledTable
+from helpers.workspace import WORKSPACE_LOCATION
+
+CATALOG_TABLE = "_duckboard_catalog"
+
+
+def entry_fingerprint(file_info: dict):
+    """
+    Fingerprint what a catalog entry registers in DuckDB.
+
+    File-backed entries are identified by their reference, in-memory tables by the hash of
+    the upload they were parsed from and their file name, which tells the sheets of a
+    workbook apart. A re-upload of the same content keeps its registration, and the key
+    stays valid in process-wide caches after the table object is gone. Tables imported
+    into the workspace already live in the database and need no registration.
+    """
+    if file_info.get("Location") == WORKSPACE_LOCATION:
+        return ("table", file_info["Alias"])
+    data = file_info.get("df")
+    if file_info["Reference"] == file_info["Alias"] and isinstance(data, SpilledTable):
+        return ("spilled", data.path)
+    if file_info["Reference"] == file_info["Alias"] and isinstance(data, (pa.Table, LazySheet)):
+        return ("arrow", file_info.get("File Hash") or id(data), file_info.get("File Name") or "")
+    return ("view", file_info["Reference"])
+
+
+class SharedViews:
+    """
+    Views of the cached tables in the workspace's main schema, shared by every session.
+
+    The cached catalog is the same for everyone, so each of its views is created once per
+    database rather than once per session. Views persist in a file-backed workspace, so
+    their fingerprints are kept in CATALOG_TABLE next to them and a restart against the
+    same workspace starts with nothing to apply.
+
+    The views follow the process-wide CatalogStore, not any one session's copy of it:
+    refresh() reloads the store when its file changed and syncs the views to it, so a
+    session holding a stale table list can neither drop nor replace a shared view.
+    """
+
+    def __init__(self, con, store=None):
+        self.con = con
+        self.store = store
+        self.applied = {}  # alias -> fingerprint of the view in the main schema
+        self.errors = {}  # alias -> (fingerprint, error message) of failed registrations
+        self.wanted = {}  # alias -> fingerprint of every cataloged table
+        self._version = None  # version of the store the views were last synced to
+        self._lock = threading.RLock()
+        self.con.execute(f"CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} (alias VARCHAR PRIMARY KEY, fingerprint VARCHAR)")
+        for alias, fingerprint in self.con.execute(f"SELECT alias, fingerprint FROM {CATALOG_TABLE}").fetchall():
+            self.applied[alias] = tuple(json.loads(fingerprint))
+
+    def refresh(self):
+        """Sync the views to the store if it changed since the last refresh; returns (created, dropped)."""
+        if self.store is None:
+            return 0, 0
+        version = self.store.version()
+        with self._lock:
+            if version is not None and version == self._version:
+                return 0, 0
+            # read after the version, so a save in between is picked up by the next refresh
+            entries = self.store.load()
+            self._version = version
+            return self.sync({
+                file_info["Alias"]: (entry_fingerprint(file_info), file_info)
+                for file_info in entries if file_info.get("Alias") and file_info.get("Reference")
+            })
+
+    def fingerprints(self) -> dict:
+        """alias -> fingerprint of every cataloged table, whether or not its view could be created."""
+        with self._lock:
+            return dict(self.wanted)
+
+    def sync(self, wanted: dict):
+        """Make the views equal to {alias: (fingerprint, file_info)}, applying only changes; returns (created, dropped)."""
+        created = dropped = 0
+        with self._lock:
+            self.wanted = {alias: fingerprint for alias, (fingerprint, _) in wanted.items()}
+            for alias in [a for a in self.applied if a not in wanted]:
+                self._drop(alias)
+                dropped += 1
+            self.errors = {a: e for a, e in self.errors.items() if a in wanted}
+            for alias, (fingerprint, file_info) in wanted.items():
+                if self.applied.get(alias) == fingerprint:
+                    continue
+                if alias in self.errors and self.errors[alias][0] == fingerprint:
+                    # do not retry a failing reference until it changes
+                    continue
+                if alias in self.applied and fingerprint[0] != "view":
+                    # a view is replaced in place, so queries never find it missing
+                    self._drop(alias)
+                try:
+                    if fingerprint[0] == "table":
+                        self.con.execute(f"SELECT 1 FROM {alias} LIMIT 0")
+                    else:
+                        self.con.execute(f"CREATE OR REPLACE VIEW {alias} AS SELECT * FROM {file_info['Reference']};")
+                except Exception as e:
+                    self.errors[alias] = (fingerprint, str(e))
+                    continue
+                self.errors.pop(alias, None)
+                self.applied[alias] = fingerprint
+                self.con.execute(f"INSERT OR REPLACE INTO {CATALOG_TABLE} VALUES (?, ?)", [alias, json.dumps(fingerprint)])
+                created += 1
+        return created, dropped
+
+    def _drop(self, alias):
+        fingerprint = self.applied.pop(alias)
+        self.con.execute(f"DELETE FROM {CATALOG_TABLE} WHERE alias = ?", [alias])
+        if fingerprint[0] == "view":
+            self.con.execute(f"DROP VIEW IF EXISTS {alias};")
+
+
+class ViewCatalog:
+    """
+    Tracks which aliases a session has registered in DuckDB and applies only changes.
+
+    sync() fingerprints every (Alias, Reference) entry, creates new or changed views,
+    drops removed ones and leaves everything else untouched, so a rerun with an unchanged
+    file list issues no statements at all.
+
+    Entries whose fingerprint matches a view in SharedViews are served by it. Everything
+    else the session sees goes to its private schema, which cursors search before the main
+    schema: uploads, and cached tables this session reads through another reference or that
+    have left the shared catalog. In-memory tables are registered on each of the session's
+    cursors.
+    """
+
+    def __init__(self, con=None, schema=None, shared=None):
+        self.con = con or duckdb.default_connection()
+        self.schema = schema
+        self.shared = shared
+        self.applied = {}  # alias -> fingerprint registered privately for this session
+        self.arrow_tables = {}  # alias -> Arrow table registered on the connection
+        self.errors = {}  # alias -> (fingerprint, error message) of failed registrations
+        self.last_sync = {"seconds": 0.0, "created": 0, "dropped": 0, "unchanged": 0}
+        self._set_search_path(self.con)
+
+    def _set_search_path(self, con):
+        if self.schema:
+            con.execute(f"SET search_path = '{self.schema},main'")
+
+    def _qualified(self, alias):
+        return f'"{self.schema}".{alias}' if self.schema else alias
+
+    def sync(self, available_files):
+        con = self.con
+        start = time.perf_counter()
+        shared_created = shared_dropped = 0
+        shared = {}
+        if self.shared is not None:
+            shared_created, shared_dropped = self.shared.refresh()
+            shared = self.shared.fingerprints()
+        wanted = {}
+        covered = set()  # aliases the shared views already serve as this session sees them
+        for file_info in available_files:
+            alias = file_info.get("Alias")
+            reference = file_info.get("Reference")
+            if alias and reference:
+                fingerprint = entry_fingerprint(file_info)
+                if shared.get(alias) == fingerprint:
+                    covered.add(alias)
+                else:
+                    wanted[alias] = (fingerprint, file_info)
+
+        dropped = 0
+        for alias in [a for a in self.applied if a not in wanted]:
+            self._drop(con, alias)
+            dropped += 1
+        self.errors = {a: e for a, e in self.errors.items() if a in wanted}
+
+        created = 0
+        for alias, (fingerprint, file_info) in wanted.items():
+            if self.applied.get(alias) == fingerprint:
+                continue
+            if alias in self.errors and self.errors[alias][0] == fingerprint:
+                # do not retry a failing reference until it changes
+                continue
+            if alias in self.applied:
+                self._drop(con, alias)
+            try:
+                self._register(con, alias, fingerprint, file_info)
+            except Exception as e:
+                self.errors[alias] = (fingerprint, str(e))
+                continue
+            self.errors.pop(alias, None)
+            self.applied[alias] = fingerprint
+            created += 1
+
+        if self.shared is not None:
+            self.errors.update({a: e for a, e in self.shared.errors.items() if a in covered})
+        self.last_sync = {
+            "seconds": time.perf_counter() - start,
+            "created": created + shared_created,
+            "dropped": dropped + shared_dropped,
+            "unchanged": max(0, len(wanted) + len(covered) - created - shared_created - len(self.errors)),
+        }
+        return self.last_sync
+
+    def cursor(self):
+        """
+        Open a cursor on the catalog's database that resolves aliases like the session does.
+
+        Registered Arrow tables and the search path are local to a connection, so both are
+        set again (the tables by reference, without a copy) on every cursor.
+        """
+        cursor = self.con.cursor()
+        self._set_search_path(cursor)
+        for alias, table in self.arrow_tables.items():
+            cursor.register(alias, table)
+        return cursor
+
+    def _register(self, con, alias, fingerprint, file_info):
+        if fingerprint[0] == "arrow":
+            # in-memory tables are scanned by reference, DuckDB does not copy them
+            self.arrow_tables[alias] = dl.as_arrow(file_info["df"])
+            con.register(alias, self.arrow_tables[alias])
+        elif fingerprint[0] == "table":
+            con.execute(f"SELECT 1 FROM {alias} LIMIT 0")
+        else:
+            # tables spilled out of memory are read back through a view over their Parquet file
+            reference = file_info["df"].reference() if fingerprint[0] == "spilled" else file_info["Reference"]
+            con.sql(f"CREATE OR REPLACE VIEW {self._qualified(alias)} AS SELECT * FROM {reference};")
+
+    def _drop(self, con, alias):
+        fingerprint = self.applied.pop(alias)
+        if fingerprint[0] == "arrow":
+            self.arrow_tables.pop(alias, None)
+            con.unregister(alias)
+        elif fingerprint[0] in ("view", "spilled"):
+            con.sql(f"DROP VIEW IF EXISTS {self._qualified(alias)};")
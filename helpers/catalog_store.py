@@ -0,0 +1,139 @@
+from pathlib import Path
+import contextlib
+import json
+import math
+import os
+import sqlite3
+
+CATALOG_DB = "catalog.sqlite"
+LEGACY_CACHE_FILE = "file_cache.json"
+
+# catalog field -> (column, SQLite type); every other field except the data itself goes to extra
+COLUMNS = {
+    "File Name": ("file_name", "TEXT"),
+    "File Hash": ("file_hash", "TEXT"),
+    "File Size": ("file_size", "INTEGER"),
+    "File Type": ("file_type", "TEXT"),
+    "Encoding": ("encoding", "TEXT"),
+    "Type": ("type", "TEXT"),
+    "Location": ("location", "TEXT"),
+    "Validation": ("validation", "TEXT"),
+    "Path": ("path", "TEXT"),
+    "Alias": ("alias", "TEXT"),
+    "Reference": ("reference", "TEXT"),
+}
+# table data never goes into the catalog, nor does the spill bookkeeping's per-session last use
+NOT_STORED = ("df", "Last Used")
+LEGACY_IMPORTED = "legacy_imported"
+
+
+def _clean(value, sql_type):
+    """Coerce a field from a record, a pandas row or the legacy all-string cache to its column type; empty is NULL."""
+    if value is None or (isinstance(value, float) and math.isnan(value)) or (isinstance(value, str) and not value):
+        return None
+    if hasattr(value, "item"):  # numpy scalars
+        value = value.item()
+    if sql_type == "INTEGER":
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+    return str(value)
+
+def entry_key(entry: dict) -> str:
+    """Rows are identified by file hash and name, since the sheets of a workbook share a hash."""
+    return json.dumps([str(entry.get("File Hash") or ""), str(entry.get("File Name") or entry.get("Path") or "")])
+
+
+class CatalogStore:
+    """
+    The cached tables and files tracked across sessions, one SQLite row per entry.
+
+    save() compares the given entries with the stored rows and, in the same transaction,
+    upserts only the new or changed ones and deletes the rows left out. Entries keep the
+    order they were first saved in. SQLite's journal makes every save all-or-nothing, so a
+    crash mid-write leaves the previous catalog intact. Entries written by the old
+    file_cache.json format are imported the first time the store is opened; a meta row
+    records that, so a catalog emptied later is not filled from the old file again.
+    """
+
+    def __init__(self, path=CATALOG_DB, legacy_file=LEGACY_CACHE_FILE):
+        self.path = Path(path)
+        column_defs = ", ".join(f"{column} {sql_type}" for column, sql_type in COLUMNS.values())
+        with self._connect() as con:
+            con.execute(f"CREATE TABLE IF NOT EXISTS catalog (key TEXT PRIMARY KEY, {column_defs}, extra TEXT)")
+            con.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            imported = con.execute("SELECT 1 FROM meta WHERE name = ?", [LEGACY_IMPORTED]).fetchone() is not None
+            # a catalog written before the meta row existed has had its import already
+            empty = con.execute("SELECT count(*) FROM catalog").fetchone()[0] == 0
+        if imported:
+            return
+        if empty and legacy_file and Path(legacy_file).exists():
+            with open(legacy_file, "r") as f:
+                legacy = json.load(f).get("tables", [])
+            # the old format stringified every value, missing ones included
+            self.save([{k: None if v in ("nan", "None") else v for k, v in entry.items()} for entry in legacy])
+        with self._connect() as con:
+            con.execute("INSERT OR IGNORE INTO meta VALUES (?, ?)", [LEGACY_IMPORTED, str(legacy_file)])
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # a connection per call, as Streamlit reruns may come from any thread
+        con = sqlite3.connect(self.path)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def _row(entry: dict) -> tuple:
+        values = [_clean(entry.get(field), sql_type) for field, (_, sql_type) in COLUMNS.items()]
+        extra = {
+            field: value for field, value in entry.items()
+            if field not in COLUMNS and field not in NOT_STORED and _clean(value, "TEXT") is not None
+        }
+        return (entry_key(entry), *values, json.dumps(extra, sort_keys=True, default=str))
+
+    def version(self):
+        """(mtime, size) of the catalog file; it changes with every save that writes a row."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self) -> list:
+        """Every stored entry as a catalog record, in the order it was first saved."""
+        with self._connect() as con:
+            rows = con.execute(f"SELECT {', '.join(c for c, _ in COLUMNS.values())}, extra FROM catalog ORDER BY rowid").fetchall()
+        entries = []
+        for row in rows:
+            entry = {field: "" if value is None else value for field, value in zip(COLUMNS, row)}
+            entry.update(json.loads(row[-1]))
+            entry["df"] = ""
+            entries.append(entry)
+        return entries
+
+    def save(self, entries) -> int:
+        """Make the stored catalog equal to entries, writing only changed rows. Returns the rows written."""
+        rows = {}
+        for entry in entries:
+            row = self._row(entry)
+            rows[row[0]] = row
+        columns = ["key", *(column for column, _ in COLUMNS.values()), "extra"]
+        placeholders = ", ".join("?" * len(columns))
+        assignments = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+        with self._connect() as con:
+            # the stored rows are read and written under one write lock, so no other save interleaves
+            con.execute("BEGIN IMMEDIATE")
+            stored = {row[0]: row for row in con.execute(f"SELECT {', '.join(columns)} FROM catalog")}
+            deleted = [(key,) for key in stored if key not in rows]
+            changed = [row for key, row in rows.items() if stored.get(key) != row]
+            con.executemany("DELETE FROM catalog WHERE key = ?", deleted)
+            # updating in place keeps the rowid, and with it the entry's position
+            con.executemany(
+                f"INSERT INTO catalog ({', '.join(columns)}) VALUES ({placeholders}) "
+                f"ON CONFLICT (key) DO UPDATE SET {assignments}",
+                changed)
+            return len(deleted) + len(changed)
@@ -0,0 +1,105 @@
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import contextlib
+import time
+from helpers import data_loading as dl
+from helpers.query_runner import THREADS_AVAILABLE
+from helpers.sql_templates import expand_sql_query, saved_query_order
+
+DASHBOARD_WORKERS = 4
+SHARED_PREFIX = "_dashboard_"
+
+
+def shared_dependencies(names, saved_queries: dict) -> list:
+    """Saved queries that more than one of names would compute, in dependency order."""
+    counts = {}
+    orderable = []
+    for name in names:
+        try:
+            dependencies = saved_query_order([name], saved_queries)
+        except ValueError:
+            continue  # a reference cycle, reported by the query itself when it runs
+        orderable.append(name)
+        for dependency in dependencies:
+            counts[dependency] = counts.get(dependency, 0) + 1
+    return [name for name in saved_query_order(orderable, saved_queries) if counts[name] > 1]
+
+def dependency_levels(names, saved_queries: dict) -> list:
+    """Group names into levels that only depend on names in earlier levels."""
+    level_of = {}
+    for name in saved_query_order(names, saved_queries):
+        if name in names:
+            deps = [d for d in saved_query_order([name], saved_queries) if d in names and d != name]
+            level_of[name] = 1 + max((level_of[d] for d in deps), default=-1)
+    levels = [[] for _ in range(max(level_of.values(), default=-1) + 1)]
+    for name, level in level_of.items():
+        levels[level].append(name)
+    return levels
+
+def _run(cursor, sql: str):
+    start = time.perf_counter()
+    try:
+        cursor.execute(sql)
+        return dl.to_arrow_table(cursor), None, time.perf_counter() - start
+    except Exception as e:
+        return None, str(e), time.perf_counter() - start
+    finally:
+        cursor.close()
+
+def _finished(result) -> Future:
+    future = Future()
+    future.set_result(result)
+    return future
+
+def run_saved_queries(cursor_factory, names, saved_queries: dict, data_aliases: dict, workers=DASHBOARD_WORKERS):
+    """
+    Run several saved queries concurrently, each on its own cursor.
+
+    Saved queries that more than one of them depend on are computed once up front, in
+    dependency order with independent ones in parallel, and handed to the others as Arrow
+    tables registered on their cursors. A shared query that fails is left to each
+    dependent query to compute, and report, on its own, as is a query that cannot be
+    expanded.
+
+    Where threads are not available the queries run one after another as they are started.
+
+    Yields (name, Arrow table or None, error or None, seconds) as each query completes.
+    """
+    # data aliases (materialized saved queries among them) are read, not computed
+    saved_queries = {name: sql for name, sql in saved_queries.items() if name not in data_aliases}
+    shared = shared_dependencies(names, saved_queries)
+    shared_tables = {}  # name -> Arrow table
+    finished = {}
+
+    def start(pool, name):
+        # cursors are opened here, worker threads only use them
+        cursor = cursor_factory()
+        aliases = dict(data_aliases)
+        for shared_name, table in shared_tables.items():
+            cursor.register(SHARED_PREFIX + shared_name, table)
+            aliases[shared_name] = f'"{SHARED_PREFIX}{shared_name}"'
+        try:
+            sql = expand_sql_query(f"SELECT * FROM {{{{{name}}}}}", aliases, saved_queries)
+        except ValueError as e:
+            # an unknown alias or a reference cycle fails this panel only
+            cursor.close()
+            return _finished((None, str(e), 0))
+        if pool is None:
+            return _finished(_run(cursor, sql))
+        return pool.submit(_run, cursor, sql)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dashboard") if THREADS_AVAILABLE else None
+    with executor or contextlib.nullcontext() as pool:
+        for level in dependency_levels(shared, saved_queries):
+            futures = {start(pool, name): name for name in level}
+            for future in as_completed(futures):
+                name = futures[future]
+                table, error, seconds = future.result()
+                if table is not None:
+                    shared_tables[name] = table
+                if name in names:
+                    finished[name] = (table, error, seconds)
+                    yield name, table, error, seconds
+
+        futures = {start(pool, name): name for name in names if name not in finished}
+        for future in as_completed(futures):
+            yield (futures[future], *future.result())
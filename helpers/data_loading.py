@@ -1,36 +1,35 @@
 
 from pathlib import Path
 import pandas as pd
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+from helpers.workbook import LazyWorkbook, LazySheet
+from helpers.memory_manager import SpilledTable
+from helpers.profiler import profiled
 # from collections import Counter
 # import pyarrow.parquet as pq
 # import pyarrow as pa
 import json
 import hashlib
 import itertools
-import io
+import codecs
+import tempfile
+import os
+import datetime
 
+CSV_MIME_TYPES = ["text/csv", "text/plain", "application/csv"]
+XLSX_MIME_TYPES = ["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "text/xlsx"]
+CSV_SNIFF_BYTES = 1 << 20  # prefix used to guess the text encoding of a csv
+CSV_SNIFF_ROWS = 20480  # rows DuckDB samples to detect the dialect and column types
+SPOOL_CHUNK_SIZE = 1 << 20  # bytes copied per read when spooling an upload to disk
 
-def load_cache(cache_file):
-    """Load file paths from cache file into session state."""
-    if Path(cache_file).exists():
-        with open(cache_file, "r") as f:
-            return json.load(f)
-    return {"files": [], "tables": []}
-
-def save_cache(cache_file, tables):
-    """Save session state file tracking to disk."""
-    # only save tables that are not Type = "Temporary"
-
-    cache_data = {
-        # "availablefiles": [{key: str(value) for key, value in file.items()} for file in files],
-        "tables": [{key: str(value) for key, value in table.items()} for table in tables],
-    }
-    with open(cache_file, "w") as f:
-        json.dump(cache_data, f, indent=4)
 
+@profiled()
 def save_queries_to_cache(queries: dict, cache_file: str):
     with open(cache_file, "w") as f:
         json.dump(queries, f, indent=2)
+@profiled()
 def load_queries_from_cache(cache_file: str) -> dict:
     import os
     if os.path.exists(cache_file):
@@ -46,18 +45,30 @@ def get_file_hash(file):
         hasher.update(chunk)
     return hasher.hexdigest()
 
-def check_membership(member, name="File Hash", *lists,):
+class HashIndex:
     """
-    Check if a member exists in any of the provided lists by building a set of all values for the specified key.
+    The values of one key across a session's upload lists, for O(1) duplicate checks.
 
-    Only works with dictionaries that contain the specified key.
+    The set is kept with the session and rebuilt only when one of the lists is replaced or
+    changes length, rather than on every check; entries are appended to these lists or
+    filtered out of them, never edited in place.
     """
-    all_lists = {
-        f.get(name)  # Get value of 'name' from each dict in the lists
-        for f in itertools.chain(*lists)  # chain all lists into a single iterable
-        if f.get(name) is not None  # Ensure we only include non-None values
-    }
-    return member in all_lists
+
+    def __init__(self, name="File Hash"):
+        self.name = name
+        self._lists = ()
+        self._lengths = ()
+        self._members = set()
+
+    def contains(self, member, *lists) -> bool:
+        lengths = tuple(len(entries) for entries in lists)
+        if len(lists) != len(self._lists) or lengths != self._lengths or any(
+                a is not b for a, b in zip(lists, self._lists)):
+            self._members = {
+                f.get(self.name) for f in itertools.chain(*lists) if f.get(self.name) is not None
+            }
+            self._lists, self._lengths = lists, lengths
+        return member in self._members
 
 # def rename_duplicates(df: pd.DataFrame) -> pd.DataFrame:
 #     """
@@ -84,41 +95,207 @@ def check_membership(member, name="File Hash", *lists,):
 #     return rename_duplicates(df)
 
 
-def data_reader(uploaded_file):
-    """Read the uploaded data file and return a DataFrame along with file type."""
-    file_type = uploaded_file.type
-    file_bytes = uploaded_file.read()
+def infer_partition_type(values) -> str:
+    """DuckDB type for a hive partition key from all of its directory values."""
+    values = [v for v in values if v not in ("", "__HIVE_DEFAULT_PARTITION__")]
+    if not values:
+        return "VARCHAR"
+    for duckdb_type, parse in (("BIGINT", int), ("DOUBLE", float), ("DATE", datetime.date.fromisoformat)):
+        try:
+            for v in values:
+                parse(v)
+            return duckdb_type
+        except ValueError:
+            continue
+    return "VARCHAR"
+
+def hive_partition_keys(directory) -> dict:
+    """Map each key=value partition key under a directory to its inferred DuckDB type."""
+    values = {}
+    root = Path(directory)
+    for file in root.rglob("*.parquet"):
+        for part in file.relative_to(root).parts[:-1]:
+            if "=" in part:
+                key, value = part.split("=", 1)
+                values.setdefault(key, set()).add(value)
+    return {key: infer_partition_type(vals) for key, vals in values.items()}
+
+@profiled()
+def partitioned_parquet_reference(directory) -> str:
+    """
+    Reference for a directory of Parquet files as one partitioned dataset.
+
+    Files are globbed recursively, key=value directories become typed partition columns
+    DuckDB can prune on, and files whose schemas drifted are reconciled by column name.
+    """
+    directory = Path(directory).resolve()
+    glob = (directory / "**" / "*.parquet").as_posix().replace("'", "''")
+    options = ["hive_partitioning = true", "union_by_name = true"]
+    partition_keys = hive_partition_keys(directory)
+    if partition_keys:
+        hive_types = ", ".join(f"'{key}': {duckdb_type}" for key, duckdb_type in partition_keys.items())
+        options.append(f"hive_types = {{{hive_types}}}")
+    return f"read_parquet('{glob}', {', '.join(options)})"
+
+def to_arrow_table(relation):
+    """Fetch a DuckDB relation as a pyarrow Table across DuckDB versions."""
+    if hasattr(relation, "to_arrow_table"):
+        return relation.to_arrow_table()
+    return relation.fetch_arrow_table()
+
+def to_arrow_reader(result, batch_size: int):
+    """Stream a DuckDB relation or executed cursor as a pyarrow RecordBatchReader."""
+    if hasattr(result, "to_arrow_reader"):
+        return result.to_arrow_reader(batch_size)
+    return result.fetch_record_batch(batch_size)
+
+def sniff_encoding(prefix: bytes) -> str:
+    """Guess the DuckDB encoding name of a text file from a bounded prefix of its bytes."""
+    if prefix.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        # final=False so a multi-byte character cut off at the end of the prefix is not an error
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+def sniff_csv_dialect(path, encoding: str, con=None) -> dict:
+    """Detect delimiter, quoting, header and column types from the first CSV_SNIFF_ROWS rows."""
+    con = con or duckdb.connect()
+    rel = con.execute(
+        "SELECT Delimiter, Quote, HasHeader, Columns, Prompt FROM sniff_csv(?, encoding = ?, sample_size = ?)",
+        [str(path), encoding, CSV_SNIFF_ROWS],
+    )
+    delimiter, quote, has_header, columns, prompt = rel.fetchone()
+    return {
+        "encoding": encoding,
+        "delimiter": delimiter,
+        "quote": quote,
+        "header": has_header,
+        "columns": {c["name"]: c["type"] for c in columns},
+        "prompt": prompt,
+    }
+
+def describe_dialect(dialect: dict) -> str:
+    """A sniffed dialect as the catalog's Encoding field, e.g. "utf-8; delimiter ';'; quote '"'; header"."""
+    parts = [dialect["encoding"], f"delimiter {dialect['delimiter']!r}"]
+    if dialect.get("quote"):
+        parts.append(f"quote {dialect['quote']!r}")
+    parts.append("header" if dialect["header"] else "no header")
+    return "; ".join(parts)
+
+@profiled()
+def read_csv_duckdb(path, con=None):
+    """
+    Read a csv file with DuckDB in one parallel pass.
+
+    The encoding is guessed from the first CSV_SNIFF_BYTES bytes and the dialect and column
+    types are sniffed from a bounded sample, then the whole file is parsed once with those
+    settings pinned. If a row past the sample does not fit the sniffed types the file is
+    read again with type detection over the full file.
+
+    Returns the table as a pyarrow Table and the detected dialect.
+    """
+    con = con or duckdb.connect()
+    with open(path, "rb") as f:
+        encoding = sniff_encoding(f.read(CSV_SNIFF_BYTES))
+
+    dialect = sniff_csv_dialect(path, encoding, con)
+    try:
+        # the sniffer's prompt is a read_csv call with every detected option pinned
+        table = to_arrow_table(con.sql(f"SELECT * {dialect['prompt'].rstrip().rstrip(';')}"))
+    except duckdb.Error:
+        table = to_arrow_table(con.read_csv(str(path), encoding=encoding, sample_size=-1))
+    return table, dialect
+
+@profiled()
+def spool_upload(uploaded_file, suffix="", chunk_size=SPOOL_CHUNK_SIZE):
+    """
+    Stream an uploaded file to a named temp file in chunks, hashing it in the same pass.
+
+    Returns the spool path, the sha256 hex digest and the number of bytes written.
+    The caller owns the spool file and is responsible for removing it.
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    uploaded_file.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
+        for chunk in iter(lambda: uploaded_file.read(chunk_size), b""):
+            hasher.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+    uploaded_file.seek(0)
+    return f.name, hasher.hexdigest(), size
+
+@profiled()
+def load_upload(spool_path, file_type, file_hash, store):
+    """
+    Turn a spooled upload into the data held by its session entries.
+
+    csv and parquet uploads are looked up in the parsed store by hash and parsed only on a
+    miss. Workbooks return a dict of LazySheet so no sheet is parsed until it is used; the
+    workbook keeps the spool file open until all its sheets are stored, every other spool
+    file is removed here.
+    """
+    if file_type in XLSX_MIME_TYPES:
+        data, parsed_type, encoding = data_reader(spool_path, file_type)
+        if isinstance(data, LazyWorkbook):
+            return data.sheets(store, file_hash), parsed_type, encoding
+        os.remove(spool_path)
+        return data, parsed_type, encoding
+
+    try:
+        stored = store.get(file_hash)
+        if stored is not None:
+            return stored
+        data, parsed_type, encoding = data_reader(spool_path, file_type)
+    finally:
+        os.remove(spool_path)
+    if parsed_type in ("csv", "parquet"):
+        # the parsed table is kept: reading the stored copy back would decode it a second time
+        store.put(file_hash, data, parsed_type, encoding)
+    return data, parsed_type, encoding
+
+@profiled()
+def as_arrow(data) -> pa.Table:
+    """Return session table data as a pyarrow Table, parsing a lazy sheet if needed."""
+    if isinstance(data, (LazySheet, SpilledTable)):
+        return data.to_arrow()
+    if isinstance(data, pd.DataFrame):
+        return pa.Table.from_pandas(data, preserve_index=False)
+    return data
+
+@profiled()
+def preview(data, n=10):
+    """Return the first n rows of session table data without loading the rest."""
+    if isinstance(data, pa.Table):
+        return data.slice(0, n)
+    return data.head(n)
 
+@profiled()
+def data_reader(file_path, file_type):
+    """Read a spooled data file and return a pyarrow Table along with file type."""
     try:        
-        if file_type in ["text/csv", "text/plain", "application/csv"]:
-            encoding_type = ["ISO-8859-1", "utf-8", "latin1"]
-            errors = []
-            for encoding in encoding_type:
-                try:
-                    df = pd.read_csv(io.BytesIO(file_bytes), encoding=encoding)
-                    return df, f"csv",encoding
-                except Exception as e:
-                    errors.append((encoding, str(e)))
-                    continue
-            return pd.DataFrame([]), f"Error: {errors}", ""
+        if file_type in CSV_MIME_TYPES:
+            try:
+                df, dialect = read_csv_duckdb(file_path)
+                return df, "csv", describe_dialect(dialect)
+            except Exception as e:
+                return pa.table({}), f"Error: {e}", ""
         elif file_type == 'application/octet-stream':
             try:
-                return pd.read_parquet(uploaded_file), "parquet", ""
+                return pq.read_table(file_path), "parquet", ""
             except Exception as e:
                 # Attempt to read as a partitioned dataset
-                return pd.DataFrame([]),"parquet partition", ""
-        elif file_type in ["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "text/xlsx"]:
-            xl = pd.ExcelFile(uploaded_file)
-            sheet_names = xl.sheet_names
-            df_dict = {}
+                return pa.table({}),"parquet partition", ""
+        elif file_type in XLSX_MIME_TYPES:
             try:
-                uploaded_file.seek(0)  # Reset file pointer to the beginning
-                for sheet_name in sheet_names:
-                    df_dict[sheet_name] = pd.read_excel(uploaded_file, sheet_name=sheet_name)
+                # sheets are parsed lazily, see load_upload
+                return LazyWorkbook(file_path), "xlsx", ""
             except Exception as e:
-                return pd.DataFrame([]), f"Error reading excel file: {str(e)}", ""
-            return df_dict, "xlsx", ""
+                return pa.table({}), f"Error reading excel file: {str(e)}", ""
         else:
-            return pd.DataFrame([]), "Unsupported file type", ""
+            return pa.table({}), "Unsupported file type", ""
     except Exception as e:
-        return pd.DataFrame([]), f"Error: {str(e)}", ""
\ No newline at end of file
+        return pa.table({}), f"Error: {str(e)}", ""
\ No newline at end of file
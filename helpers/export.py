@@ -0,0 +1,51 @@
+from pathlib import Path
+import duckdb
+
+EXPORT_DIR = "exports"
+# label -> (DuckDB format, file extension, compressions offered, first one is the default)
+EXPORT_FORMATS = {
+    "Parquet": ("parquet", "parquet", ["zstd", "snappy", "gzip", "uncompressed"]),
+    "CSV": ("csv", "csv", ["none", "gzip", "zstd"]),
+    "NDJSON": ("json", "ndjson", ["none", "gzip", "zstd"]),
+}
+ROW_GROUP_SIZE = 122880  # DuckDB's default
+
+
+def default_target(label: str, name="query") -> str:
+    return (Path(EXPORT_DIR) / f"{name}.{EXPORT_FORMATS[label][1]}").as_posix()
+
+def copy_statement(sql: str, target: str, label: str, compression=None, row_group_size=None, partition_by=()) -> str:
+    """
+    Build a COPY that writes the result of sql straight to target.
+
+    DuckDB streams the rows to the file as they are produced, so nothing is collected in
+    memory first. With partition_by, target is a directory of key=value subdirectories.
+    Raises ValueError unless sql is a single SELECT statement.
+    """
+    statements = duckdb.extract_statements(sql)
+    if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+        raise ValueError("Only a single SELECT statement can be exported.")
+    query = statements[0].query
+    tokens = duckdb.tokenize(query)
+    if tokens and query[tokens[-1][0]] == ";":
+        # comments are not tokens, so this is the terminating semicolon even when a comment follows
+        query = query[:tokens[-1][0]]
+    duckdb_format = EXPORT_FORMATS[label][0]
+    options = [f"FORMAT {duckdb_format}"]
+    if compression:
+        options.append(f"COMPRESSION {compression}")
+    if duckdb_format == "parquet" and row_group_size:
+        options.append(f"ROW_GROUP_SIZE {int(row_group_size)}")
+    if duckdb_format == "csv":
+        options.append("HEADER true")
+    if partition_by:
+        columns = ", ".join('"' + c.replace('"', '""') + '"' for c in partition_by)
+        options += [f"PARTITION_BY ({columns})", "OVERWRITE_OR_IGNORE true"]
+    escaped = target.replace("'", "''")
+    # on their own lines so a trailing comment in the query cannot swallow the closing paren
+    return f"COPY (\n{query.strip()}\n) TO '{escaped}' ({', '.join(options)})"
+
+def prepare_target(target: str, partitioned: bool):
+    """Create the directories an export writes into."""
+    path = Path(target)
+    (path if partitioned else path.parent).mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,176 @@
+from pathlib import Path
+import hashlib
+import os
+import re
+import shutil
+import time
+import uuid
+from helpers.query_cache import source_fingerprints
+from helpers.sql_templates import expand_sql_query, saved_query_order, template_aliases
+
+MATERIALIZED_DIR = "materialized"
+MATERIALIZED_CACHE_FILE = "materialized_queries.json"
+# the options of a read_parquet('...', options) reference
+READ_PARQUET_OPTIONS = re.compile(r"^read_parquet\(\s*'(?:[^']|'')*'\s*,\s*(.*)\)$", re.IGNORECASE | re.DOTALL)
+DEFAULT_PARQUET_OPTIONS = "hive_partitioning = true, union_by_name = true"
+
+
+def materialized_path(name: str) -> Path:
+    return Path(MATERIALIZED_DIR) / hashlib.sha256(name.encode()).hexdigest()[:16]
+
+def materialized_reference(name: str) -> str:
+    """The reference {{name}} resolves to once the saved query is materialized."""
+    return f"read_parquet('{(materialized_path(name) / '*.parquet').as_posix()}')"
+
+def materialized_aliases(materialized: dict) -> dict:
+    """Data aliases for every saved query that has been materialized at least once."""
+    return {name: materialized_reference(name) for name, meta in materialized.items() if meta.get("refreshed")}
+
+def materialized_catalog_entries(materialized: dict) -> list:
+    """
+    Catalog-shaped entries for materializations, so they are fingerprinted like any source.
+
+    Result cache keys and the refresh of queries built on other materialized queries then
+    notice when a materialization is rewritten or appended to.
+    """
+    return [
+        {"Alias": name, "Reference": materialized_reference(name), "Type": "Directory", "Path": materialized_path(name).as_posix()}
+        for name, meta in materialized.items() if meta.get("refreshed")
+    ]
+
+def drop_materialized(name: str):
+    shutil.rmtree(materialized_path(name), ignore_errors=True)
+
+def directory_listing(path: str) -> dict:
+    """Every Parquet file under a directory with its [mtime, size]; _SUCCESS, .crc and the like are skipped."""
+    return {
+        f.as_posix(): [f.stat().st_mtime, f.stat().st_size]
+        for f in sorted(Path(path).rglob("*.parquet")) if f.is_file()
+    }
+
+def source_state(template: str, expanded_sql: str, available_files) -> dict:
+    """
+    Describe everything a materialization depends on.
+
+    The template hash catches edits to the saved query, file fingerprints catch changed
+    sources, and directory sources also keep a per-file listing so appended files can be
+    told apart from rewritten ones.
+    """
+    sources = source_fingerprints(expanded_sql, available_files)
+    listings = {}
+    for file_info in available_files:
+        key = file_info.get("Alias") or file_info.get("Path")
+        if key in sources and file_info.get("Type") == "Directory" and file_info.get("Path"):
+            listings[key] = directory_listing(file_info["Path"])
+            sources[key]["stat"] = None  # the listing is compared instead
+    return {
+        "template": hashlib.sha256(template.encode()).hexdigest(),
+        "sources": {key: {k: list(v) if isinstance(v, tuple) else v for k, v in fp.items()} for key, fp in sources.items()},
+        "listings": listings,
+    }
+
+def appended_files(old_state: dict, new_state: dict):
+    """
+    Return {alias: [new files]} when the only change is files appended to directory sources.
+
+    Returns None when anything else changed, which needs a full refresh, and an empty dict
+    when nothing changed at all.
+    """
+    if old_state.get("template") != new_state["template"] or old_state.get("sources") != new_state["sources"]:
+        return None
+    appended = {}
+    for key, listing in new_state["listings"].items():
+        old_listing = old_state.get("listings", {}).get(key, {})
+        if any(listing.get(f) != stat for f, stat in old_listing.items()):
+            return None  # a file was rewritten or removed
+        new_files = [f for f in listing if f not in old_listing]
+        if new_files:
+            appended[key] = new_files
+    return appended
+
+def files_reference(files, source_reference: str) -> str:
+    """read_parquet over some files of a directory source, with the options of the source's own reference."""
+    file_list = ", ".join("'" + Path(f).as_posix().replace("'", "''") + "'" for f in files)
+    match = READ_PARQUET_OPTIONS.match(source_reference.strip())
+    # hive_types in particular, so partition columns keep the types of the full refresh
+    options = match.group(1).strip() if match else DEFAULT_PARQUET_OPTIONS
+    return f"read_parquet([{file_list}]{', ' + options if options else ''})"
+
+def _copy_to_parquet(cursor, sql: str, target: Path):
+    """COPY a query to target through a temporary file, so a failed or cancelled COPY leaves nothing behind."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+    escaped = tmp_path.as_posix().replace("'", "''")
+    try:
+        cursor.execute(f"COPY (\n{sql}\n) TO '{escaped}' (FORMAT parquet)")
+        os.replace(tmp_path, target)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+def _replace_directory(cursor, sql: str, target_dir: Path):
+    """Write a query to a fresh directory and swap it in for target_dir only once it is complete."""
+    staging = target_dir.with_name(f"{target_dir.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        _copy_to_parquet(cursor, sql, staging / "part-0.parquet")
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    retired = target_dir.with_name(f"{target_dir.name}.{uuid.uuid4().hex}.old")
+    if target_dir.exists():
+        os.replace(target_dir, retired)
+    os.replace(staging, target_dir)
+    shutil.rmtree(retired, ignore_errors=True)
+
+def refresh_materialized(cursor, name: str, saved_queries: dict, data_aliases: dict, available_files, meta: dict) -> dict:
+    """
+    Bring one materialized saved query up to date and return its new metadata.
+
+    Nothing runs when no source changed. When the only change is new files in an
+    append-only directory source and the query is marked incremental, the query runs over
+    the new files alone and its result is added as another part file. Anything else
+    rewrites the materialization from scratch. Results go straight from DuckDB to Parquet,
+    through temporary files that replace the old ones only once they are complete, so a
+    failed refresh leaves the previous materialization and its metadata in place.
+    """
+    template = saved_queries[name]
+    # the query's own name must resolve to its template here, not to its materialization
+    own_aliases = {alias: ref for alias, ref in data_aliases.items() if alias != name}
+    expanded = expand_sql_query(template, own_aliases, saved_queries)
+    state = source_state(template, expanded, available_files)
+    appended = appended_files(meta.get("state", {}), state) if meta.get("refreshed") else None
+    target_dir = materialized_path(name)
+
+    if appended == {}:
+        return meta
+    if appended and meta.get("incremental"):
+        new_files_aliases = dict(own_aliases)
+        for alias, files in appended.items():
+            new_files_aliases[alias] = files_reference(files, own_aliases.get(alias, ""))
+        part = len(list(target_dir.glob("*.parquet")))
+        _copy_to_parquet(cursor, expand_sql_query(template, new_files_aliases, saved_queries), target_dir / f"part-{part}.parquet")
+        mode = "incremental"
+    else:
+        # the previous materialization stays readable until the new one is complete
+        _replace_directory(cursor, expanded, target_dir)
+        mode = "full"
+
+    return {**meta, "state": state, "refreshed": time.time(), "last_refresh": mode}
+
+def refresh_stale(cursor, names, saved_queries: dict, data_aliases: dict, available_files, materialized: dict) -> dict:
+    """
+    Refresh the materialized queries among names and the ones they depend on, dependencies first.
+
+    Each entry of materialized is replaced only once its refresh succeeded, so after a
+    failure it still describes every materialization on disk.
+    """
+    for name in saved_query_order(names, saved_queries):
+        if name in materialized:
+            aliases = {**data_aliases, **materialized_aliases(materialized)}
+            sources = list(available_files) + materialized_catalog_entries(materialized)
+            materialized[name] = refresh_materialized(cursor, name, saved_queries, aliases, sources, materialized[name])
+    return materialized
+
+def referenced_materializations(user_query: str, saved_queries: dict, materialized: dict) -> list:
+    """Materialized saved queries a template depends on, directly or through other saved queries."""
+    order = saved_query_order(template_aliases(user_query), saved_queries)
+    return [name for name in order if name in materialized]
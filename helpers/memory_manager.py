@@ -0,0 +1,119 @@
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import itertools
+import os
+import shutil
+import time
+import uuid
+import weakref
+from helpers.workbook import LazySheet, frame_to_arrow
+from helpers.workspace import TEMP_DIRECTORY
+
+# Heap budget for the tables one session keeps in memory; past it the least recently used spill
+SESSION_MEMORY_BYTES = int(os.environ.get("DUCKBOARD_SESSION_MEMORY_MB", "1024")) * 1024 ** 2
+SPILL_DIR = os.path.join(TEMP_DIRECTORY, "session_spill")
+LAST_USED = "Last Used"
+
+
+class SpilledTable:
+    """
+    A session table moved out of memory to a Parquet file; it reads back memory-mapped.
+
+    The file belongs to the table: it is removed once the table is no longer referenced,
+    when its entry is dropped or replaced, or with the session's state.
+    """
+
+    def __init__(self, path: str, num_rows: int):
+        self.path = path
+        self.num_rows = num_rows
+        self._finalizer = weakref.finalize(self, _remove, path)
+
+    def __repr__(self):
+        return f"<SpilledTable '{self.path}'>"
+
+    def head(self, n=10) -> pa.Table:
+        parquet_file = pq.ParquetFile(self.path)
+        batches = list(itertools.islice(parquet_file.iter_batches(batch_size=n), 1))
+        return pa.Table.from_batches(batches, schema=parquet_file.schema_arrow)
+
+    def to_arrow(self) -> pa.Table:
+        return pq.read_table(self.path, memory_map=True)
+
+    def reference(self) -> str:
+        return f"read_parquet('{Path(self.path).resolve().as_posix()}')"
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class SpillDirectory:
+    """One session's directory under root, removed with everything in it along with the object."""
+
+    def __init__(self, root=SPILL_DIR):
+        self.path = os.path.join(root, uuid.uuid4().hex)
+        # kept in the session's state, so the directory goes when the session does
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.path, True)
+
+    def remove(self):
+        self._finalizer()
+
+
+def resident_bytes(entry: dict) -> int:
+    """
+    Heap bytes a session entry's data holds; spilled data and unread sheets count as none.
+
+    Tables read from the parsed store count in full: its Parquet files are memory-mapped,
+    but their columns are decoded into memory all the same.
+    """
+    data = entry.get("df")
+    if isinstance(data, pd.DataFrame):
+        return int(data.memory_usage(deep=True).sum())
+    if isinstance(data, pa.Table):
+        return data.get_total_buffer_size()
+    return 0  # LazySheet and SpilledTable are file-backed
+
+def touch(entries, aliases):
+    """Mark the entries behind aliases as just used."""
+    now = time.time()
+    for entry in entries:
+        if entry.get("Alias") in aliases:
+            entry[LAST_USED] = now
+
+def spill(entry: dict, directory=SPILL_DIR):
+    """Write an entry's data to Parquet and swap it for a SpilledTable."""
+    data = entry["df"]
+    table = frame_to_arrow(data) if isinstance(data, pd.DataFrame) else data
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    path = (Path(directory) / f"{uuid.uuid4().hex}.parquet").as_posix()
+    pq.write_table(table, path)
+    entry["df"] = SpilledTable(path, table.num_rows)
+
+def enforce_budget(entries, budget=SESSION_MEMORY_BYTES, directory=SPILL_DIR) -> dict:
+    """
+    Spill the least recently used in-memory tables of a session until the rest fit in budget.
+
+    Spilled entries keep their alias; the view catalog registers them as views over their
+    Parquet file, so queries on them keep working. Returns the resident and spilled totals.
+    """
+    sizes = [(entry, resident_bytes(entry)) for entry in entries]
+    resident = sum(size for _, size in sizes)
+    spilled_now = 0
+    for entry, size in sorted(sizes, key=lambda item: item[0].get(LAST_USED, 0)):
+        if resident <= budget:
+            break
+        if size and not isinstance(entry.get("df"), LazySheet):
+            spill(entry, directory)
+            resident -= size
+            spilled_now += 1
+    return {
+        "resident": resident,
+        "budget": budget,
+        "spilled": sum(isinstance(entry.get("df"), SpilledTable) for entry in entries),
+        "spilled_now": spilled_now,
+    }
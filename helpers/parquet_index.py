@@ -0,0 +1,298 @@
+from pathlib import Path
+import pyarrow.parquet as pq
+import datetime
+import duckdb
+import json
+import os
+import re
+import threading
+from helpers.data_loading import hive_partition_keys
+
+INDEX_FILE = "parquet_index.json"
+INDEX_VERSION = 2  # statistics carry their kind since version 2; older indexes are rebuilt
+
+COMPARISONS = {
+    "COMPARE_EQUAL": "=",
+    "COMPARE_LESSTHAN": "<",
+    "COMPARE_LESSTHANOREQUALTO": "<=",
+    "COMPARE_GREATERTHAN": ">",
+    "COMPARE_GREATERTHANOREQUALTO": ">=",
+}
+QUOTED_PATH = re.compile(r"'(?:[^']|'')*'")
+FLIPPED = {"=": "=", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+
+def _stat_value(value):
+    """
+    (kind, value) of a statistic that survives a JSON round trip, or None.
+
+    Dates and timestamps are kept as ISO strings next to their kind, so they are compared
+    as dates and times, never as strings. Timestamps with a time zone or below microsecond
+    precision are not kept, since SQL literals cannot be compared with them exactly.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return "number", value
+    if isinstance(value, str):
+        return "string", value
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None or getattr(value, "nanosecond", 0):
+            return None
+        return "timestamp", value.isoformat()
+    if isinstance(value, datetime.date):
+        return "date", value.isoformat()
+    return None
+
+def read_footer(path: str) -> dict:
+    """Schema, row counts and per-row-group min/max statistics from a Parquet footer."""
+    metadata = pq.read_metadata(path)
+    schema = metadata.schema.to_arrow_schema()
+    row_groups = []
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        stats = {}
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            statistics = column.statistics
+            if statistics is not None and statistics.has_min_max:
+                low, high = _stat_value(statistics.min), _stat_value(statistics.max)
+                if low is not None and high is not None and low[0] == high[0]:
+                    stats[column.path_in_schema] = [low[0], low[1], high[1]]
+        row_groups.append({"rows": row_group.num_rows, "stats": stats})
+    return {
+        "columns": [[field.name, str(field.type)] for field in schema],
+        "rows": metadata.num_rows,
+        "row_groups": row_groups,
+    }
+
+def parquet_files(file_info: dict) -> list:
+    """The Parquet files behind a catalog entry, or [] when it is not Parquet-backed."""
+    path = file_info.get("Path") or ""
+    if not path:
+        return []
+    p = Path(path)
+    if file_info.get("Type") == "Directory" and p.is_dir():
+        return sorted(f.as_posix() for f in p.rglob("*.parquet"))
+    if p.is_file() and p.suffix == ".parquet":
+        return [p.as_posix()]
+    return []
+
+
+class ParquetIndex:
+    """
+    Footer metadata for every Parquet file behind the registered tables.
+
+    Entries are keyed by file path and refreshed only when a file's mtime or size changes,
+    so updating the index for a directory costs a stat per file plus a footer read per new
+    or changed file. The index is persisted to INDEX_FILE.
+    """
+
+    def __init__(self, index_file=INDEX_FILE):
+        self.index_file = Path(index_file)
+        self._lock = threading.Lock()
+        self._files = {}
+        if self.index_file.exists():
+            with open(self.index_file, "r") as f:
+                stored = json.load(f)
+            if stored.get("version") == INDEX_VERSION:
+                self._files = stored["files"]
+
+    def _save(self):
+        tmp_path = self.index_file.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": INDEX_VERSION, "files": self._files}, f)
+        os.replace(tmp_path, self.index_file)
+
+    def update(self, file_info: dict) -> list:
+        """Index new or changed files of a catalog entry and return its file paths."""
+        files = parquet_files(file_info)
+        changed = False
+        for path in files:
+            stat = os.stat(path)
+            entry = self._files.get(path)
+            if entry is not None and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                continue
+            try:
+                footer = read_footer(path)
+            except Exception:
+                continue
+            with self._lock:
+                self._files[path] = {"mtime": stat.st_mtime, "size": stat.st_size, **footer}
+            changed = True
+        if changed:
+            with self._lock:
+                self._save()
+        return files
+
+    def summary(self, file_info: dict):
+        """Schema, row count, size and file count of an indexed entry, or None if it is not indexed."""
+        files = [self._files[path] for path in self.update(file_info) if path in self._files]
+        if not files:
+            return None
+        schema = {}
+        for entry in files:
+            for name, column_type in entry["columns"]:
+                schema.setdefault(name, column_type)
+        if file_info.get("Type") == "Directory":
+            # key=value directories are columns of the dataset too, though no footer has them
+            for name, column_type in hive_partition_keys(file_info["Path"]).items():
+                schema.setdefault(name, column_type)
+        return {
+            "columns": schema,
+            "rows": sum(entry["rows"] for entry in files),
+            "bytes": sum(entry["size"] for entry in files),
+            "files": len(files),
+            "uniform_schema": all(entry["columns"] == files[0]["columns"] for entry in files),
+        }
+
+    def candidate_files(self, files: list, predicates: list) -> list:
+        """Files with at least one row group whose min/max statistics can satisfy every predicate."""
+        return [path for path in files if self._may_match(self._files.get(path), predicates)]
+
+    @staticmethod
+    def _may_match(entry, predicates) -> bool:
+        if entry is None:
+            return True
+        for row_group in entry["row_groups"]:
+            if all(_range_may_match(row_group["stats"].get(column), op, value) for column, op, value in predicates):
+                return True
+        return not entry["row_groups"]
+
+
+def _literal_as(kind, value):
+    """A SQL literal as a value of a statistic's kind, or None when they do not compare exactly."""
+    if kind == "number":
+        return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    if not isinstance(value, str):
+        return None
+    if kind == "string":
+        return value
+    try:
+        if kind == "date":
+            return datetime.date.fromisoformat(value)
+        parsed = datetime.datetime.fromisoformat(value)
+        return parsed if parsed.tzinfo is None else None
+    except ValueError:
+        return None
+
+def _stat_as(kind, value):
+    if kind == "date":
+        return datetime.date.fromisoformat(value)
+    if kind == "timestamp":
+        return datetime.datetime.fromisoformat(value)
+    return value
+
+def _range_may_match(stats, op, value) -> bool:
+    if stats is None:
+        return True
+    kind, low, high = stats
+    value = _literal_as(kind, value)
+    if value is None:
+        return True
+    low, high = _stat_as(kind, low), _stat_as(kind, high)
+    if op == "=":
+        return low <= value <= high
+    if op == "<":
+        return low < value
+    if op == "<=":
+        return low <= value
+    if op == ">":
+        return high > value
+    return high >= value
+
+def _constant(node):
+    if node["class"] == "CAST":
+        node = node["child"]
+    if node["class"] != "CONSTANT" or node["value"]["is_null"]:
+        return None
+    if node["value"]["type"]["id"] not in ("TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "DOUBLE", "FLOAT", "VARCHAR"):
+        return None
+    return node["value"]["value"]
+
+def _top_level_select(sql: str):
+    """The serialized top-level SELECT node of a single statement, or None."""
+    try:
+        tree = json.loads(duckdb.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+        if tree.get("error") or len(tree["statements"]) != 1:
+            return None
+        node = tree["statements"][0]["node"]
+    except Exception:
+        return None
+    return node if node.get("type") == "SELECT_NODE" else None
+
+def _without_locations(node):
+    """A serialized node with the fields that depend on where it sits in the query removed."""
+    if isinstance(node, dict):
+        return {k: _without_locations(v) for k, v in node.items() if k not in ("query_location", "alias")}
+    if isinstance(node, list):
+        return [_without_locations(v) for v in node]
+    return node
+
+def _scans_reference(sql: str, reference: str) -> bool:
+    """Whether the top-level SELECT of sql reads straight from the table function reference."""
+    node, scan = _top_level_select(sql), _top_level_select(f"SELECT * FROM {reference}")
+    if node is None or scan is None or node["from_table"]["type"] != "TABLE_FUNCTION":
+        return False
+    return _without_locations(node["from_table"]) == _without_locations(scan["from_table"])
+
+def simple_predicates(sql: str) -> list:
+    """
+    (column, op, literal) comparisons ANDed together in the WHERE clause of a top-level
+    SELECT that reads straight from a table function. Anything more complex is ignored,
+    which only means fewer files can be skipped.
+    """
+    node = _top_level_select(sql)
+    # the filter has to apply to the scanned files themselves, not to a derived table
+    if node is None or node["from_table"]["type"] != "TABLE_FUNCTION":
+        return []
+    where = node.get("where_clause")
+    if not where:
+        return []
+    conjuncts = where["children"] if where["type"] == "CONJUNCTION_AND" else [where]
+    predicates = []
+    for conjunct in conjuncts:
+        if conjunct["class"] != "COMPARISON" or conjunct["type"] not in COMPARISONS:
+            continue
+        op = COMPARISONS[conjunct["type"]]
+        left, right = conjunct["left"], conjunct["right"]
+        if left["class"] != "COLUMN_REF":
+            left, right, op = right, left, FLIPPED[op]
+        if left["class"] != "COLUMN_REF":
+            continue
+        value = _constant(right)
+        if value is not None:
+            predicates.append((left["column_names"][-1], op, value))
+    return predicates
+
+def prune_query(expanded_sql: str, available_files, index: ParquetIndex) -> str:
+    """
+    Narrow the Parquet source of a single-source query to the files its filters can match.
+
+    Only applies when exactly one Parquet-backed entry is referenced, once, as the table
+    function the top-level SELECT reads from, and its files share a schema. A reference
+    elsewhere (a scalar subquery, a saved query's CTE) is not filtered by the top-level
+    WHERE, so narrowing it would drop rows. The reference is rewritten to list just the
+    candidate files.
+    """
+    referenced = [f for f in available_files if f.get("Reference") and f["Reference"] in expanded_sql]
+    if len(referenced) != 1:
+        return expanded_sql
+    file_info = referenced[0]
+    if expanded_sql.count(file_info["Reference"]) != 1 or not _scans_reference(expanded_sql, file_info["Reference"]):
+        return expanded_sql
+    predicates = simple_predicates(expanded_sql)
+    summary = index.summary(file_info) if predicates else None
+    if summary is None or not summary["uniform_schema"]:
+        return expanded_sql
+
+    files = parquet_files(file_info)
+    candidates = index.candidate_files(files, predicates)
+    if len(candidates) == len(files):
+        return expanded_sql
+    # keep one file when nothing matches so the schema still resolves; the filter empties it
+    candidates = candidates or files[:1]
+    file_list = ", ".join("'" + Path(f).resolve().as_posix().replace("'", "''") + "'" for f in candidates)
+    # swap the reference's path or glob for the file list, keeping its read options
+    narrowed = QUOTED_PATH.sub(lambda _: f"[{file_list}]", file_info["Reference"], count=1)
+    return expanded_sql.replace(file_info["Reference"], narrowed)
@@ -0,0 +1,146 @@
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.parquet as pq
+import json
+import os
+import shutil
+import threading
+import time
+
+STORE_DIR = "parsed_cache"
+INDEX_FILE = "index.json"
+MAX_STORE_BYTES = 2 * 1024 ** 3  # evict least recently used entries past this size
+
+
+class ParsedStore:
+    """
+    Content-addressed on-disk store of parsed uploads, keyed by the upload's sha256.
+
+    Each entry is a directory of Parquet files, one per table (a single table for csv and
+    parquet uploads, one per sheet for workbooks). The index maps hash to entry metadata and
+    is kept in memory for O(1) lookups, persisted to INDEX_FILE on every change.
+    """
+
+    def __init__(self, root=STORE_DIR, max_bytes=MAX_STORE_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self) -> dict:
+        index_path = self.root / INDEX_FILE
+        if index_path.exists():
+            with open(index_path, "r") as f:
+                index = json.load(f)
+            # drop entries whose files were removed behind our back
+            return {h: e for h, e in index.items() if self._entry_dir(h).exists()}
+        return {}
+
+    def _save_index(self):
+        index_path = self.root / INDEX_FILE
+        tmp_path = index_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, index_path)
+
+    def _entry_dir(self, file_hash: str) -> Path:
+        return self.root / file_hash[:2] / file_hash
+
+    def __contains__(self, file_hash: str) -> bool:
+        return file_hash in self._index
+
+    def has_table(self, file_hash: str, table: str) -> bool:
+        entry = self._index.get(file_hash)
+        return entry is not None and table in entry["tables"]
+
+    def total_bytes(self) -> int:
+        return sum(e["bytes"] for e in self._index.values())
+
+    def table_path(self, file_hash: str, table: str) -> Path:
+        """Return the Parquet path of one table of an entry."""
+        entry = self._index[file_hash]
+        return self._entry_dir(file_hash) / entry["tables"][table]
+
+    def get(self, file_hash: str):
+        """
+        Load a stored upload in the shape data_reader returns it.
+
+        Returns (data, file_type, encoding), where data is a pyarrow Table or, for workbooks,
+        a dict of sheet name to Table. Returns None when the hash is not stored. The Parquet
+        file is memory-mapped for reading, but its columns are still decoded into memory.
+        """
+        with self._lock:
+            entry = self._index.get(file_hash)
+            if entry is None:
+                return None
+            entry["last_access"] = time.time()
+            self._save_index()
+
+        try:
+            tables = {
+                name: pq.read_table(self._entry_dir(file_hash) / file_name, memory_map=True)
+                for name, file_name in entry["tables"].items()
+            }
+        except FileNotFoundError:
+            return None  # evicted by a concurrent put_table after the lookup
+        data = tables if entry["multi_table"] else next(iter(tables.values()))
+        return data, entry["file_type"], entry["encoding"]
+
+    def get_table(self, file_hash: str, table: str):
+        """Read one stored table as a pyarrow Table (decoded into memory), or None if it is not stored."""
+        with self._lock:
+            entry = self._index.get(file_hash)
+            if entry is None or table not in entry["tables"]:
+                return None
+            entry["last_access"] = time.time()
+            self._save_index()
+        try:
+            return pq.read_table(self._entry_dir(file_hash) / entry["tables"][table], memory_map=True)
+        except FileNotFoundError:
+            return None  # evicted by a concurrent put_table after the lookup
+
+    def put(self, file_hash: str, data, file_type: str, encoding: str):
+        """Store a parsed upload; data is a pyarrow Table or a dict of sheet name to Table."""
+        multi_table = isinstance(data, dict)
+        tables = data if multi_table else {"data": data}
+        for name, table in tables.items():
+            self.put_table(file_hash, name, table, file_type, encoding, multi_table)
+
+    def put_table(self, file_hash: str, name: str, table: pa.Table, file_type: str, encoding: str, multi_table=True):
+        """Add one table to an entry, creating the entry if it does not exist yet."""
+        entry_dir = self._entry_dir(file_hash)
+        entry_dir.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            entry = self._index.setdefault(file_hash, {
+                "file_type": file_type,
+                "encoding": encoding,
+                "multi_table": multi_table,
+                "tables": {},
+                "bytes": 0,
+            })
+            # sheet names are not safe file names, so files are numbered
+            file_name = entry["tables"].get(name, f"{len(entry['tables'])}.parquet")
+            pq.write_table(table, entry_dir / file_name)
+            entry["tables"][name] = file_name
+            entry["bytes"] = sum((entry_dir / f).stat().st_size for f in entry["tables"].values())
+            entry["last_access"] = time.time()
+            self._evict()
+            self._save_index()
+
+    def remove(self, file_hash: str):
+        with self._lock:
+            if self._index.pop(file_hash, None) is not None:
+                shutil.rmtree(self._entry_dir(file_hash), ignore_errors=True)
+                self._save_index()
+
+    def _evict(self):
+        """Drop least recently used entries until the store fits in max_bytes."""
+        total = self.total_bytes()
+        for file_hash, entry in sorted(self._index.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["bytes"]
+            del self._index[file_hash]
+            shutil.rmtree(self._entry_dir(file_hash), ignore_errors=True)
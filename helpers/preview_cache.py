@@ -0,0 +1,112 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+from helpers import data_loading as dl
+from helpers.query_runner import THREADS_AVAILABLE
+import os
+from helpers.catalog import entry_fingerprint
+
+PREVIEW_ROWS = 100
+MAX_PREVIEWS = 256
+PREVIEW_WORKERS = 2
+
+
+def preview_key(file_info: dict):
+    """
+    What a preview depends on: the catalog fingerprint of the entry and the stat of its path.
+
+    Only the path itself is stat'ed; a directory's mtime changes when files are added or
+    removed, without walking every file under it on each rerun.
+    """
+    path = file_info.get("Path") or ""
+    return (file_info["Alias"], entry_fingerprint(file_info), _path_stat(path) if path else None)
+
+def _path_stat(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def compute_preview(cursor, file_info: dict, rows=PREVIEW_ROWS):
+    """Return (preview, schema) Arrow tables for a catalog entry, closing the cursor."""
+    references = [file_info["Reference"]]
+    if file_info.get("File Type") == "csv" and file_info.get("Path"):
+        # CSVs the registered reference cannot read get another try with DuckDB's sniffer
+        path = file_info["Path"].replace("'", "''")
+        references += [f"sniff_csv('{path}')", f"read_csv_auto('{path}')"]
+    try:
+        for i, reference in enumerate(references):
+            try:
+                preview = dl.to_arrow_table(cursor.sql(f"SELECT * FROM {reference} LIMIT {rows}"))
+            except Exception:
+                if i == len(references) - 1:
+                    raise
+                continue
+            schema = dl.to_arrow_table(cursor.sql(f"DESCRIBE SELECT * FROM {reference}"))
+            return preview, schema
+    finally:
+        cursor.close()
+
+
+class PreviewCache:
+    """
+    Previews and schemas of catalog entries, computed on background threads.
+
+    prefetch() queues every entry whose preview_key has no result yet, so previews are ready
+    by the time a table is selected; get() returns the Future of an entry. Results are kept
+    in an LRU of max_entries, and a changed file or registration simply gets a new key.
+    A preview that failed is dropped from the LRU, so the next get() tries again instead of
+    returning the same error until the entry is evicted.
+
+    Where threads are not available nothing is prefetched and get() computes the preview
+    before returning an already finished Future.
+    """
+
+    def __init__(self, max_entries=MAX_PREVIEWS, workers=PREVIEW_WORKERS):
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preview") if THREADS_AVAILABLE else None
+        self._futures = OrderedDict()  # preview_key -> Future of (preview, schema)
+        self._lock = threading.Lock()
+
+    def prefetch(self, cursor_factory, available_files):
+        if self._executor is None:
+            return
+        for file_info in available_files:
+            if file_info.get("Alias") and file_info.get("Reference"):
+                self.get(cursor_factory, file_info)
+
+    def get(self, cursor_factory, file_info: dict):
+        key = preview_key(file_info)
+        with self._lock:
+            cached = self._futures.get(key)
+            # a failure whose eviction has not run yet is retried all the same
+            if cached is not None and not (cached.done() and cached.exception() is not None):
+                self._futures.move_to_end(key)
+                return cached
+            # the cursor is opened here, background threads only use it
+            if self._executor is not None:
+                future = self._executor.submit(compute_preview, cursor_factory(), dict(file_info))
+            else:
+                future = _computed(compute_preview, cursor_factory(), dict(file_info))
+            self._futures[key] = future
+            while len(self._futures) > self.max_entries:
+                self._futures.popitem(last=False)
+        future.add_done_callback(lambda done: self._forget_failed(key, done))
+        return future
+
+    def _forget_failed(self, key, future):
+        if future.exception() is None:
+            return
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+def _computed(fn, *args) -> Future:
+    """A finished Future holding the result, or the error, of fn(*args)."""
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
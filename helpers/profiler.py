@@ -0,0 +1,146 @@
+from contextlib import contextmanager
+from functools import wraps
+import sys
+import threading
+import time
+import pandas as pd
+import pyarrow as pa
+
+HISTORY_LENGTH = 20  # reruns kept per session for comparison and export
+
+_local = threading.local()
+
+
+class RerunProfile:
+    """Stage timings and counters of one script rerun."""
+
+    def __init__(self, page=""):
+        self.page = page
+        self.started = time.time()
+        self.seconds = None
+        self.stages = {}  # name -> [calls, seconds]
+        self.counters = {}
+        self.memory = {}
+        self._start = time.perf_counter()
+
+    def add(self, name: str, seconds: float):
+        stage = self.stages.setdefault(name, [0, 0.0])
+        stage[0] += 1
+        stage[1] += seconds
+
+    def count(self, name: str, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._start
+
+    def breakdown(self) -> pd.DataFrame:
+        """Stages by time spent; stages nest, so their shares can add up to more than 100%."""
+        total = self.seconds or (time.perf_counter() - self._start)
+        rows = [
+            {"Stage": name, "Calls": calls, "ms": seconds * 1000, "% of rerun": 100 * seconds / total if total else 0.0}
+            for name, (calls, seconds) in self.stages.items()
+        ]
+        return pd.DataFrame(rows, columns=["Stage", "Calls", "ms", "% of rerun"]).sort_values("ms", ascending=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "page": self.page,
+            "started": self.started,
+            "seconds": self.seconds,
+            "stages": {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in self.stages.items()},
+            "counters": dict(self.counters),
+            "memory": dict(self.memory),
+        }
+
+
+def start_rerun(page="") -> RerunProfile:
+    """Begin profiling a rerun on the calling script thread."""
+    _local.profile = RerunProfile(page)
+    return _local.profile
+
+def finish_rerun():
+    """Stop profiling the rerun on the calling thread and return its profile, if one was running."""
+    profile = getattr(_local, "profile", None)
+    _local.profile = None
+    if profile is not None:
+        profile.finish()
+    return profile
+
+def current():
+    """The profile of the rerun on this thread; None on worker threads and outside reruns."""
+    return getattr(_local, "profile", None)
+
+@contextmanager
+def stage(name: str):
+    """Time a block as a stage of the current rerun; a no-op when nothing is being profiled."""
+    profile = current()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+def count(name: str, n=1):
+    profile = current()
+    if profile is not None:
+        profile.count(name, n)
+
+def profiled(name=None):
+    """Decorator timing every call of a function as a stage, named module.function by default."""
+    def decorate(func):
+        stage_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = current()
+            if profile is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.add(stage_name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+def estimate_size(obj, seen=None) -> int:
+    """
+    Approximate bytes held by an object and everything it contains.
+
+    DataFrames count their deep memory usage and Arrow tables their buffers, memory-mapped
+    or not; objects reached twice are counted once.
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, (pa.Table, pa.RecordBatch)):
+        return obj.get_total_buffer_size()
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(key, seen) + estimate_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen) for item in obj)
+    return size
+
+def session_state_sizes(state) -> pd.DataFrame:
+    """Approximate size of every session state key, largest first."""
+    seen = set()
+    rows = [{"Key": str(key), "bytes": estimate_size(value, seen)} for key, value in state.items()]
+    return pd.DataFrame(rows, columns=["Key", "bytes"]).sort_values("bytes", ascending=False)
+
+def duckdb_memory(cursor) -> pd.DataFrame:
+    """Memory and temporary storage of the DuckDB instance by component, closing the cursor."""
+    try:
+        return cursor.sql(
+            "SELECT tag, memory_usage_bytes, temporary_storage_bytes FROM duckdb_memory() "
+            "WHERE memory_usage_bytes > 0 OR temporary_storage_bytes > 0 ORDER BY memory_usage_bytes DESC"
+        ).df()
+    finally:
+        cursor.close()
@@ -0,0 +1,178 @@
+from collections import OrderedDict
+from pathlib import Path
+import pyarrow.parquet as pq
+import duckdb
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from helpers.sql_templates import strip_terminator
+
+RESULT_CACHE_DIR = "result_cache"
+MAX_MEMORY_BYTES = 256 * 1024 ** 2  # results past this budget spill to Parquet
+MAX_DISK_BYTES = 2 * 1024 ** 3
+# functions and keywords whose value changes between runs of the same query
+NON_DETERMINISTIC = re.compile(
+    r"\b(now|random|setseed|uuid|gen_random_uuid|uuidv4|uuidv7|nextval|currval|get_current_time"
+    r"|get_current_timestamp|transaction_timestamp|today)\s*\("
+    r"|\b(current_date|current_time|current_timestamp|localtime|localtimestamp)\b",
+    re.IGNORECASE)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    The cache key text of a query: the query without outer whitespace and its terminating semicolon.
+
+    Inner whitespace is kept as written, as it may sit inside a string literal; queries
+    that differ only in formatting miss each other rather than share a wrong result.
+    """
+    return strip_terminator(sql)
+
+def is_cacheable(sql: str) -> bool:
+    """Only deterministic plain reads can be answered from the cache; anything else has to run."""
+    try:
+        statements = duckdb.extract_statements(sql)
+    except duckdb.Error:
+        return False
+    if not statements or any(s.type != duckdb.StatementType.SELECT for s in statements):
+        return False
+    # matches inside string literals or comments only cost a cache miss
+    return not any(NON_DETERMINISTIC.search(s.query) for s in statements)
+
+def path_fingerprint(path: str):
+    """(mtime, size) of a file, or of every file under a directory."""
+    p = Path(path)
+    if p.is_dir():
+        stats = [f.stat() for f in p.rglob("*") if f.is_file()]
+        return (max((s.st_mtime for s in stats), default=0), sum(s.st_size for s in stats), len(stats))
+    if p.exists():
+        s = p.stat()
+        return (s.st_mtime, s.st_size)
+    return None
+
+def source_fingerprints(expanded_sql: str, available_files) -> dict:
+    """
+    Fingerprint every catalog entry the expanded query refers to.
+
+    An entry is referenced when its alias appears as a word in the query, or its path
+    appears inside an inlined reference. File-backed entries are fingerprinted by mtime
+    and size, in-memory tables by their content hash and file name.
+    """
+    fingerprints = {}
+    for file_info in available_files:
+        alias = file_info.get("Alias") or ""
+        path = file_info.get("Path") or ""
+        by_alias = alias and re.search(rf"(?<![\w.]){re.escape(alias)}(?!\w)", expanded_sql)
+        # inside a reference, quotes in the path are doubled
+        by_path = path and (path in expanded_sql or path.replace("'", "''") in expanded_sql)
+        if not (by_alias or by_path):
+            continue
+        fingerprints[alias or path] = {
+            # the sheets of a workbook share a hash, so the file name tells them apart
+            "hash": file_info.get("File Hash", ""),
+            "name": file_info.get("File Name", ""),
+            "stat": path_fingerprint(path) if path else None,
+            "reference": file_info.get("Reference", ""),
+        }
+    return fingerprints
+
+
+class QueryResultCache:
+    """
+    LRU cache of query results keyed by normalized SQL, validated against source fingerprints.
+
+    Results are Arrow tables held in memory up to max_memory_bytes; the least recently used
+    ones spill to Parquet files under root, which are themselves evicted past max_disk_bytes.
+    A lookup whose sources changed since the result was stored drops that result.
+    """
+
+    def __init__(self, root=RESULT_CACHE_DIR, max_memory_bytes=MAX_MEMORY_BYTES, max_disk_bytes=MAX_DISK_BYTES):
+        self.root = Path(root)
+        shutil.rmtree(self.root, ignore_errors=True)  # spilled results do not outlive the process
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()  # key -> (sources, table)
+        self._disk = OrderedDict()  # key -> (sources, path, bytes)
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "invalidations": 0, "spills": 0}
+
+    @staticmethod
+    def make_key(expanded_sql: str) -> str:
+        return hashlib.sha256(normalize_sql(expanded_sql).encode()).hexdigest()
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return self._memory_bytes()
+
+    def disk_bytes(self) -> int:
+        with self._lock:
+            return self._disk_bytes()
+
+    def _memory_bytes(self) -> int:
+        return sum(table.nbytes for _, table in self._memory.values())
+
+    def _disk_bytes(self) -> int:
+        return sum(size for _, _, size in self._disk.values())
+
+    def get(self, expanded_sql: str, sources: dict):
+        """Return the cached Arrow result, or None on a miss or when a source changed."""
+        key = self.make_key(expanded_sql)
+        sources = json.dumps(sources, sort_keys=True)
+        with self._lock:
+            if key in self._memory:
+                cached_sources, table = self._memory[key]
+                if cached_sources == sources:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return table
+                self._invalidate(key)
+            elif key in self._disk:
+                cached_sources, path, _ = self._disk[key]
+                if cached_sources == sources:
+                    self._disk.move_to_end(key)
+                    self.stats["disk_hits"] += 1
+                    return pq.read_table(path, memory_map=True)
+                self._invalidate(key)
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, expanded_sql: str, sources: dict, table):
+        key = self.make_key(expanded_sql)
+        sources = json.dumps(sources, sort_keys=True)
+        with self._lock:
+            self._invalidate(key, count=False)
+            self._memory[key] = (sources, table)
+            self._spill()
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._memory) + list(self._disk):
+                self._invalidate(key, count=False)
+
+    def _invalidate(self, key, count=True):
+        removed = self._memory.pop(key, None)
+        on_disk = self._disk.pop(key, None)
+        if on_disk is not None:
+            os.remove(on_disk[1])
+        if count and (removed or on_disk):
+            self.stats["invalidations"] += 1
+
+    def _spill(self):
+        """Move least recently used results to disk until memory fits, then trim the disk."""
+        memory_bytes = self._memory_bytes()
+        while memory_bytes > self.max_memory_bytes and self._memory:
+            key, (sources, table) = self._memory.popitem(last=False)
+            memory_bytes -= table.nbytes
+            path = self.root / f"{key}.parquet"
+            pq.write_table(table, path)
+            self._disk[key] = (sources, path, path.stat().st_size)
+            self.stats["spills"] += 1
+
+        disk_bytes = self._disk_bytes()
+        while disk_bytes > self.max_disk_bytes and self._disk:
+            _, (_, path, size) = self._disk.popitem(last=False)
+            os.remove(path)
+            disk_bytes -= size
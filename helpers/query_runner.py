@@ -0,0 +1,113 @@
+import sys
+import threading
+import time
+from helpers import data_loading as dl
+
+QUERY_TIMEOUT_SECONDS = 300
+# the stlite desktop build runs on Pyodide, which cannot start threads
+THREADS_AVAILABLE = sys.platform != "emscripten"
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed out"
+
+
+class QueryHandle:
+    """
+    A query running on a worker thread with its own DuckDB cursor.
+
+    The handle lives in session state so every rerun can poll progress() and status;
+    cancel() and the timeout both interrupt the cursor, which makes DuckDB abort the
+    query at its next check. result is an Arrow table, or None for statements that
+    return no rows (DDL, SET, ...).
+
+    prepare(cursor) runs on the worker before the query, under the same cancel and
+    timeout; refreshing the materialized saved queries a query reads is one such step.
+    When it returns a table, that is the result and the query does not run. sql may be
+    None for a handle that only runs its prepare step.
+
+    Where threads are not available the query runs to completion in the constructor,
+    without a timeout, and the handle is already finished when it is returned.
+    """
+
+    def __init__(self, cursor, sql: str, timeout=QUERY_TIMEOUT_SECONDS, on_done=None, prepare=None):
+        self.cursor = cursor
+        self.sql = sql
+        self.timeout = timeout
+        self.on_done = on_done
+        self.prepare = prepare
+        self.status = RUNNING
+        self.result = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.finished = None
+        self._stop_reason = None
+        self._finished = False
+        self._lock = threading.Lock()  # the cursor is not interrupted once it is closed
+        # query_progress() stays at -1 unless DuckDB tracks progress
+        self.cursor.execute("SET enable_progress_bar = true")
+        self.cursor.execute("SET enable_progress_bar_print = false")
+        self._timer = None
+        if not THREADS_AVAILABLE:
+            self._run()
+            return
+        if timeout:
+            self._timer = threading.Timer(timeout, self._stop, args=(TIMED_OUT,))
+            self._timer.daemon = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        if self._timer is not None:
+            self._timer.start()
+
+    def _run(self):
+        try:
+            if self.prepare is not None:
+                self.result = self.prepare(self.cursor)
+                if self._stop_reason:
+                    raise RuntimeError(f"Stopped ({self._stop_reason}) before the query ran")
+            if self.result is None and self.sql is not None:
+                self.cursor.execute(self.sql)
+                if self.cursor.description is not None:
+                    self.result = dl.to_arrow_table(self.cursor)
+            self.status = DONE
+            if self.on_done is not None:
+                self.on_done(self)
+        except Exception as e:
+            self.status = self._stop_reason or FAILED
+            self.error = str(e)
+        finally:
+            self.finished = time.perf_counter()
+            if self._timer is not None:
+                self._timer.cancel()
+            with self._lock:
+                self._finished = True
+                self.cursor.close()
+
+    def _stop(self, reason):
+        with self._lock:
+            if not self._finished and self.status == RUNNING:
+                self._stop_reason = reason
+                self.cursor.interrupt()
+
+    def cancel(self):
+        self._stop(CANCELLED)
+
+    @property
+    def running(self) -> bool:
+        return self.status == RUNNING
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def progress(self):
+        """Fraction of the query DuckDB reports as done, or None when it is not known."""
+        if not self.running:
+            return 1.0 if self.status == DONE else None
+        try:
+            percent = self.cursor.query_progress()
+        except Exception:
+            return None
+        return min(percent, 100) / 100 if percent >= 0 else None
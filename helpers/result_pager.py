@@ -0,0 +1,112 @@
+from collections import OrderedDict
+import pyarrow as pa
+from helpers import data_loading as dl
+from helpers.sql_templates import strip_terminator
+
+PAGE_SIZE = 1000
+MAX_KEPT_PAGES = 20  # pages kept after they were fetched, for paging back without re-running
+
+
+class ResultPager:
+    """
+    Pages through a query result by streaming Arrow record batches from an open cursor.
+
+    The query runs once on its own cursor and rows are read only as far as the requested
+    page. Pages already read are kept in a small LRU; paging back to an older page that was
+    dropped re-runs the query and streams forward again. The total row count comes from a
+    count(*) over the query, which DuckDB answers without materializing the rows.
+    """
+
+    def __init__(self, cursor_factory, sql: str, page_size=PAGE_SIZE):
+        self.cursor_factory = cursor_factory
+        self.sql = sql
+        self.page_size = page_size
+        self._pages = OrderedDict()
+        self._cursor = None
+        self._reader = None
+        self._next_page = 0
+        self._buffer = None
+        self._exhausted = False
+        self._rows_read = 0
+        self._total_rows = None
+        self.schema = self._open()
+
+    def _open(self):
+        if self._cursor is not None:
+            self._cursor.close()
+        self._cursor = self.cursor_factory()
+        self._cursor.execute(self.sql)
+        self._reader = dl.to_arrow_reader(self._cursor, self.page_size)
+        self._next_page = 0
+        self._buffer = None
+        self._exhausted = False
+        self._rows_read = 0
+        return self._reader.schema
+
+    @property
+    def total_rows(self) -> int:
+        if self._total_rows is None:
+            if self._exhausted:
+                self._total_rows = self._rows_read
+            else:
+                cursor = self.cursor_factory()
+                try:
+                    # on lines of their own so a trailing comment cannot swallow the closing paren
+                    count_sql = f"SELECT count(*) FROM (\n{strip_terminator(self.sql)}\n)"
+                    self._total_rows = cursor.execute(count_sql).fetchone()[0]
+                finally:
+                    cursor.close()
+        return self._total_rows
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-self.total_rows // self.page_size))
+
+    def _read_page(self) -> pa.Table:
+        """Read the next page_size rows from the stream."""
+        batches = [self._buffer] if self._buffer is not None else []
+        rows = self._buffer.num_rows if self._buffer is not None else 0
+        self._buffer = None
+        while rows < self.page_size:
+            try:
+                batch = self._reader.read_next_batch()
+            except StopIteration:
+                self._exhausted = True
+                break
+            batches.append(batch)
+            rows += batch.num_rows
+        table = pa.Table.from_batches(batches, schema=self.schema)
+        if table.num_rows > self.page_size:
+            rest = table.slice(self.page_size).combine_chunks().to_batches()
+            self._buffer = rest[0] if rest else None
+            table = table.slice(0, self.page_size)
+        self._next_page += 1
+        self._rows_read += table.num_rows
+        return table
+
+    def page(self, number: int) -> pa.Table:
+        """Return page number (0-based), reading the stream only as far as needed."""
+        if number in self._pages:
+            self._pages.move_to_end(number)
+            return self._pages[number]
+        if number < self._next_page:
+            self._open()
+        while self._next_page <= number and not self._exhausted:
+            page_number = self._next_page
+            self._pages[page_number] = self._read_page()
+            while len(self._pages) > MAX_KEPT_PAGES:
+                self._pages.popitem(last=False)
+        return self._pages.get(number, self.schema.empty_table())
+
+    def fetch_all(self) -> pa.Table:
+        """Materialize the whole result; only for explicit requests such as full exports."""
+        cursor = self.cursor_factory()
+        try:
+            return dl.to_arrow_table(cursor.sql(self.sql))
+        finally:
+            cursor.close()
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
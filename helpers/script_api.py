@@ -0,0 +1,61 @@
+import inspect
+from helpers import data_loading as dl
+from helpers.sql_templates import expand_sql_query
+
+BATCH_SIZE = 65536
+
+
+class ScriptWorkspace:
+    """
+    The data a custom script can read, as lazy DuckDB relations.
+
+    Aliases resolve through the same catalog and saved queries as the Query Data page.
+    Relations are not executed until the script fetches from them, so filters, projections
+    and aggregations chained onto them run inside DuckDB:
+
+        def show(workspace):
+            sales = workspace.table("sales").filter("amount > 100").aggregate("region, sum(amount)")
+            st.dataframe(sales.df())
+
+    The workspace owns one cursor, which is closed when the script returns.
+    """
+
+    def __init__(self, cursor, data_aliases: dict, saved_queries: dict):
+        self.cursor = cursor
+        self.data_aliases = data_aliases
+        self.saved_queries = saved_queries
+
+    @property
+    def aliases(self) -> list:
+        return sorted(set(self.data_aliases) | set(self.saved_queries))
+
+    def expand(self, query: str) -> str:
+        """The query with its {{alias}} references compiled, as Run Query would run it."""
+        return expand_sql_query(query, self.data_aliases, self.saved_queries)
+
+    def sql(self, query: str):
+        """A lazy relation over a query that may use {{alias}} references."""
+        return self.cursor.sql(self.expand(query))
+
+    def table(self, alias: str):
+        """A lazy relation over a data alias or saved query."""
+        return self.sql(f"SELECT * FROM {{{{{alias}}}}}")
+
+    def arrow(self, query: str, batch_size=BATCH_SIZE):
+        """Stream a query's result as a pyarrow RecordBatchReader."""
+        return dl.to_arrow_reader(self.sql(query), batch_size)
+
+    def close(self):
+        self.cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def run_script(show, workspace: ScriptWorkspace):
+    """Call a script's show(), passing the workspace when it takes an argument."""
+    if inspect.signature(show).parameters:
+        return show(workspace)
+    return show()
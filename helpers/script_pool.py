@@ -0,0 +1,255 @@
+from pathlib import Path
+import importlib.util
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import uuid
+import pyarrow as pa
+import pandas as pd
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+RUN_DIR = "script_runs"
+MAX_WORKERS = os.cpu_count() or 2
+CPU_SECONDS = 120
+MEMORY_BYTES = 2 * 1024 ** 3
+WALL_SECONDS = 600
+POLL_SECONDS = 0.2
+PACKAGE_ROOT = Path(__file__).resolve().parents[1]
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+KILLED = "killed"
+
+
+def write_arrow(reader_or_table, path):
+    """Write a table or RecordBatchReader to an Arrow IPC file, batch by batch."""
+    batches = reader_or_table.to_batches() if isinstance(reader_or_table, pa.Table) else reader_or_table
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, reader_or_table.schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+
+def read_arrow(path) -> pa.Table:
+    """Memory-map an Arrow IPC file; the table's buffers point into the file."""
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+def load_arrow(path) -> pa.Table:
+    """Read an Arrow IPC file into memory, so the file can be removed."""
+    with pa.OSFile(str(path), "rb") as source:
+        return pa.ipc.open_file(source).read_all()
+
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class IsolatedRun:
+    """
+    One run of a script's compute() in a child process.
+
+    Inputs are Arrow IPC files the child memory-maps and outputs come back as IPC files too,
+    so no table is pickled in either direction. The child sets itself an RLIMIT_CPU of
+    cpu_seconds and an RLIMIT_DATA of memory_bytes, where the platform has them, before it
+    imports the script; its resident memory is also polled and the process is killed past
+    memory_bytes, as it is past wall_seconds. Once the child exits the outputs are read into
+    memory and the run directory is removed.
+    """
+
+    def __init__(self, run_dir: Path, cpu_seconds, memory_bytes, wall_seconds):
+        self.run_dir = run_dir
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.wall_seconds = wall_seconds
+        self.status = RUNNING
+        self.error = None
+        self.peak_rss = 0
+        self.started = time.perf_counter()
+        self.finished = None
+        self.outputs = []  # [name, file name] of each output, in the order compute() returned them
+        self._tables = []  # (name, Arrow table) of each output, read before the run directory goes
+        self._process = None
+        self._done = threading.Event()
+
+    def _run(self, slots: threading.Semaphore):
+        with slots:
+            try:
+                with open(self.run_dir / "stderr.txt", "wb") as stderr:
+                    self._process = subprocess.Popen(
+                        [sys.executable, "-m", "helpers.script_pool", str(self.run_dir / "job.json")],
+                        cwd=PACKAGE_ROOT, stdout=subprocess.DEVNULL, stderr=stderr,
+                        # Arrow's default mimalloc pool reserves a gigabyte of address space up
+                        # front, which RLIMIT_DATA would count against the run
+                        env={**os.environ, "ARROW_DEFAULT_MEMORY_POOL": "system"})
+                    self._watch()
+                if self.status == DONE:
+                    self._tables = [(name, load_arrow(self.run_dir / file_name)) for name, file_name in self.outputs]
+            except Exception as e:
+                self.status, self.error = FAILED, str(e)
+            finally:
+                self.cleanup()
+        self.finished = time.perf_counter()
+        self._done.set()
+
+    def _watch(self):
+        process = self._process
+        while process.poll() is None:
+            rss = _rss_bytes(process.pid) or 0
+            self.peak_rss = max(self.peak_rss, rss)
+            if self.memory_bytes and rss > self.memory_bytes:
+                process.kill()
+                self.status, self.error = KILLED, f"Memory limit of {self.memory_bytes / 1024 ** 2:.0f} MB exceeded"
+            elif self.wall_seconds and time.perf_counter() - self.started > self.wall_seconds:
+                process.kill()
+                self.status, self.error = KILLED, f"Time limit of {self.wall_seconds}s exceeded"
+            time.sleep(POLL_SECONDS)
+        stderr = (self.run_dir / "stderr.txt").read_text(errors="replace")
+        if self.status == KILLED:
+            return
+        result_path = self.run_dir / "result.json"
+        if process.returncode == 0 and result_path.exists():
+            with open(result_path) as f:
+                result = json.load(f)
+            if result.get("memory_exceeded"):
+                self.status, self.error = KILLED, f"Memory limit of {self.memory_bytes / 1024 ** 2:.0f} MB exceeded"
+            elif "error" in result:
+                self.status, self.error = FAILED, result["error"]
+            else:
+                self.status, self.outputs = DONE, result["outputs"]
+        elif resource is not None and process.returncode == -signal.SIGXCPU:
+            self.status, self.error = KILLED, f"CPU time limit of {self.cpu_seconds}s exceeded"
+        else:
+            self.status, self.error = FAILED, stderr.strip() or f"Process exited with code {process.returncode}"
+
+    @property
+    def running(self) -> bool:
+        return not self._done.is_set()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def wait(self, timeout=None) -> bool:
+        return self._done.wait(timeout)
+
+    def cancel(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self.status, self.error = KILLED, "Cancelled"
+
+    def output_tables(self):
+        """Yield (name, Arrow table) for each output of a finished run."""
+        yield from self._tables
+
+    def cleanup(self):
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+
+
+class ScriptProcessPool:
+    """
+    Runs script compute() functions in child processes, at most max_workers at a time.
+
+    Every run gets a fresh process, so per-run limits apply cleanly and a run that is
+    killed takes nothing else down. Runs beyond max_workers wait for a free slot.
+    """
+
+    def __init__(self, root=RUN_DIR, max_workers=MAX_WORKERS):
+        self.root = Path(root)
+        shutil.rmtree(self.root, ignore_errors=True)  # runs do not outlive the process
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._slots = threading.Semaphore(max_workers)
+
+    def submit(self, script_path, inputs: dict, cpu_seconds=CPU_SECONDS, memory_bytes=MEMORY_BYTES,
+               wall_seconds=WALL_SECONDS) -> IsolatedRun:
+        """
+        Start compute() of a script on inputs, {alias: Arrow table or RecordBatchReader}.
+
+        Inputs are written to IPC files before this returns; the run itself is asynchronous
+        where threads are available, and finishes before this returns elsewhere.
+        """
+        # imported here so the child process, which imports this module, does not load DuckDB
+        from helpers.query_runner import THREADS_AVAILABLE
+        run_dir = self.root / uuid.uuid4().hex
+        run_dir.mkdir()
+        input_files = {}
+        for i, (alias, data) in enumerate(inputs.items()):
+            input_files[alias] = str((run_dir / f"input-{i}.arrow").resolve())
+            write_arrow(data, input_files[alias])
+        with open(run_dir / "job.json", "w") as f:
+            json.dump({"script": str(Path(script_path).resolve()), "inputs": input_files,
+                       "output_dir": str(run_dir.resolve()), "cpu_seconds": cpu_seconds,
+                       "memory_bytes": memory_bytes}, f)
+        run = IsolatedRun(run_dir, cpu_seconds, memory_bytes, wall_seconds)
+        if THREADS_AVAILABLE:
+            threading.Thread(target=run._run, args=(self._slots,), daemon=True).start()
+        else:
+            run._run(self._slots)
+        return run
+
+
+def _as_outputs(result) -> dict:
+    if not isinstance(result, dict):
+        result = {"result": result}
+    outputs = {}
+    for name, value in result.items():
+        if isinstance(value, pd.DataFrame):
+            value = pa.Table.from_pandas(value, preserve_index=False)
+        if not isinstance(value, (pa.Table, pa.RecordBatchReader)):
+            raise TypeError(f"compute() output '{name}' must be a pandas DataFrame or Arrow table, not {type(value).__name__}")
+        outputs[str(name)] = value
+    return outputs
+
+def _limit_resources(cpu_seconds, memory_bytes):
+    if resource is None:
+        return
+    if cpu_seconds:
+        # SIGXCPU at the soft limit; the kernel's SIGKILL at the hard one is only a backstop
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 5))
+    if memory_bytes:
+        # RLIMIT_DATA covers the heap and anonymous mappings but not the memory-mapped inputs;
+        # allocations past it fail with MemoryError rather than the process being killed
+        limit = getattr(resource, "RLIMIT_DATA", resource.RLIMIT_AS)
+        hard = resource.getrlimit(limit)[1]
+        if hard != resource.RLIM_INFINITY:
+            memory_bytes = min(memory_bytes, hard)
+        resource.setrlimit(limit, (memory_bytes, hard))
+
+def _child_main(job_path):
+    with open(job_path) as f:
+        job = json.load(f)
+    # set in the child itself rather than in a preexec_fn, which is unsafe in a threaded server
+    _limit_resources(job.get("cpu_seconds"), job.get("memory_bytes"))
+    output_dir = Path(job["output_dir"])
+    try:
+        spec = importlib.util.spec_from_file_location("user_script", job["script"])
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        inputs = {alias: read_arrow(path) for alias, path in job["inputs"].items()}
+        outputs = _as_outputs(module.compute(inputs))
+        result = {"outputs": []}
+        for i, (name, table) in enumerate(outputs.items()):
+            write_arrow(table, output_dir / f"output-{i}.arrow")
+            result["outputs"].append([name, f"output-{i}.arrow"])
+    except MemoryError:
+        result = {"error": traceback.format_exc(), "memory_exceeded": True}
+    except Exception:
+        result = {"error": traceback.format_exc()}
+    with open(output_dir / "result.json", "w") as f:
+        json.dump(result, f)
+
+
+if __name__ == "__main__":
+    _child_main(sys.argv[1])
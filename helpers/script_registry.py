@@ -0,0 +1,96 @@
+from pathlib import Path
+import ast
+import hashlib
+import importlib.util
+import sys
+import threading
+
+SCRIPT_DIR = "user_cache"
+
+
+class ScriptRegistry:
+    """
+    Custom scripts in a directory, imported only when they are used.
+
+    list_scripts() reads directory entries and nothing else. load() imports a script the
+    first time it is selected and keeps the module until the file's mtime or size changes;
+    even then the module is only re-executed when the content hash differs. Compiled code
+    is kept per content hash, so returning to an earlier version skips compilation too.
+    top_level_names() reads what a script defines from its syntax tree, without running it.
+    """
+
+    def __init__(self, directory=SCRIPT_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._modules = {}  # name -> (stat key, content hash, module)
+        self._code = {}  # content hash -> code object
+        self._names = {}  # name -> (stat key, names bound at the top level of the script)
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> Path:
+        return self.directory / f"{name}.py"
+
+    def list_scripts(self) -> list:
+        return sorted(p.stem for p in self.directory.iterdir() if p.suffix == ".py" and p.is_file())
+
+    def load(self, name: str):
+        """Return the module of a script, importing or re-importing it only if it changed."""
+        path = self.path(name)
+        stat = path.stat()
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._modules.get(name)
+            if cached is not None and cached[0] == stat_key:
+                return cached[2]
+            source = path.read_bytes()
+            content_hash = hashlib.sha256(source).hexdigest()
+            if cached is not None and cached[1] == content_hash:
+                self._modules[name] = (stat_key, content_hash, cached[2])
+                return cached[2]
+
+            code = self._code.get(content_hash)
+            if code is None:
+                code = compile(source, str(path), "exec")
+                self._code[content_hash] = code
+            module_name = f"user_page_{name}"
+            spec = importlib.util.spec_from_file_location(module_name, path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            exec(code, module.__dict__)
+            self._modules[name] = (stat_key, content_hash, module)
+            return module
+
+    def top_level_names(self, name: str) -> set:
+        """
+        Names a script defines or imports at its top level, parsed rather than executed.
+
+        Raises SyntaxError when the script does not parse.
+        """
+        path = self.path(name)
+        stat = path.stat()
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._names.get(name)
+            if cached is not None and cached[0] == stat_key:
+                return cached[1]
+            names = set()
+            for node in ast.parse(path.read_bytes(), str(path)).body:
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    names.add(node.name)
+                elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                    targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                    names.update(t.id for t in targets if isinstance(t, ast.Name))
+                elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                    names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+            self._names[name] = (stat_key, names)
+            return names
+
+    def show(self, name: str):
+        """The script's show() function, or None when it does not define one."""
+        return getattr(self.load(name), "show", None)
+
+    def forget(self, name: str):
+        with self._lock:
+            self._modules.pop(name, None)
+            self._names.pop(name, None)
+            sys.modules.pop(f"user_page_{name}", None)
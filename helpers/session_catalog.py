@@ -0,0 +1,90 @@
+import shutil
+import streamlit as st
+from helpers import materialize as mz
+from helpers import profiler
+from helpers.catalog import ViewCatalog, SharedViews
+from helpers.catalog_store import CatalogStore
+from helpers.memory_manager import enforce_budget, touch, SpillDirectory, SPILL_DIR
+from helpers.sql_templates import template_aliases, saved_query_order
+from helpers.parsed_store import ParsedStore
+from helpers.shadow_parquet import ShadowTranscoder
+from helpers.workspace import workspace_connection, session_connection
+
+
+@st.cache_resource
+def shared_views() -> SharedViews:
+    """Views of the cached tables, created once in the workspace for every session."""
+    return SharedViews(workspace_connection().cursor(), CatalogStore())
+
+@st.cache_resource
+def shadow_transcoder() -> ShadowTranscoder:
+    """Process-wide Parquet shadow copies of cached CSV and Excel files."""
+    return ShadowTranscoder()
+
+@st.cache_resource
+def parsed_store() -> ParsedStore:
+    """Process-wide store of parsed uploads, shared by every session."""
+    return ParsedStore()
+
+@st.cache_resource
+def spill_directory() -> str:
+    """Where sessions spill tables to; spilled files do not outlive the process."""
+    shutil.rmtree(SPILL_DIR, ignore_errors=True)
+    return SPILL_DIR
+
+def session_spill_directory() -> SpillDirectory:
+    """This session's own spill directory, removed when the session's state is discarded."""
+    if st.session_state.get("spill_directory") is None:
+        st.session_state["spill_directory"] = SpillDirectory(spill_directory())
+    return st.session_state["spill_directory"]
+
+def enforce_memory_budget() -> dict:
+    """Spill this session's least recently used tables once they outgrow its memory budget."""
+    with profiler.stage("memory budget"):
+        st.session_state["session_memory"] = enforce_budget(
+            st.session_state["session_files"], directory=session_spill_directory().path)
+    profiler.count("tables spilled", st.session_state["session_memory"]["spilled_now"])
+    return st.session_state["session_memory"]
+
+def mark_used(template: str):
+    """Mark the session tables a query reads, directly or through saved queries, as just used."""
+    saved_queries = st.session_state["saved_queries"]
+    aliases = set(template_aliases(template))
+    try:
+        for name in saved_query_order(aliases, saved_queries):
+            aliases.update(template_aliases(saved_queries[name]))
+    except ValueError:
+        pass  # a reference cycle; expanding the query reports it
+    touch(st.session_state["session_files"], aliases)
+
+def queryable_files() -> list:
+    """The session's files and cached tables, as queries see them."""
+    enforce_memory_budget()
+    files = st.session_state["session_files"] + st.session_state["tables"]
+    if st.session_state.get("shadow_parquet"):
+        # cached text files are queried through their Parquet copies once those are written
+        files = shadow_transcoder().apply(files)
+    return files
+
+@profiler.profiled("register views")
+def register_views_in_duckdb(available_files):
+    """Bring this session's DuckDB views in line with available_files, applying only what changed."""
+    con, schema = session_connection()
+    catalog = st.session_state.get("view_catalog")
+    if catalog is None or catalog.con is not con:
+        # first run, or the pool closed this session's connection to make room for others
+        st.session_state["view_catalog"] = ViewCatalog(con, schema, shared_views())
+    result = st.session_state["view_catalog"].sync(available_files)
+    profiler.count("views created", result["created"])
+    profiler.count("views dropped", result["dropped"])
+    return result
+
+def data_aliases_from(available_files) -> dict:
+    """Alias → reference for every catalog entry and materialized saved query."""
+    aliases = {
+        file["Alias"]: file["Reference"]
+        for file in available_files
+        if file.get("Alias") and file.get("Reference")
+    }
+    aliases.update(mz.materialized_aliases(st.session_state["materialized_queries"]))
+    return aliases
@@ -0,0 +1,126 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import duckdb
+import hashlib
+import json
+import os
+import threading
+from helpers import data_loading as dl
+from helpers.query_runner import THREADS_AVAILABLE
+
+SHADOW_DIR = "shadow_parquet"
+SHADOW_INDEX_FILE = "index.json"
+SHADOW_FILE_TYPES = ("csv", "xlsx")
+SHADOW_COMPRESSION = "zstd"
+
+
+def shadow_enabled_by_default() -> bool:
+    return os.environ.get("DUCKBOARD_SHADOW_PARQUET", "").lower() in ("1", "true", "yes")
+
+def source_select(file_info: dict) -> str:
+    """The SELECT a shadow copy is written from: the sniffed CSV read with its types pinned, else the reference."""
+    if file_info.get("File Type") == "csv":
+        with open(file_info["Path"], "rb") as f:
+            encoding = dl.sniff_encoding(f.read(dl.CSV_SNIFF_BYTES))
+        dialect = dl.sniff_csv_dialect(file_info["Path"], encoding)
+        return f"SELECT * {dialect['prompt'].rstrip().rstrip(';')}"
+    return f"SELECT * FROM {file_info['Reference']}"
+
+
+class ShadowTranscoder:
+    """
+    Columnar shadow copies of cached CSV and Excel files.
+
+    reference() returns a read_parquet reference for a file whose shadow copy matches the
+    source's current mtime and size; otherwise it queues a transcode on a background thread
+    and returns None, so the text file keeps being read until the copy is ready. Copies are
+    written next to each other under root and tracked in a JSON index there.
+
+    Where threads are not available the transcode runs inside reference(), which then
+    returns the new copy's reference.
+    """
+
+    def __init__(self, root=SHADOW_DIR, workers=1):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / SHADOW_INDEX_FILE
+        self._index = {}  # source path -> {"stat": [mtime, size], "shadow": path}
+        if self.index_path.exists():
+            with open(self.index_path, "r") as f:
+                self._index = json.load(f)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shadow") if THREADS_AVAILABLE else None
+        self._pending = {}  # source path -> stat being transcoded
+        self.errors = {}  # source path -> error of the last failed transcode
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def eligible(file_info: dict) -> bool:
+        return (file_info.get("Type") == "File" and file_info.get("File Type") in SHADOW_FILE_TYPES
+                and bool(file_info.get("Path")) and bool(file_info.get("Reference")))
+
+    def shadow_path(self, source: str) -> Path:
+        return self.root / f"{hashlib.sha256(source.encode()).hexdigest()[:16]}.parquet"
+
+    def reference(self, file_info: dict):
+        source = file_info["Path"]
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        current = [stat.st_mtime, stat.st_size]
+        with self._lock:
+            ready = self._ready_reference(source, current)
+            if ready is not None:
+                return ready
+            failed = self.errors.get(source)
+            if self._pending.get(source) == current or (failed is not None and failed[0] == current):
+                return None
+            self._pending[source] = current
+            if self._executor is not None:
+                self._executor.submit(self._transcode, dict(file_info), current)
+                return None
+        self._transcode(dict(file_info), current)
+        with self._lock:
+            return self._ready_reference(source, current)
+
+    def _ready_reference(self, source: str, stat):
+        entry = self._index.get(source)
+        if entry is not None and entry["stat"] == stat and Path(entry["shadow"]).exists():
+            return f"read_parquet('{Path(entry['shadow']).resolve().as_posix()}')"
+        return None
+
+    def apply(self, available_files) -> list:
+        """available_files with every eligible entry pointed at its shadow copy where one is ready."""
+        result = []
+        for file_info in available_files:
+            reference = self.reference(file_info) if self.eligible(file_info) else None
+            result.append({**file_info, "Reference": reference} if reference else file_info)
+        return result
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _transcode(self, file_info: dict, stat):
+        source = file_info["Path"]
+        target = self.shadow_path(source)
+        tmp_path = target.with_suffix(".tmp")
+        try:
+            escaped = tmp_path.as_posix().replace("'", "''")
+            duckdb.connect().execute(
+                f"COPY ({source_select(file_info)}) TO '{escaped}' (FORMAT parquet, COMPRESSION {SHADOW_COMPRESSION})")
+            os.replace(tmp_path, target)
+        except Exception as e:
+            with self._lock:
+                self.errors[source] = (stat, str(e))
+                self._pending.pop(source, None)
+            tmp_path.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._index[source] = {"stat": stat, "shadow": target.as_posix()}
+            self.errors.pop(source, None)
+            self._pending.pop(source, None)
+            tmp_index = self.index_path.with_suffix(".tmp")
+            with open(tmp_index, "w") as f:
+                json.dump(self._index, f)
+            os.replace(tmp_index, self.index_path)
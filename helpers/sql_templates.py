@@ -0,0 +1,131 @@
+import duckdb
+import functools
+import re
+
+ALIAS_PATTERN = re.compile(r"\{\{([\w\-]+)\}\}")  # Matches {{alias_name}}
+# statements a WITH clause can be put in front of
+CTE_COMPATIBLE = re.compile(r"^\s*(\(|select\b|from\b|with\b|values\b|pivot\b|unpivot\b)", re.IGNORECASE)
+LEADING_WITH = re.compile(r"^\s*with\s+(recursive\s+)?", re.IGNORECASE)
+
+
+def template_aliases(template: str) -> list:
+    """Return the {{alias}} names a template refers to, in order of first use."""
+    return list(dict.fromkeys(ALIAS_PATTERN.findall(template)))
+
+def saved_query_order(root_aliases, saved_queries: dict) -> list:
+    """
+    Order the saved queries reachable from root_aliases so dependencies come first.
+
+    Raises ValueError on a reference cycle, naming the saved queries involved.
+    """
+    order = []
+    state = {}  # alias -> "visiting" | "done"
+
+    def visit(alias, path):
+        if state.get(alias) == "done":
+            return
+        if state.get(alias) == "visiting":
+            cycle = path[path.index(alias):] + [alias]
+            raise ValueError(f"Circular reference between saved queries: {' -> '.join(cycle)}")
+        state[alias] = "visiting"
+        for dependency in template_aliases(saved_queries[alias]):
+            if dependency in saved_queries:
+                visit(dependency, path + [alias])
+        state[alias] = "done"
+        order.append(alias)
+
+    for alias in root_aliases:
+        if alias in saved_queries:
+            visit(alias, [])
+    return order
+
+def strip_terminator(sql: str) -> str:
+    """
+    Drop the semicolon that ends a statement, and surrounding whitespace.
+
+    The semicolon is found as the last token, so one followed by a comment is dropped too,
+    while a semicolon inside a string or a comment is left alone. Comments before it stay,
+    so callers embedding the result put it on lines of its own.
+    """
+    sql = sql.strip()
+    try:
+        tokens = duckdb.tokenize(sql)
+    except duckdb.Error:
+        return sql
+    if tokens and sql[tokens[-1][0]] == ";":
+        sql = sql[:tokens[-1][0]].rstrip()
+    return sql
+
+def _clean_subquery(sql: str) -> str:
+    return sql.strip().rstrip(";").strip()
+
+@functools.lru_cache(maxsize=256)
+def _compile(user_query: str, data_aliases: tuple, saved_queries: tuple) -> str:
+    data_aliases = dict(data_aliases)
+    saved_queries = dict(saved_queries)
+
+    # data sources win over saved queries of the same name, as they always have
+    saved_queries = {name: sql for name, sql in saved_queries.items() if name not in data_aliases}
+    for alias in template_aliases(user_query):
+        if alias not in data_aliases and alias not in saved_queries:
+            raise ValueError(f"Unknown alias '{{{{{alias}}}}}' in query.")
+    order = saved_query_order(template_aliases(user_query), saved_queries)
+
+    if not CTE_COMPATIBLE.match(user_query):
+        # DDL and other statements cannot take a WITH clause, so saved queries are inlined
+        def inline(match):
+            alias = match.group(1)
+            if alias in data_aliases:
+                return data_aliases[alias]
+            return f"({ALIAS_PATTERN.sub(inline, _clean_subquery(saved_queries[alias]))})"
+        return ALIAS_PATTERN.sub(inline, user_query)
+
+    uses = {}
+    for template in [user_query] + [saved_queries[alias] for alias in order]:
+        for alias in ALIAS_PATTERN.findall(template):
+            uses[alias] = uses.get(alias, 0) + 1
+
+    def resolve(match):
+        alias = match.group(1)
+        if alias in data_aliases:
+            return data_aliases[alias]
+        if alias in saved_queries:
+            return f'(SELECT * FROM "{alias}")'
+        raise ValueError(f"Unknown alias '{{{{{alias}}}}}' in saved query.")
+
+    ctes = []
+    for alias in order:
+        body = ALIAS_PATTERN.sub(resolve, _clean_subquery(saved_queries[alias]))
+        # a saved query used more than once is computed once and shared
+        materialized = " MATERIALIZED" if uses.get(alias, 0) > 1 else ""
+        ctes.append(f'"{alias}" AS{materialized} (\n{body}\n)')
+
+    query = ALIAS_PATTERN.sub(resolve, user_query)
+    if not ctes:
+        return query
+    leading_with = LEADING_WITH.match(query)
+    if leading_with:
+        recursive = leading_with.group(1) or ""
+        return f"WITH {recursive}{', '.join(ctes)},\n{query[leading_with.end():]}"
+    return f"WITH {', '.join(ctes)}\n{query}"
+
+def expand_sql_query(user_query: str, data_aliases: dict, saved_queries: dict) -> str:
+    """
+    Compile {{alias}} references in a SQL query into a single DuckDB statement.
+
+    Args:
+        user_query (str): SQL query containing {{alias}} references
+        data_aliases (dict): alias → table/view reference (e.g., read_parquet(...))
+        saved_queries (dict): alias → saved query SQL, which may itself use {{alias}}
+
+    Data aliases are inlined. Saved queries are emitted once each as named CTEs, in
+    dependency order and MATERIALIZED when used more than once. Compiled output is
+    memoized on the template and its inputs.
+
+    Returns:
+        str: Expanded SQL query with all {{alias}} replaced
+
+    Raises:
+        ValueError: on an unknown alias or a cycle between saved queries
+    """
+    return _compile(user_query, tuple(sorted(data_aliases.items())), tuple(sorted(saved_queries.items())))
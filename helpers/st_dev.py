@@ -1,4 +1,51 @@
+import collections
+import json
+import os
 import streamlit as st
+from helpers import profiler
+from helpers.workspace import workspace_connection
+
+# Show the developer sidebar, with the rerun profiler, on every page
+DEVELOPER_SIDEBAR = os.environ.get("DUCKBOARD_DEVELOPER", "").lower() in ("1", "true", "yes")
+
+def record_rerun(profile):
+    """Keep a finished rerun's profile in the session's recent history."""
+    if profile is None:
+        return
+    history = st.session_state.get("rerun_profiles")
+    if history is None:
+        history = st.session_state["rerun_profiles"] = collections.deque(maxlen=profiler.HISTORY_LENGTH)
+    history.append(profile)
+
+def rerun_profile_panel():
+    history = st.session_state.get("rerun_profiles")
+    if not history:
+        return
+    profile = history[-1]
+    st.subheader("Rerun profile")
+    st.caption(f"{profile.page} · {profile.seconds * 1000:,.0f} ms")
+    st.dataframe(profile.breakdown(), hide_index=True, use_container_width=True,
+                 column_config={"ms": st.column_config.NumberColumn(format="%.1f"),
+                                "% of rerun": st.column_config.NumberColumn(format="%.0f%%")})
+    if profile.counters:
+        st.dataframe(profile.counters, use_container_width=True)
+
+    sizes = profiler.session_state_sizes(st.session_state)
+    database = profiler.duckdb_memory(workspace_connection().cursor())
+    profile.memory = {
+        "session_state_bytes": int(sizes["bytes"].sum()),
+        "duckdb_bytes": int(database["memory_usage_bytes"].sum()) if "memory_usage_bytes" in database else None,
+    }
+    st.caption(f"Session state ≈ {profile.memory['session_state_bytes'] / 1024 ** 2:,.1f} MB")
+    st.dataframe(sizes.head(10), hide_index=True, use_container_width=True)
+    if profile.memory["duckdb_bytes"] is not None:
+        st.caption(f"DuckDB memory {profile.memory['duckdb_bytes'] / 1024 ** 2:,.1f} MB")
+    st.dataframe(database, hide_index=True, use_container_width=True)
+
+    st.download_button(
+        f"Export last {len(history)} reruns as JSON",
+        json.dumps([run.to_dict() for run in history], indent=2),
+        file_name="rerun_profiles.json", mime="application/json")
 
 def developer_sidebar():
     with st.sidebar:
@@ -8,4 +55,5 @@ def developer_sidebar():
             st.switch_page("DuckBoard.py")
             st.rerun()
 
-        st.toggle("debug mode", key="debug_mode")
\ No newline at end of file
+        st.toggle("debug mode", key="debug_mode")
+        rerun_profile_panel()
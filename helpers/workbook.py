@@ -0,0 +1,103 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import itertools
+import os
+import weakref
+
+
+def frame_to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Convert a parsed sheet to Arrow, falling back to strings for mixed-type object columns."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        mixed = {col: df[col].astype("string") for col in df.columns if df[col].dtype == object}
+        return pa.Table.from_pandas(df.assign(**mixed), preserve_index=False)
+
+
+class LazyWorkbook:
+    """
+    An uploaded xlsx opened once, with sheets parsed only when they are used.
+
+    pd.ExcelFile opens the workbook with openpyxl in read-only mode, so listing the sheets
+    reads only the workbook metadata and each parse streams the rows of a single sheet.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.excel = pd.ExcelFile(path, engine="openpyxl")
+        self.sheet_names = list(self.excel.sheet_names)
+        # the spool file goes once every sheet is in the store, or with the workbook
+        self._finalizer = weakref.finalize(self, _release, self.excel, path)
+
+    @property
+    def closed(self) -> bool:
+        return not self._finalizer.alive
+
+    def parse(self, sheet_name: str, nrows=None) -> pd.DataFrame:
+        if self.closed:
+            raise ValueError(f"Sheet '{sheet_name}' is no longer stored and its workbook was closed; upload it again")
+        return self.excel.parse(sheet_name, nrows=nrows)
+
+    def close(self):
+        """Close the workbook and remove its spool file."""
+        self._finalizer()
+
+    def close_if_stored(self, store, file_hash: str):
+        """Close the workbook once every sheet is in the store, since it is not read again."""
+        if all(store.has_table(file_hash, name) for name in self.sheet_names):
+            self.close()
+
+    def sheets(self, store, file_hash: str) -> dict:
+        """Return a LazySheet for every sheet, keyed by sheet name."""
+        self.close_if_stored(store, file_hash)
+        return {name: LazySheet(self, name, store, file_hash) for name in self.sheet_names}
+
+
+def _release(excel, path):
+    excel.close()
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class LazySheet:
+    """
+    One sheet of a LazyWorkbook, kept as Parquet in the parsed store once it is loaded.
+
+    Previews parse only the requested rows. The first full load transcodes the sheet to the
+    store and drops the DataFrame, later loads memory-map the stored Parquet.
+    """
+
+    def __init__(self, workbook: LazyWorkbook, sheet_name: str, store, file_hash: str):
+        self.workbook = workbook
+        self.sheet_name = sheet_name
+        self.store = store
+        self.file_hash = file_hash
+
+    def __repr__(self):
+        return f"<LazySheet '{self.sheet_name}'>"
+
+    @property
+    def materialized(self) -> bool:
+        return self.store.has_table(self.file_hash, self.sheet_name)
+
+    def head(self, n=10) -> pa.Table:
+        if self.materialized:
+            parquet_file = pq.ParquetFile(self.store.table_path(self.file_hash, self.sheet_name))
+            batches = list(itertools.islice(parquet_file.iter_batches(batch_size=n), 1))
+            return pa.Table.from_batches(batches, schema=parquet_file.schema_arrow)
+        return frame_to_arrow(self.workbook.parse(self.sheet_name, nrows=n))
+
+    def to_arrow(self) -> pa.Table:
+        table = self.store.get_table(self.file_hash, self.sheet_name)
+        if table is None:
+            parsed = frame_to_arrow(self.workbook.parse(self.sheet_name))
+            self.store.put_table(self.file_hash, self.sheet_name, parsed, "xlsx", "")
+            self.workbook.close_if_stored(self.store, self.file_hash)
+            table = self.store.get_table(self.file_hash, self.sheet_name)
+            if table is None:
+                # a sheet larger than the whole store is evicted straight away and stays in memory
+                table = parsed
+        return table
@@ -0,0 +1,113 @@
+from collections import OrderedDict
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import streamlit as st
+import duckdb
+import hashlib
+import os
+import threading
+import weakref
+
+# Path of a persistent .duckdb workspace; unset keeps everything in memory as before
+WORKSPACE_FILE = os.environ.get("DUCKBOARD_WORKSPACE", "")
+# Where DuckDB spills intermediate results of out-of-core queries
+TEMP_DIRECTORY = os.environ.get("DUCKBOARD_TEMP_DIR", "duckdb_tmp")
+WORKSPACE_LOCATION = "Workspace"
+# Sessions that hold their own connection at once; past this the least recently active one is closed
+MAX_SESSION_CONNECTIONS = int(os.environ.get("DUCKBOARD_MAX_CONNECTIONS", "32"))
+SESSION_SCHEMA_PREFIX = "session_"
+
+
+def open_workspace(path=WORKSPACE_FILE, temp_directory=TEMP_DIRECTORY):
+    """Open the workspace database, in memory when no path is given."""
+    con = duckdb.connect(path or ":memory:")
+    con.execute("SET temp_directory = ?", [temp_directory])
+    return con
+
+@st.cache_resource
+def workspace_connection():
+    """Process-wide connection to the workspace database."""
+    return open_workspace()
+
+class ConnectionPool:
+    """
+    Per-session connections to the workspace database.
+
+    Each session gets its own DuckDB connection to the shared database and its own schema
+    for private views, so sessions neither overwrite each other's aliases nor queue behind
+    one connection. A session's connection is released when its state is discarded (see
+    SessionLease); past max_connections the least recently active session is closed and
+    its schema dropped as well, and it gets a fresh connection on its next rerun.
+    """
+
+    def __init__(self, con, max_connections=MAX_SESSION_CONNECTIONS):
+        self.con = con
+        self.max_connections = max_connections
+        self._sessions = OrderedDict()  # session id -> (connection, schema)
+        self._lock = threading.Lock()
+        # private schemas a previous process left in a persistent workspace
+        stale = self.con.execute(
+            "SELECT schema_name FROM duckdb_schemas() WHERE database_name = current_database() AND starts_with(schema_name, ?)",
+            [SESSION_SCHEMA_PREFIX]).fetchall()
+        for (schema,) in stale:
+            self.con.execute(f'DROP SCHEMA "{schema}" CASCADE')
+
+    def connect(self, session_id: str):
+        """Return (connection, private schema) of a session, opening them on first use."""
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions.move_to_end(session_id)
+                return self._sessions[session_id]
+            schema = SESSION_SCHEMA_PREFIX + hashlib.sha256(session_id.encode()).hexdigest()[:12]
+            self.con.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+            self._sessions[session_id] = (self.con.cursor(), schema)
+            while len(self._sessions) > self.max_connections:
+                self._close(*self._sessions.popitem(last=False))
+            return self._sessions[session_id]
+
+    def release(self, session_id: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._close(session_id, self._sessions.pop(session_id))
+
+    def _close(self, session_id, session):
+        connection, schema = session
+        connection.close()
+        self.con.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+
+    def __len__(self):
+        return len(self._sessions)
+
+@st.cache_resource
+def connection_pool() -> ConnectionPool:
+    """Process-wide pool of per-session connections to the workspace database."""
+    return ConnectionPool(workspace_connection())
+
+class SessionLease:
+    """Releases a session's pooled connection along with the object."""
+
+    def __init__(self, pool: ConnectionPool, session_id: str):
+        self.session_id = session_id
+        # kept in the session's state, so the connection goes when the session does
+        self._finalizer = weakref.finalize(self, pool.release, session_id)
+
+    def release(self):
+        self._finalizer()
+
+def session_connection():
+    """(connection, private schema) of the current Streamlit session."""
+    session_id = get_script_run_ctx().session_id
+    lease = st.session_state.get("connection_lease")
+    if lease is None or lease.session_id != session_id:
+        st.session_state["connection_lease"] = SessionLease(connection_pool(), session_id)
+    return connection_pool().connect(session_id)
+
+def is_persistent() -> bool:
+    return bool(WORKSPACE_FILE)
+
+def import_table(con, alias: str, table):
+    """Copy an in-memory Arrow table into the workspace as a DuckDB table named alias."""
+    con.register("_duckboard_import", table)
+    try:
+        con.execute(f"CREATE OR REPLACE TABLE {alias} AS SELECT * FROM _duckboard_import")
+    finally:
+        con.unregister("_duckboard_import")
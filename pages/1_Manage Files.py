@@ -1,13 +1,18 @@
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
 from pathlib import Path
 from helpers import data_loading as dl
-import hashlib
-# from helpers.st_dev import developer_sidebar
-# developer_sidebar()
+from helpers.workbook import LazySheet
+from helpers.memory_manager import SpilledTable, LAST_USED
+from helpers.session_catalog import parsed_store, enforce_memory_budget
+from helpers import workspace as ws
+from helpers.catalog_store import CatalogStore
+from helpers import profiler
+import os
+import time
 
 
-CACHE_FILE = "file_cache.json"
 if "session_files" not in st.session_state:
     st.session_state["session_files"] = []
 
@@ -98,37 +103,55 @@ def file_Upload_Section():
         )
         duplacate_files = []
         if uploaded_file:
-            file_bytes = uploaded_file.read()
-            uploaded_file.seek(0)  # Reset the file pointer to the beginning
-            file_hash = hashlib.sha256(file_bytes).hexdigest()
-            df, file_type, encoding = dl.data_reader(uploaded_file)
-            
-            payload = {
-                "File Name": uploaded_file.name,
-                "File Hash": file_hash,
-                "File Size": uploaded_file.size,
-                "File Type": file_type,
-                "Encoding": encoding,
-                "Type": "Temporary",
-                "Location": "In-memory",
-                'Validation': "Pending",
-                "Path": "",
-                'Alias': "",
-                "Reference": "",
-                "df": df,
-            }
-
-            duplicate = dl.check_membership(
-                file_hash, "File Hash",
+            suffix = Path(uploaded_file.name).suffix
+            spooled = st.session_state.get("spooled_upload")
+            if spooled is None or spooled[0] != uploaded_file.file_id:
+                # one chunked pass writes the upload to disk and hashes it, once per upload
+                # rather than on every rerun the uploader still holds the file
+                spool_path, file_hash, file_size = dl.spool_upload(uploaded_file, suffix=suffix)
+                st.session_state["spooled_upload"] = (uploaded_file.file_id, file_hash, file_size)
+            else:
+                _, file_hash, file_size = spooled
+                spool_path = None
+
+            if "upload_hashes" not in st.session_state:
+                st.session_state["upload_hashes"] = dl.HashIndex("File Hash")
+            duplicate = st.session_state["upload_hashes"].contains(
+                file_hash,
                 st.session_state["session_files"],
                 st.session_state['uploaded_files'],
                 st.session_state["pending_parquet_partitions"])
             
-            if not duplicate:
+            if duplicate:
+                if spool_path is not None:
+                    os.remove(spool_path)
+            else:
+                if spool_path is None:
+                    # the entry was removed since the upload was hashed, so it is loaded again
+                    spool_path, _, _ = dl.spool_upload(uploaded_file, suffix=suffix)
+                # known uploads are a lookup by hash, workbook sheets are parsed on first use
+                df, file_type, encoding = dl.load_upload(spool_path, uploaded_file.type, file_hash, parsed_store())
+
+                payload = {
+                    "File Name": uploaded_file.name,
+                    "File Hash": file_hash,
+                    "File Size": file_size,
+                    "File Type": file_type,
+                    "Encoding": encoding,
+                    "Type": "Temporary",
+                    "Location": "In-memory",
+                    'Validation': "Pending",
+                    "Path": "",
+                    'Alias': "",
+                    "Reference": "",
+                    "df": df,
+                    LAST_USED: time.time(),
+                }
+
                 if file_type == "parquet partition":
                     st.session_state["pending_parquet_partitions"].append(payload)
 
-                elif isinstance(df, pd.DataFrame):
+                elif isinstance(df, pa.Table):
                         payload['df'] = df
                         st.session_state["session_files"].append(payload)
 
@@ -155,13 +178,13 @@ def file_Upload_Section():
             encoding = new_file['Encoding']
 
             with st.expander(f"File Name: '{file_name}' - File Type: '{file_type}: {encoding}'"):
-                st.dataframe(df.head(10))
+                st.dataframe(dl.preview(df, 10))
                 if isinstance(df, dict):
                     # for xlsx with multiple sheets a dict is returned
                     st.warning(f"File {file_name} has multiple sheets. Please select sheets to load.")
                 elif file_type.startswith("Error"):
                     st.error(f"FileTypeError: {file_type}") 
-                elif isinstance(df, pd.DataFrame) and df.empty:
+                elif isinstance(df, pa.Table) and df.num_rows == 0:
                     if file_type == "parquet partition":
                         st.warning(f"File {file_name} may be a parquet partition of a larger dataset.")
                     else:
@@ -239,6 +262,10 @@ def parquet_partition_handling():
                             # Update the DataFrame with full paths
                     if st.button("Add to Tables"):
                         for _, row in pd.DataFrame(st.session_state["ppp_table"]).iterrows():
+                            if row["Type"] == "Directory":
+                                row["Reference"] = dl.partitioned_parquet_reference(row["Path"])
+                            else:
+                                row["Reference"] = f"read_parquet('{row['Path']}')"
 
                             if row.to_dict() not in st.session_state["tables"]:
                                 st.session_state["tables"].append(row.to_dict())
@@ -257,7 +284,7 @@ def parquet_partition_handling():
                         st.session_state["pending_parquet_partitions"] = []
                         st.session_state["ppp_table"] = st.session_state["ppp_table"].head(0).copy()
 
-                        dl.save_cache(CACHE_FILE, st.session_state["tables"])
+                        CatalogStore().save(st.session_state["tables"])
                         st.rerun()
 
 
@@ -295,6 +322,10 @@ st.subheader("Tracked Tables & Files")
 
 # with tab1:
 st.write("##### Session Files")
+memory = enforce_memory_budget()
+if st.session_state["session_files"]:
+    st.caption(f"Session tables in memory: {memory['resident'] / 1024 ** 2:,.0f} of {memory['budget'] / 1024 ** 2:,.0f} MB"
+               f" · {memory['spilled']} spilled to disk")
 st.session_state["available_files"] = st.session_state["session_files"] + st.session_state["tables"]
 
 if st.session_state["available_files"]:
@@ -302,6 +333,9 @@ if st.session_state["available_files"]:
     st.write("Add file name and path to save files to cache. You can also set an alias for a file or table.")
 
     st.toggle("Session Files", key="toggle_session_files")
+    st.session_state["shadow_parquet"] = st.toggle(
+        "Query cached CSV and Excel files through Parquet copies", value=st.session_state.get("shadow_parquet", False),
+        help="Cached files are transcoded to compressed Parquet in the background and re-transcoded when they change")
     if st.session_state["toggle_session_files"]:
         all_files = pd.DataFrame(
             st.data_editor(st.session_state["available_files"], hide_index=False,
@@ -310,6 +344,9 @@ if st.session_state["available_files"]:
         
         if st.button("Update session files"):
             for idx, row in all_files.iterrows():
+                if row.get("Location") == ws.WORKSPACE_LOCATION:
+                    # imported tables live in the workspace database, not at a path
+                    continue
                 valid_res, path_res, type_res = validate_full_path((row["Path"]))
                 all_files.at[idx, "Validation"] = valid_res
                 all_files.at[idx, "Path"] = path_res
@@ -319,23 +356,30 @@ if st.session_state["available_files"]:
                 if type_res == "File":
                     all_files.at[idx, "Reference"] = f"read_{row["File Type"]}('{path_res}')"
                 elif type_res == "Directory":
-                    dir_path = (Path(path_res) / "*.parquet").resolve().as_posix()
-                    all_files.at[idx, "Reference"] = f"read_parquet('{dir_path}')"
+                    all_files.at[idx, "Reference"] = dl.partitioned_parquet_reference(path_res)
                 else:
                     if row["Alias"] == "":
                         all_files.at[idx, "Alias"] = row["File Name"]
-                    all_files.at[idx, "Reference"] = row["Alias"]
+                    # in-memory tables are registered with DuckDB under their alias
+                    all_files.at[idx, "Reference"] = all_files.at[idx, "Alias"]
 
                 if valid_res == "Valid":
                     all_files.at[idx, "df"] = ""
 
             st.session_state["available_files"] = all_files.to_dict('records')
+            # keep aliases of in-memory tables on the session entries that own the data
+            temporary_rows = all_files[all_files["Validation"] != "Valid"].drop_duplicates("File Name").set_index("File Name")
+            for item in st.session_state["session_files"]:
+                if item["File Name"] in temporary_rows.index:
+                    item["Alias"] = temporary_rows.at[item["File Name"], "Alias"]
+                    item["Reference"] = temporary_rows.at[item["File Name"], "Reference"]
+
             file_paths_df = all_files[all_files["Validation"] == "Valid"]
             if not file_paths_df.empty:
 
-                dl.save_cache(CACHE_FILE, file_paths_df.to_dict('records'))
-
-                st.session_state["tables"] = dl.load_cache(cache_file=CACHE_FILE)["tables"]
+                store = CatalogStore()
+                store.save(file_paths_df.to_dict('records'))
+                st.session_state["tables"] = store.load()
                 st.session_state["session_files"] = [
                     item for item in st.session_state["session_files"]
                     if item["File Hash"] not in file_paths_df["File Hash"].values
@@ -346,6 +390,32 @@ if st.session_state["available_files"]:
                     
 
 
+        importable = [
+            item for item in st.session_state["session_files"]
+            if item["Alias"] and item["Reference"] == item["Alias"] and isinstance(item["df"], (pa.Table, LazySheet, SpilledTable))
+        ]
+        if ws.is_persistent() and importable:
+            if st.button(f"Import {len(importable)} session tables into workspace",
+                         help="Copy in-memory tables into the workspace database so they survive restarts"):
+                con = ws.workspace_connection()
+                for item in importable:
+                    ws.import_table(con, item["Alias"], dl.as_arrow(item["df"]))
+                    st.session_state["tables"].append({
+                        **item,
+                        "Type": "Table",
+                        "Location": ws.WORKSPACE_LOCATION,
+                        "Validation": "Valid",
+                        "Path": ws.WORKSPACE_FILE,
+                        "df": "",
+                    })
+                imported = {item["File Name"] for item in importable}
+                st.session_state["session_files"] = [
+                    item for item in st.session_state["session_files"] if item["File Name"] not in imported
+                ]
+                CatalogStore().save(st.session_state["tables"])
+                st.success("Session tables imported into the workspace.")
+                st.rerun()
+
     else:
         st.dataframe(
             pd.DataFrame(st.session_state["available_files"]),
@@ -354,4 +424,5 @@ if st.session_state["available_files"]:
 else:
     st.write("No session files added.")
 
-st.dataframe(st.session_state["available_files"], use_container_width=True)
\ No newline at end of file
+with profiler.stage("render available_files"):
+    st.dataframe(st.session_state["available_files"], use_container_width=True)
\ No newline at end of file
@@ -1,12 +1,22 @@
 import streamlit as st
-import pandas as pd
 import duckdb
-import re
+import pandas as pd
+import time
 from helpers import data_loading as dl
+from helpers.sql_templates import expand_sql_query
+from helpers.query_cache import QueryResultCache, source_fingerprints, is_cacheable
+from helpers.result_pager import ResultPager
+from helpers import materialize as mz
+from helpers.parquet_index import ParquetIndex, prune_query
+from helpers.preview_cache import PreviewCache
+from helpers.session_catalog import (
+    data_aliases_from, queryable_files, register_views_in_duckdb, shadow_transcoder, mark_used)
+from helpers.dashboard import run_saved_queries, DASHBOARD_WORKERS
+from helpers import export
+from helpers import profiler
+from helpers.query_runner import QueryHandle, QUERY_TIMEOUT_SECONDS, DONE, FAILED, CANCELLED, TIMED_OUT
 
 cache_file = "query_cache.json"
-from helpers.st_dev import developer_sidebar
-# developer_sidebar()
 
 options = {
     "Current session files": "session_files",
@@ -14,60 +24,207 @@ options = {
     "Parquet tables": "tables"
 }
 
-def register_views_in_duckdb(available_files):
-    for file_info in available_files:
-        alias = file_info["Alias"]
-        reference = file_info["Reference"]
+@st.cache_resource
+def result_cache() -> QueryResultCache:
+    """Process-wide cache of query results, shared by every session."""
+    return QueryResultCache()
 
-        create_view_query = f"CREATE OR REPLACE VIEW {alias} AS SELECT * FROM {reference};"
-        duckdb.sql(create_view_query)
+@st.cache_resource
+def parquet_index() -> ParquetIndex:
+    """Process-wide index of Parquet footer metadata, shared by every session."""
+    return ParquetIndex()
 
-def expand_sql_query(user_query: str, data_aliases: dict, saved_queries: dict) -> str:
+@st.cache_resource
+def preview_cache() -> PreviewCache:
+    """Process-wide cache of table previews and schemas, shared by every session."""
+    return PreviewCache()
+
+def refresh_materializations(names):
     """
-    Replace {{alias}} references in a SQL query using data sources and subqueries.
-    
-    Args:
-        user_query (str): SQL query containing {{alias}} references
-        data_aliases (dict): alias → table/view reference (e.g., read_parquet(...))
-        saved_queries (dict): alias → subquery SQL (will be wrapped in parentheses)
-    
-    Returns:
-        str: Expanded SQL query with all {{alias}} replaced
+    A QueryHandle prepare step refreshing the materialized saved queries among names.
+
+    Everything it needs is taken from session state here, as it runs on the worker.
     """
-    alias_pattern = re.compile(r"\{\{([\w\-]+)\}\}")  # Matches {{alias_name}}
-
-    def resolve_alias(alias: str) -> str:
-        if alias in data_aliases:
-            return data_aliases[alias]
-        elif alias in saved_queries:
-            subquery = saved_queries[alias]
-            return subquery if subquery.strip().startswith("(") else f"({subquery})"
-        else:
-            raise ValueError(f"Unknown alias '{{{{{alias}}}}}' in query.")
+    saved_queries = st.session_state["saved_queries"]
+    materialized = st.session_state["materialized_queries"]
+    available_files = st.session_state["available_files"]
+    data_aliases = data_aliases_from(available_files)
+
+    def refresh(cursor):
+        try:
+            mz.refresh_stale(cursor, names, saved_queries, data_aliases, available_files, materialized)
+        finally:
+            # entries are only replaced once their refresh succeeded, so a failure saves the ones that did
+            dl.save_queries_to_cache(materialized, mz.MATERIALIZED_CACHE_FILE)
+    return refresh
 
-    expanded_query = user_query
+def start_cached_query(expanded_query: str, available_files, timeout, refresh=None):
+    """
+    Serve an expanded query from the result cache, or start it on a background worker.
 
-    for match in alias_pattern.findall(user_query):
-        replacement = resolve_alias(match)
-        expanded_query = expanded_query.replace(f"{{{{{match}}}}}", replacement)
+    A cache hit sets the result right away; a miss stores a QueryHandle in session state
+    and the worker fills the cache when the query completes. With a refresh step the
+    cache is consulted on the worker once the refresh is done, as it may rewrite sources.
+    """
+    cache = result_cache()
+    cacheable = is_cacheable(expanded_query)
+    materialized = st.session_state["materialized_queries"]
+
+    def current_sources():
+        return source_fingerprints(expanded_query, list(available_files) + mz.materialized_catalog_entries(materialized))
+
+    sources = current_sources()
+    prepare = None
+    if refresh is None:
+        result = cache.get(expanded_query, sources) if cacheable else None
+        if result is not None:
+            st.session_state["query_result_df"] = result.to_pandas()
+            return
+    else:
+        def prepare(cursor):
+            nonlocal sources
+            refresh(cursor)
+            sources = current_sources()
+            return cache.get(expanded_query, sources) if cacheable else None
+
+    def store_result(handle):
+        if not cacheable:
+            # statements other than reads (DDL, SET, ...) may change what cached results saw
+            cache.clear()
+        elif handle.result is not None:
+            cache.put(expanded_query, sources, handle.result)
+
+    st.session_state["query_handle"] = QueryHandle(
+        st.session_state["view_catalog"].cursor(), expanded_query, timeout=timeout, on_done=store_result, prepare=prepare)
+
+def collect_finished_query():
+    """Move the result or failure of a finished background query into session state."""
+    handle = st.session_state.get("query_handle")
+    if handle is None or handle.running:
+        return
+    st.session_state["query_handle"] = None
+    st.session_state["query_status"] = (handle.status, handle.error, handle.elapsed)
+    if handle.status != DONE:
+        st.session_state.pop("pending_pager_query", None)
+        return
+    st.session_state["query_result_df"] = handle.result.to_pandas() if handle.result is not None else pd.DataFrame()
+    pending_query = st.session_state.pop("pending_pager_query", None)
+    if pending_query is not None:
+        # the handle only refreshed materializations; the paged query starts now
+        try:
+            st.session_state["query_result_pager"] = ResultPager(st.session_state["view_catalog"].cursor, pending_query)
+        except Exception as e:
+            st.session_state["query_status"] = (FAILED, str(e), handle.elapsed)
+
+def collect_finished_export():
+    """Move the outcome of a finished export into session state; exports leave the query result alone."""
+    handle = st.session_state.get("export_handle")
+    if handle is None or handle.running:
+        return
+    st.session_state["export_handle"] = None
+    st.session_state["export_status"] = (handle.status, handle.error, handle.elapsed)
+
+def show_result_pages(pager):
+    page_col, count_col, load_col = st.columns([1, 3, 1])
+    with page_col:
+        page_number = st.number_input("Page", min_value=1, max_value=pager.page_count, value=1, key="result_page")
+    with count_col:
+        first_row = (page_number - 1) * pager.page_size
+        st.write(f"Rows {first_row + 1:,}–{min(first_row + pager.page_size, pager.total_rows):,} of {pager.total_rows:,}")
+    with load_col:
+        if st.button("Load all rows", help="Fetch the whole result into memory"):
+            st.session_state["query_result_df"] = pager.fetch_all().to_pandas()
+            pager.close()
+            st.session_state["query_result_pager"] = None
+            st.rerun()
+    st.dataframe(pager.page(page_number - 1), hide_index=True, use_container_width=True)
+
+def show_status(status, error, elapsed, label="Query"):
+    if status == FAILED:
+        st.error(f"{label} failed after {elapsed:.1f}s: {error}")
+    elif status == TIMED_OUT:
+        st.warning(f"{label} stopped by the timeout after {elapsed:.1f}s.")
+    elif status == CANCELLED:
+        st.info(f"{label} cancelled after {elapsed:.1f}s.")
+
+@st.fragment(run_every=0.5)
+def query_progress_panel(key="query_handle"):
+    """Poll the handle in session state under key; reruns the whole page once it has finished."""
+    handle = st.session_state.get(key)
+    if handle is None or not handle.running:
+        st.rerun(scope="app")
+    progress = handle.progress()
+    progress_col, cancel_col = st.columns([4, 1])
+    with progress_col:
+        label = f"Running for {handle.elapsed:.1f}s"
+        st.progress(progress if progress is not None else 0.0, text=label if progress is None else f"{label} · {progress:.0%}")
+    with cancel_col:
+        if st.button("Cancel", key=f"cancel_{key}"):
+            handle.cancel()
+
+def start_refresh(key, names):
+    """Refresh materialized saved queries on a worker, as a handle in session state under key."""
+    st.session_state[key] = QueryHandle(
+        st.session_state["view_catalog"].cursor(), None,
+        timeout=st.session_state.get("query_timeout", QUERY_TIMEOUT_SECONDS), prepare=refresh_materializations(names))
+
+def run_dashboard(names, workers, panels):
+    st.session_state["dashboard_results"] = {}
+    panels = {name: panels.get(name) or st.empty() for name in names}
+    for name in names:
+        panels[name].info(f"{name}: running...")
+    start = time.perf_counter()
+    # results are drawn as each query finishes, not once all of them are done
+    for name, table, error, seconds in run_saved_queries(
+            st.session_state["view_catalog"].cursor, names, st.session_state["saved_queries"],
+            data_aliases_from(st.session_state["available_files"]), workers):
+        st.session_state["dashboard_results"][name] = (table.to_pandas() if table is not None else None, error, seconds)
+        with panels[name].container():
+            show_dashboard_panel(name, *st.session_state["dashboard_results"][name])
+    wall = time.perf_counter() - start
+    total = sum(seconds for _, _, seconds in st.session_state["dashboard_results"].values())
+    st.caption(f"Wall time {wall:.2f}s for {total:.2f}s of queries")
+
+def show_dashboard_panel(name, df, error, seconds):
+    st.write(f"**{name}** · {seconds:.2f}s")
+    if error is not None:
+        st.error(error)
+    else:
+        st.dataframe(df, hide_index=True, use_container_width=True)
 
-    return expanded_query
 
 
 if "saved_queries" not in st.session_state:
     st.session_state["saved_queries"] = {}
+if "materialized_queries" not in st.session_state:
+    st.session_state["materialized_queries"] = dl.load_queries_from_cache(mz.MATERIALIZED_CACHE_FILE)
 if "query_result_df" not in st.session_state:
     st.session_state["query_result_df"] = pd.DataFrame()
-st.session_state["available_files"] = st.session_state["session_files"] + st.session_state["tables"]
-register_views_in_duckdb(st.session_state["available_files"])
+st.session_state["available_files"] = queryable_files()
+catalog_sync = register_views_in_duckdb(st.session_state["available_files"])
+# previews are computed in the background so selecting a table does not wait on a scan
+with profiler.stage("preview prefetch"):
+    preview_cache().prefetch(st.session_state["view_catalog"].cursor, st.session_state["available_files"])
 
-tab1, tab2, tab3 = st.tabs(["Query Data", "Saved Queries", "Available Tables"])
+tab1, tab2, tab3, tab4 = st.tabs(["Query Data", "Saved Queries", "Available Tables", "Dashboard"])
 with tab3:
 
     st.write("#### Available files and tables to query")
     st.write("This is a list of files and tables available for querying.")
-
-    selected_view = st.dataframe(st.session_state["available_files"], column_order=["File Name", "File Type", "Alias", "Path", "Type"], hide_index=True, use_container_width=True, selection_mode="single-row", on_select="rerun")
+    st.caption(
+        f"Catalog sync: {catalog_sync['seconds'] * 1000:.1f} ms "
+        f"({catalog_sync['created']} registered, {catalog_sync['dropped']} dropped, {catalog_sync['unchanged']} unchanged)"
+    )
+    for alias, (_, error) in st.session_state["view_catalog"].errors.items():
+        st.warning(f"Could not register '{alias}': {error}")
+    if st.session_state.get("shadow_parquet"):
+        if shadow_transcoder().pending:
+            st.caption(f"Transcoding {shadow_transcoder().pending} file(s) to Parquet in the background")
+        for path, (_, error) in shadow_transcoder().errors.items():
+            st.warning(f"Could not transcode '{path}' to Parquet: {error}")
+
+    with profiler.stage("render available_files"):
+        selected_view = st.dataframe(st.session_state["available_files"], column_order=["File Name", "File Type", "Alias", "Path", "Type"], hide_index=True, use_container_width=True, selection_mode="single-row", on_select="rerun")
     
     selected_view_rows = selected_view["selection"]["rows"]
 
@@ -75,33 +232,29 @@ with tab3:
     if selected_view_rows:
         row = selected_view_rows[0]
         data = st.session_state["available_files"][row]
-
-
-
+        mark_used(f"{{{{{data['Alias']}}}}}")
+        # Parquet-backed entries are described from their footers without scanning any data
+        index_summary = parquet_index().summary(data)
+        if index_summary is not None:
+            st.caption(
+                f"{index_summary['rows']:,} rows · {index_summary['bytes'] / 1024 ** 2:,.1f} MB "
+                f"in {index_summary['files']} Parquet file(s)"
+            )
         try:
-            ref = data['Reference']
-            sample_query = f"SELECT * FROM {ref} LIMIT 100;"
-            preview_df = duckdb.sql(sample_query).to_df()
+            with st.spinner("Loading preview..."), profiler.stage("preview query"):
+                preview_table, schema_table = preview_cache().get(st.session_state["view_catalog"].cursor, data).result()
+            preview_df, schema_df = preview_table.to_pandas(), schema_table.to_pandas()
         except Exception as e:
-            # st.error(f"Error executing query: {e}")
-            if data['File Type'] == "csv":
-                try:
-                    ref= f"sniff_csv('{data['Path']}')"
-                    sample_query = f"SELECT * FROM {ref} LIMIT 100;"
-                    preview_df = duckdb.sql(sample_query).to_df()
-                except Exception as e:
-                    ref = f"read_csv_auto('{data['Path']}')"
-                    sample_query = f"SELECT * FROM {ref} LIMIT 100;"
-                    preview_df = duckdb.sql(sample_query).to_df()
-        
-        schema_query = f"DESCRIBE {sample_query}"
-        
+            st.error(f"Error previewing '{data['Alias']}': {e}")
+            preview_df, schema_df = pd.DataFrame(), pd.DataFrame()
+
         with st.expander("Available to query", expanded=False):
             st.write(data, hide_index=True, use_container_width=True, column_order=["File Name", "File Type", "Alias", "Path", "Type"])
 
         with st.expander("Schema", expanded=False):
             st.dataframe(
-                duckdb.sql(schema_query).to_df(),
+                schema_df if index_summary is None else pd.DataFrame(
+                    list(index_summary["columns"].items()), columns=["column_name", "column_type"]),
                 hide_index=True,
                 use_container_width=True,
                 )
@@ -128,21 +281,99 @@ with tab3:
 with tab2:
     st.write(st.session_state["saved_queries"])
 
+    st.write("##### Materialized saved queries")
+    st.write("Materialized queries are stored as Parquet and refreshed only when a source they depend on changes.")
+    materialized = st.session_state["materialized_queries"]
+    saved_names = list(st.session_state["saved_queries"].keys())
+    materialize_names = st.multiselect(
+        "Materialize", saved_names, default=[name for name in materialized if name in saved_names])
+    incremental_names = st.multiselect(
+        "Refresh incrementally", materialize_names,
+        default=[name for name in materialize_names if materialized.get(name, {}).get("incremental")],
+        help="Only for queries that filter or project rows: new files appended to a partitioned source are processed on their own and added to the result")
+
+    if st.button("Apply and refresh"):
+        for name in list(materialized):
+            if name not in materialize_names:
+                materialized.pop(name)
+                mz.drop_materialized(name)
+        for name in materialize_names:
+            materialized.setdefault(name, {})["incremental"] = name in incremental_names
+        dl.save_queries_to_cache(materialized, mz.MATERIALIZED_CACHE_FILE)
+        start_refresh("materialize_handle", materialize_names)
+        st.rerun()
+
+    materialize_handle = st.session_state.get("materialize_handle")
+    if materialize_handle is not None and materialize_handle.running:
+        query_progress_panel("materialize_handle")
+    elif materialize_handle is not None:
+        show_status(materialize_handle.status, materialize_handle.error, materialize_handle.elapsed, "Refresh")
+
+    if materialized:
+        st.dataframe(
+            [
+                {
+                    "Saved Query": name,
+                    "Incremental": meta.get("incremental", False),
+                    "Last Refresh": meta.get("last_refresh", ""),
+                    "Refreshed At": pd.to_datetime(meta["refreshed"], unit="s") if meta.get("refreshed") else None,
+                }
+                for name, meta in materialized.items()
+            ],
+            hide_index=True, use_container_width=True,
+        )
+
+
+with tab4:
+    st.write("##### Dashboard")
+    st.write("Run several saved queries at once. Saved queries they have in common are computed once and shared.")
+    dashboard_names = st.multiselect("Saved queries", list(st.session_state["saved_queries"].keys()), key="dashboard_queries")
+    workers = st.number_input("Parallel queries", min_value=1, max_value=32, value=DASHBOARD_WORKERS)
+    panels = {name: st.empty() for name in dashboard_names}
+
+    dashboard_refresh = st.session_state.get("dashboard_refresh")
+    if st.button("Run dashboard", disabled=not dashboard_names):
+        template = " ".join(f"{{{{{name}}}}}" for name in dashboard_names)
+        mark_used(template)
+        try:
+            stale = mz.referenced_materializations(template, st.session_state["saved_queries"], st.session_state["materialized_queries"])
+        except ValueError as e:
+            stale = []
+            st.error(str(e))
+        if stale:
+            # materialized saved queries are brought up to date first, on a worker
+            start_refresh("dashboard_refresh", stale)
+            st.session_state["dashboard_pending"] = dashboard_names
+            st.rerun()
+        run_dashboard(dashboard_names, workers, panels)
+    elif dashboard_refresh is not None and dashboard_refresh.running:
+        query_progress_panel("dashboard_refresh")
+    elif dashboard_refresh is not None:
+        st.session_state["dashboard_refresh"] = None
+        pending = st.session_state.pop("dashboard_pending", [])
+        if dashboard_refresh.status == DONE:
+            run_dashboard(pending, workers, panels)
+        else:
+            show_status(dashboard_refresh.status, dashboard_refresh.error, dashboard_refresh.elapsed, "Refresh")
+    else:
+        for name, result in st.session_state.get("dashboard_results", {}).items():
+            if name in panels:
+                with panels[name].container():
+                    show_dashboard_panel(name, *result)
 
 with tab1:
     default_query = "SELECT * FROM {{alias}} LIMIT 10;" 
     user_query = st.text_area("Enter your SQL query", value=default_query, height=150)
 
     # replace all aliases with their references
-    data_aliases = {
-        file["Alias"]: file["Reference"]
-        for file in st.session_state["available_files"]
-        if file.get("Alias") and file.get("Reference")
-    }
+    data_aliases = data_aliases_from(st.session_state["available_files"])
+    expand_error = None
     try:
         adj_user_query = expand_sql_query(user_query,data_aliases, st.session_state["saved_queries"])
     except ValueError as e:
         adj_user_query = user_query
+        expand_error = e
+        st.caption(str(e))
         # adj_user_query = adj_user_query.replace(value, reference)
     st.code(
         adj_user_query,
@@ -153,14 +384,108 @@ with tab1:
 
     with run_button_col:
         if st.button("Run Query"):
-            st.session_state["query_result_df"] = duckdb.sql(user_query).to_df()
+            if st.session_state.get("query_handle") is not None:
+                st.session_state["query_handle"].cancel()
+                st.session_state["query_handle"] = None
+            if st.session_state.get("query_result_pager") is not None:
+                st.session_state["query_result_pager"].close()
+                st.session_state["query_result_pager"] = None
+            mark_used(user_query)
+            st.session_state["query_status"] = None
+            st.session_state.pop("pending_pager_query", None)
+            try:
+                if expand_error is not None:
+                    raise expand_error
+                stale = mz.referenced_materializations(user_query, st.session_state["saved_queries"], st.session_state["materialized_queries"])
+            except ValueError as e:
+                st.session_state["query_status"] = (FAILED, str(e), 0.0)
+                st.rerun()
+            # materialized saved queries the query depends on are brought up to date first, on the worker
+            refresh = refresh_materializations(stale) if stale else None
+            # files whose footer statistics rule out the filters are left out of the scan
+            run_query = prune_query(adj_user_query, st.session_state["available_files"], parquet_index())
+            if st.session_state.get("paged_results"):
+                # keep the result open and fetch only the pages that are viewed
+                st.session_state.pop("result_page", None)
+                st.session_state["query_result_df"] = pd.DataFrame()
+                if refresh is not None:
+                    st.session_state["pending_pager_query"] = run_query
+                    st.session_state["query_handle"] = QueryHandle(
+                        st.session_state["view_catalog"].cursor(), None, timeout=st.session_state["query_timeout"], prepare=refresh)
+                else:
+                    try:
+                        st.session_state["query_result_pager"] = ResultPager(st.session_state["view_catalog"].cursor, run_query)
+                    except Exception as e:
+                        st.session_state["query_status"] = (FAILED, str(e), 0.0)
+            else:
+                start_cached_query(run_query, st.session_state["available_files"], st.session_state["query_timeout"], refresh)
             st.rerun()
+        st.number_input("Timeout (s)", min_value=0, value=QUERY_TIMEOUT_SECONDS, step=30, key="query_timeout",
+                        help="Stop queries that run longer than this; 0 disables the timeout")
+        st.toggle("Paged results", key="paged_results", help="Stream large results page by page instead of loading every row")
+
+        with st.popover("Export query", help="Write the query result straight to a file, without loading it here"):
+            export_label = st.selectbox("Format", list(export.EXPORT_FORMATS))
+            export_target = st.text_input("Path", value=export.default_target(export_label))
+            export_compression = st.selectbox("Compression", export.EXPORT_FORMATS[export_label][2])
+            row_group_size = None
+            if export_label == "Parquet":
+                row_group_size = st.number_input("Row group size", min_value=1024, value=export.ROW_GROUP_SIZE, step=1024)
+            partition_by = [c.strip() for c in st.text_input("Partition by", help="Comma-separated columns; writes a directory of key=value folders").split(",") if c.strip()]
+            if st.button("Export"):
+                export_query = prune_query(adj_user_query, st.session_state["available_files"], parquet_index())
+                try:
+                    copy_sql = export.copy_statement(
+                        export_query, export_target, export_label, export_compression, row_group_size, partition_by)
+                except (ValueError, duckdb.Error) as e:
+                    st.error(str(e))
+                else:
+                    export.prepare_target(export_target, bool(partition_by))
+                    if st.session_state.get("export_handle") is not None:
+                        st.session_state["export_handle"].cancel()
+                    # exports run on their own handle, so the query result shown below is left alone
+                    st.session_state["export_status"] = None
+                    st.session_state["export_target"] = export_target
+                    st.session_state["export_handle"] = QueryHandle(
+                        st.session_state["view_catalog"].cursor(), copy_sql, timeout=st.session_state["query_timeout"])
+                    st.rerun()
+
+        collect_finished_export()
+        if st.session_state.get("export_handle") is not None:
+            query_progress_panel("export_handle")
+        else:
+            status, error, elapsed = st.session_state.get("export_status") or (None, None, None)
+            if status == DONE:
+                st.success(f"Exported to {st.session_state['export_target']} in {elapsed:.1f}s.")
+            else:
+                show_status(status, error, elapsed, "Export")
 
-        if st.button("export query", help="Export the query to a file format"):
-            pass
+    cache_stats = result_cache().stats
+    st.caption(
+        f"Result cache: {cache_stats['memory_hits']} memory hits, {cache_stats['disk_hits']} disk hits, "
+        f"{cache_stats['misses']} misses, {cache_stats['invalidations']} invalidated · "
+        f"{result_cache().memory_bytes() / 1024 ** 2:.1f} MB in memory, {result_cache().disk_bytes() / 1024 ** 2:.1f} MB on disk"
+    )
 
+    collect_finished_query()
     with st.expander("#### Query Results", expanded=True):
-        if st.session_state["query_result_df"].empty:
+        status, error, elapsed = st.session_state.get("query_status") or (None, None, None)
+        if st.session_state.get("query_handle") is not None:
+            query_progress_panel()
+        else:
+            show_status(status, error, elapsed)
+
+        pager = st.session_state.get("query_result_pager")
+        if pager is not None:
+            try:
+                show_result_pages(pager)
+            except Exception as e:
+                # the count or a page fetch failed; drop the pager so the error is shown once
+                pager.close()
+                st.session_state["query_result_pager"] = None
+                st.session_state["query_status"] = (FAILED, str(e), 0.0)
+                st.rerun()
+        elif st.session_state["query_result_df"].empty:
             st.write("No data returned.")
         else:
             st.dataframe(st.session_state["query_result_df"], hide_index=True, use_container_width=True)
@@ -182,7 +507,8 @@ with tab1:
                 # adj_user_query = user_query.replace(alias, reference)
                 
                 
-                st.session_state["saved_queries"][st.session_state["saved_query_name"]] = adj_user_query
+                # the template is saved so nested {{alias}} references stay resolvable
+                st.session_state["saved_queries"][st.session_state["saved_query_name"]] = user_query
                 if st.session_state["save_query_to_cache"]:
                     dl.save_queries_to_cache(st.session_state["saved_queries"], cache_file)
                 st.success("Query saved successfully.")
@@ -1,35 +1,71 @@
-import importlib.util
-import sys
 import os
-import io
 import pandas as pd
 import streamlit as st
 from datetime import datetime
-
-if "user_pages" not in st.session_state:
-    st.session_state.user_pages = {}
-
-CACHE_DIR = 'user_cache'  # Directory to save uploaded files
-os.makedirs(CACHE_DIR, exist_ok=True)
-
-def load_user_page(page_name, file_path):
-    """Load a user-defined page from uploaded file content."""
-    module_name = f"user_page_{page_name}"
-
-    # Save the uploaded file content to a temporary file
-    # Load the module dynamically
-    spec = importlib.util.spec_from_file_location(module_name, file_path)
-    module = importlib.util.module_from_spec(spec)
-    sys.modules[module_name] = module
+from helpers.script_registry import ScriptRegistry, SCRIPT_DIR
+from helpers.script_api import ScriptWorkspace, run_script
+from helpers.session_catalog import data_aliases_from, queryable_files, register_views_in_duckdb
+from helpers.script_pool import ScriptProcessPool, CPU_SECONDS, MEMORY_BYTES, DONE
+
+CACHE_DIR = SCRIPT_DIR  # Directory to save uploaded files
+OUTPUT_PREVIEW_ROWS = 10_000
+
+@st.cache_resource
+def script_registry() -> ScriptRegistry:
+    """Process-wide registry of custom scripts; modules are imported on first use."""
+    return ScriptRegistry(CACHE_DIR)
+
+@st.cache_resource
+def script_pool() -> ScriptProcessPool:
+    """Process-wide pool of child processes that run script compute() functions."""
+    return ScriptProcessPool()
+
+def script_entry_points(page_name) -> set:
+    """Which of show() and compute() a script defines, read from its source without running it."""
     try:
-        spec.loader.exec_module(module)
+        entry_points = script_registry().top_level_names(page_name) & {"show", "compute"}
+    except (OSError, SyntaxError) as e:
+        st.error(f"Error reading script '{page_name}': {e}")
+        return set()
+    if not entry_points:
+        st.error(f"Script '{page_name}' defines neither show() nor compute().")
+    return entry_points
+
+def load_user_page(page_name):
+    """Return the module of a script, importing it only if it changed."""
+    try:
+        return script_registry().load(page_name)
     except Exception as e:
-        st.error(f"Error loading module {module_name}: {e}")
+        st.error(f"Error loading module user_page_{page_name}: {e}")
+        return None
+
+@st.fragment(run_every=1)
+def isolated_run_progress(page_name):
+    """Follow a running isolated run; reruns the whole page once it has finished."""
+    run = st.session_state["script_runs"][page_name]
+    if not run.running:
+        st.rerun(scope="app")
+    status_col, cancel_col = st.columns([4, 1])
+    status_col.info(f"Running for {run.elapsed:.0f}s · {run.peak_rss / 1024 ** 2:.0f} MB resident")
+    if cancel_col.button("Cancel run"):
+        run.cancel()
+
+def isolated_run_results(page_name):
+    """Render a finished isolated run; its outputs are converted for display once per run."""
+    run = st.session_state["script_runs"][page_name]
+    if run.status != DONE:
+        st.error(f"Run {run.status} after {run.elapsed:.1f}s: {run.error}")
         return
-    
-    # Check if the module has a `show()` function
-    if hasattr(module, 'show'):
-        st.session_state.user_pages[page_name] = module.show
+    previews = st.session_state.setdefault("script_run_previews", {})
+    if previews.get(page_name, (None,))[0] is not run:
+        previews[page_name] = (run, [
+            (name, table.num_rows, table.slice(0, OUTPUT_PREVIEW_ROWS).to_pandas())
+            for name, table in run.output_tables()
+        ])
+    st.caption(f"Finished in {run.elapsed:.1f}s · peak {run.peak_rss / 1024 ** 2:.0f} MB resident")
+    for name, num_rows, df in previews[page_name][1]:
+        st.write(f"**{name}** · {num_rows:,} rows")
+        st.dataframe(df, hide_index=True, use_container_width=True)
 
 def save_uploaded_file(uploaded_file, page_name):
     """Save uploaded file to the local cache."""
@@ -38,28 +74,59 @@ def save_uploaded_file(uploaded_file, page_name):
         f.write(uploaded_file.getbuffer())
     return file_path
 
+def script_workspace() -> ScriptWorkspace:
+    """A workspace over the session's tables, registered the same way the Query Data page does."""
+    files = queryable_files()
+    register_views_in_duckdb(files)
+    return ScriptWorkspace(
+        st.session_state["view_catalog"].cursor(), data_aliases_from(files), st.session_state["saved_queries"])
+
 def get_cached_files():
     """Retrieve all cached files."""
-    files = [f[:-3] for f in os.listdir(CACHE_DIR) if f.endswith('.py')]
-    return files
-
-def load_all_cached_files():
-    """Load all files from the cache directory into session state."""
-    cached_files = get_cached_files()
-    for file_name in cached_files:
-        file_path = os.path.join(CACHE_DIR, f"{file_name}.py")
-        load_user_page(file_name, file_path)
-
-# Load all cached files at startup
-load_all_cached_files()
+    return script_registry().list_scripts()
 
 st.title("Custom Streamlit Scripts")
-script_names = ["[ Script Management ]"] + list(st.session_state.user_pages.keys())
+# listing reads directory entries only; a script is imported when it is selected
+script_names = ["[ Script Management ]"] + get_cached_files()
 page =st.selectbox("Select a script", script_names)
 
 if page != "[ Script Management ]":
-    if st.button(f"Run {page}"):
-        st.session_state.user_pages[page]()  # Execute script only when button is clicked
+    entry_points = script_entry_points(page)
+    # only show() runs in the app; a compute-only script is never imported here
+    show = getattr(load_user_page(page), "show", None) if "show" in entry_points else None
+    if show is not None:
+        st.caption("Scripts may define `show(workspace)` to read tables as lazy DuckDB relations, "
+                   "e.g. `workspace.table(\"sales\").filter(\"amount > 100\").df()`.")
+        if st.button(f"Run {page}"):
+            # Execute script only when button is clicked
+            with script_workspace() as workspace:
+                run_script(show, workspace)
+
+    if "compute" in entry_points:
+        st.write("##### Run compute() in a separate process")
+        st.caption("`compute(inputs)` gets {alias: Arrow table} and returns a DataFrame, an Arrow table or a dict of them. "
+                   "It runs outside the app with its own CPU time and memory limits.")
+        aliases = sorted(set(data_aliases_from(queryable_files())) | set(st.session_state["saved_queries"]))
+        input_aliases = st.multiselect("Input tables", aliases, key=f"isolated_inputs_{page}")
+        cpu_col, memory_col = st.columns(2)
+        cpu_seconds = cpu_col.number_input("CPU time limit (s)", min_value=1, value=CPU_SECONDS)
+        memory_mb = memory_col.number_input("Memory limit (MB)", min_value=64, value=MEMORY_BYTES // 1024 ** 2, step=256)
+        if st.button(f"Run {page} in a separate process"):
+            runs = st.session_state.setdefault("script_runs", {})
+            if page in runs:
+                runs[page].cancel()
+                runs[page].cleanup()
+            # inputs stream from DuckDB into Arrow IPC files the child memory-maps
+            with script_workspace() as workspace:
+                runs[page] = script_pool().submit(
+                    script_registry().path(page),
+                    {alias: workspace.arrow(f"SELECT * FROM {{{{{alias}}}}}") for alias in input_aliases},
+                    cpu_seconds=cpu_seconds, memory_bytes=memory_mb * 1024 ** 2)
+        run = st.session_state.get("script_runs", {}).get(page)
+        if run is not None and run.running:
+            isolated_run_progress(page)
+        elif run is not None:
+            isolated_run_results(page)
 else:
     tab1, tab2, tab3, tab4 = st.tabs(["Upload Scripts", "Write Scripts", "Edit Scripts", "Manage Cached Scripts"])
 
@@ -73,9 +140,9 @@ else:
         if uploaded_file:
             page_name = st.text_input("Enter a name for your page", value="Custom Page")
             if st.button("Add Page"):
-                file_path = save_uploaded_file(uploaded_file, page_name)
-                load_user_page(page_name, file_path)
-                st.success(f"Page '{page_name}' added successfully!")
+                save_uploaded_file(uploaded_file, page_name)
+                if script_entry_points(page_name):
+                    st.success(f"Page '{page_name}' added successfully!")
 
 
     # Tab 2: Write New Scripts
@@ -89,9 +156,9 @@ else:
         if st.button("Save Script"):
             with open(os.path.join(CACHE_DIR, f"{page_name}.py"), 'w') as f:
                 f.write(script_content)
-            load_user_page(page_name, io.BytesIO(script_content.encode()))
-            st.success(f"Page '{page_name}' added successfully!")
-            st.rerun()
+            if script_entry_points(page_name):
+                st.success(f"Page '{page_name}' added successfully!")
+                st.rerun()
 
     # Tab 3: Edit Existing Scripts
     with tab3:
@@ -106,9 +173,9 @@ else:
             if st.button("Save Changes"):
                 with open(os.path.join(CACHE_DIR, selected_file), 'w') as f:
                     f.write(new_content)
-                load_user_page(selected_file[:-3], os.path.join(CACHE_DIR, selected_file))
-                st.success(f"Changes to '{selected_file}' saved successfully!")
-                st.rerun()
+                if script_entry_points(selected_file[:-3]):
+                    st.success(f"Changes to '{selected_file}' saved successfully!")
+                    st.rerun()
 
     # Tab 4: Manage Cached Scripts
     with tab4:
@@ -156,7 +223,7 @@ else:
 
                         if os.path.exists(file_path):
                             os.remove(file_path)
-                            st.session_state.user_pages.pop(script_name, None)
+                            script_registry().forget(script_name)
                             st.success(f"Deleted '{script_name}' from cache.")
                         else:
                             st.error(f"'{script_name}' not found in cache.")
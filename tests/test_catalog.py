@@ -0,0 +1,79 @@
+import duckdb
+import pyarrow as pa
+from helpers.catalog import SharedViews, ViewCatalog, entry_fingerprint
+from helpers.catalog_store import CatalogStore
+
+
+def entry(alias, reference, **fields):
+    return {"Alias": alias, "Reference": reference, **fields}
+
+def wanted(*entries):
+    return {e["Alias"]: (entry_fingerprint(e), e) for e in entries}
+
+def view_names(con):
+    return {name for (name,) in con.execute("SELECT view_name FROM duckdb_views() WHERE NOT internal").fetchall()}
+
+
+def store_with(tmp_path, *entries):
+    store = CatalogStore(tmp_path / "catalog.sqlite", legacy_file=None)
+    store.save([{"File Name": e["Alias"], **e} for e in entries])
+    return store
+
+def test_shared_views_follow_the_process_wide_catalog(tmp_path):
+    con = duckdb.connect()
+    store = store_with(tmp_path, entry("a", "(SELECT 1 AS x)"), entry("b", "(SELECT 2 AS x)"))
+    shared = SharedViews(con.cursor(), store)
+    assert shared.refresh() == (2, 0)
+    assert shared.refresh() == (0, 0)  # the store did not change
+    store.save([entry("a", "(SELECT 1 AS x)", **{"File Name": "a"})])
+    assert shared.refresh() == (0, 1)
+    assert "b" not in view_names(con)
+
+def test_stale_session_list_does_not_touch_shared_views(tmp_path):
+    con = duckdb.connect()
+    con.execute("CREATE SCHEMA s")
+    shared = SharedViews(con.cursor(), store_with(tmp_path, entry("a", "(SELECT 1 AS x)"), entry("b", "(SELECT 2 AS x)")))
+    # this session's list lacks b and still has a under an older reference
+    catalog = ViewCatalog(con.cursor(), "s", shared)
+    catalog.sync([entry("a", "(SELECT 0 AS x)")])
+    assert view_names(con) >= {"a", "b"}
+    assert con.sql("SELECT x FROM main.a").fetchall() == [(1,)]
+    assert catalog.cursor().sql("SELECT x FROM a").fetchall() == [(0,)]
+
+def test_shared_views_are_replaced_in_place():
+    con = duckdb.connect()
+    shared = SharedViews(con.cursor())
+    shared.sync(wanted(entry("a", "(SELECT 1 AS x)")))
+    assert shared.sync(wanted(entry("a", "(SELECT 2 AS x)"))) == (1, 0)
+    assert con.sql("SELECT x FROM a").fetchall() == [(2,)]
+
+def test_persisted_views_left_out_of_the_catalog_are_dropped_on_refresh(tmp_path):
+    con = duckdb.connect()
+    SharedViews(con.cursor()).sync(wanted(entry("a", "(SELECT 1 AS x)"), entry("b", "(SELECT 2 AS x)")))
+    shared = SharedViews(con.cursor(), store_with(tmp_path, entry("a", "(SELECT 1 AS x)")))
+    assert set(shared.applied) == {"a", "b"}
+    assert shared.refresh() == (0, 1)
+    assert set(shared.applied) == {"a"}
+    assert "b" not in view_names(con)
+
+def test_session_catalog_syncs_only_changes():
+    con = duckdb.connect()
+    con.execute("CREATE SCHEMA s")
+    catalog = ViewCatalog(con.cursor(), "s", SharedViews(con.cursor()))
+    table = pa.table({"x": [1, 2]})
+    files = [entry("t", "t", df=table), entry("v", "(SELECT 3 AS x)")]
+    assert catalog.sync(files)["created"] == 2
+    assert catalog.sync(files)["created"] == 0
+    cursor = catalog.cursor()
+    assert cursor.sql("SELECT sum(x) FROM t").fetchone() == (3,)
+    assert cursor.sql("SELECT x FROM v").fetchone() == (3,)
+    assert catalog.sync(files[:1])["dropped"] == 1
+
+def test_arrow_entries_are_fingerprinted_by_upload_hash():
+    table = pa.table({"x": [1]})
+    first = entry("t", "t", df=table, **{"File Hash": "abc", "File Name": "t.csv"})
+    # the same upload parsed again into a new object keeps its fingerprint
+    again = entry("t", "t", df=pa.table({"x": [1]}), **{"File Hash": "abc", "File Name": "t.csv"})
+    other_sheet = entry("t", "t", df=table, **{"File Hash": "abc", "File Name": "t.xlsx--Sheet2"})
+    assert entry_fingerprint(first) == entry_fingerprint(again)
+    assert entry_fingerprint(first) != entry_fingerprint(other_sheet)
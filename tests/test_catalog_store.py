@@ -0,0 +1,66 @@
+import json
+import sqlite3
+from helpers.catalog_store import CatalogStore
+
+
+def entry(name, alias, **fields):
+    return {"File Name": name, "File Hash": "", "Path": f"/data/{name}", "Alias": alias,
+            "Reference": f"read_csv('/data/{name}')", "df": "", **fields}
+
+def test_save_writes_only_changed_rows(tmp_path):
+    store = CatalogStore(tmp_path / "catalog.sqlite", legacy_file=None)
+    entries = [entry("a.csv", "a"), entry("b.csv", "b"), entry("c.csv", "c")]
+    assert store.save(entries) == 3
+    assert store.save(entries) == 0
+    # a reorder is not a change
+    assert store.save(entries[::-1]) == 0
+    assert store.save([entries[0], {**entries[1], "Alias": "bb"}]) == 2  # one update, one delete
+    assert [e["Alias"] for e in store.load()] == ["a", "bb"]
+
+def test_entries_keep_their_first_saved_order(tmp_path):
+    store = CatalogStore(tmp_path / "catalog.sqlite", legacy_file=None)
+    store.save([entry("a.csv", "a"), entry("b.csv", "b")])
+    store.save([{**entry("a.csv", "a"), "Validation": "Valid"}, entry("b.csv", "b"), entry("c.csv", "c")])
+    loaded = store.load()
+    assert [e["File Name"] for e in loaded] == ["a.csv", "b.csv", "c.csv"]
+    assert loaded[0]["Validation"] == "Valid" and loaded[0]["df"] == ""
+
+def test_legacy_cache_is_imported_once(tmp_path):
+    legacy = tmp_path / "file_cache.json"
+    legacy.write_text(json.dumps({"tables": [{"File Name": "a.csv", "File Size": "12.0", "Alias": "a", "Encoding": "nan"}]}))
+    store = CatalogStore(tmp_path / "catalog.sqlite", legacy_file=legacy)
+    [loaded] = store.load()
+    assert loaded["File Size"] == 12 and loaded["Encoding"] == ""
+    with sqlite3.connect(tmp_path / "catalog.sqlite") as con:
+        assert con.execute("SELECT count(*) FROM catalog").fetchone() == (1,)
+
+def test_emptied_catalog_is_not_refilled_from_the_legacy_cache(tmp_path):
+    legacy = tmp_path / "file_cache.json"
+    legacy.write_text(json.dumps({"tables": [{"File Name": "a.csv", "Alias": "a"}]}))
+    store = CatalogStore(tmp_path / "catalog.sqlite", legacy_file=legacy)
+    assert len(store.load()) == 1
+    store.save([])
+    assert CatalogStore(tmp_path / "catalog.sqlite", legacy_file=legacy).load() == []
+
+def test_unchanged_rows_are_not_written(tmp_path, monkeypatch):
+    store = CatalogStore(tmp_path / "catalog.sqlite", legacy_file=None)
+    entries = [entry("a.csv", "a", **{"File Size": 12}), entry("b.csv", "b")]
+    store.save(entries)
+    statements = []
+    connect = sqlite3.connect
+
+    def traced(*args, **kwargs):
+        con = connect(*args, **kwargs)
+        con.set_trace_callback(statements.append)
+        return con
+
+    monkeypatch.setattr(sqlite3, "connect", traced)
+    assert store.save([entries[0], {**entries[1], "Alias": "bb"}]) == 1
+    [upsert] = [statement for statement in statements if statement.startswith("INSERT")]
+    assert "'bb'" in upsert
+
+def test_last_used_is_not_stored(tmp_path):
+    store = CatalogStore(tmp_path / "catalog.sqlite", legacy_file=None)
+    store.save([entry("a.csv", "a", **{"Last Used": 1700000000.0})])
+    assert store.save([entry("a.csv", "a", **{"Last Used": 1700000001.0})]) == 0
+    assert "Last Used" not in store.load()[0]
@@ -0,0 +1,32 @@
+import duckdb
+from helpers.dashboard import dependency_levels, run_saved_queries, shared_dependencies
+
+
+def run(names, saved_queries, data_aliases=None):
+    con = duckdb.connect()
+    results = run_saved_queries(con.cursor, names, saved_queries, data_aliases or {}, workers=2)
+    return {name: (table.to_pylist() if table is not None else None, error) for name, table, error, _ in results}
+
+def test_shared_dependencies_are_computed_once_and_levelled():
+    saved = {"base": "SELECT 1 AS x", "a": "SELECT x + 1 AS x FROM {{base}}", "b": "SELECT x + 2 AS x FROM {{base}}"}
+    assert shared_dependencies(["a", "b"], saved) == ["base"]
+    assert dependency_levels(["base", "a"], saved) == [["base"], ["a"]]
+    assert run(["a", "b"], saved) == {"a": ([{"x": 2}], None), "b": ([{"x": 3}], None)}
+
+def test_a_query_that_cannot_be_expanded_fails_its_own_panel():
+    saved = {
+        "ok": "SELECT 1 AS x",
+        "loop_a": "SELECT * FROM {{loop_b}}",
+        "loop_b": "SELECT * FROM {{loop_a}}",
+        "missing": "SELECT * FROM {{nowhere}}",
+    }
+    results = run(["ok", "loop_a", "missing"], saved)
+    assert results["ok"] == ([{"x": 1}], None)
+    assert results["loop_a"][0] is None and "Circular reference" in results["loop_a"][1]
+    assert results["missing"][0] is None and "Unknown alias" in results["missing"][1]
+
+def test_runs_one_after_another_without_threads(monkeypatch):
+    monkeypatch.setattr("helpers.dashboard.THREADS_AVAILABLE", False)
+    monkeypatch.setattr("helpers.dashboard.ThreadPoolExecutor", None)
+    saved = {"base": "SELECT 1 AS x", "a": "SELECT x + 1 AS x FROM {{base}}", "b": "SELECT x + 2 AS x FROM {{base}}"}
+    assert run(["a", "b"], saved) == {"a": ([{"x": 2}], None), "b": ([{"x": 3}], None)}
@@ -0,0 +1,80 @@
+import codecs
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+from helpers import data_loading as dl
+
+
+def test_sniff_encoding_utf8():
+    assert dl.sniff_encoding("naïve,café\n".encode("utf-8")) == "utf-8"
+
+def test_sniff_encoding_tolerates_truncated_multibyte_character():
+    assert dl.sniff_encoding("abc é".encode("utf-8")[:-1]) == "utf-8"
+
+def test_sniff_encoding_latin1():
+    assert dl.sniff_encoding("naïve,café\n".encode("latin-1")) == "latin-1"
+
+def test_sniff_encoding_utf16_bom():
+    assert dl.sniff_encoding(codecs.BOM_UTF16_LE + "a,b".encode("utf-16-le")) == "utf-16"
+
+def test_read_csv_duckdb_detects_dialect_and_types(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("id;name;amount\n1;a;1.5\n2;b;2.5\n")
+    table, dialect = dl.read_csv_duckdb(path, duckdb.connect())
+    assert dialect["delimiter"] == ";"
+    assert dialect["encoding"] == "utf-8"
+    assert table.column_names == ["id", "name", "amount"]
+    assert table.column("amount").to_pylist() == [1.5, 2.5]
+
+def test_data_reader_reports_the_sniffed_dialect(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text('id;name\n1;"a;b"\n2;c\n')
+    table, file_type, encoding = dl.data_reader(path, "text/csv")
+    assert file_type == "csv"
+    assert encoding == "utf-8; delimiter ';'; quote '\"'; header"
+    assert table.column("name").to_pylist() == ["a;b", "c"]
+
+def test_read_csv_duckdb_latin1(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_bytes("city,n\nMünchen,1\n".encode("latin-1"))
+    table, dialect = dl.read_csv_duckdb(path, duckdb.connect())
+    assert dialect["encoding"] == "latin-1"
+    assert table.column("city").to_pylist() == ["München"]
+
+def test_infer_partition_type():
+    assert dl.infer_partition_type(["1", "20"]) == "BIGINT"
+    assert dl.infer_partition_type(["1.5", "2"]) == "DOUBLE"
+    assert dl.infer_partition_type(["2024-01-01", "__HIVE_DEFAULT_PARTITION__"]) == "DATE"
+    assert dl.infer_partition_type(["eu", "1"]) == "VARCHAR"
+    assert dl.infer_partition_type([""]) == "VARCHAR"
+
+def write_partitioned(root):
+    for year, region in [(2023, "eu"), (2024, "us")]:
+        directory = root / f"year={year}" / f"region={region}"
+        directory.mkdir(parents=True)
+        pq.write_table(pa.table({"amount": [year]}), directory / "part-0.parquet")
+    (root / "_SUCCESS").write_text("")
+
+def test_hive_partition_keys(tmp_path):
+    write_partitioned(tmp_path)
+    assert dl.hive_partition_keys(tmp_path) == {"year": "BIGINT", "region": "VARCHAR"}
+
+def test_partitioned_parquet_reference_reads_typed_partition_columns(tmp_path):
+    write_partitioned(tmp_path)
+    reference = dl.partitioned_parquet_reference(tmp_path)
+    rows = duckdb.sql(f"SELECT amount, year, region FROM {reference} WHERE year = 2024").fetchall()
+    assert rows == [(2024, 2024, "us")]
+    assert duckdb.sql(f"SELECT typeof(year) FROM {reference} LIMIT 1").fetchone() == ("BIGINT",)
+
+def test_hash_index_rebuilds_only_when_a_list_changes():
+    session_files = [{"File Hash": "a"}]
+    pending = []
+    index = dl.HashIndex()
+    assert index.contains("a", session_files, pending)
+    members = index._members
+    assert not index.contains("b", session_files, pending)
+    assert index._members is members  # unchanged lists are not scanned again
+    pending.append({"File Hash": "b"})
+    assert index.contains("b", session_files, pending)
+    session_files = [f for f in session_files if f["File Hash"] != "a"]
+    assert not index.contains("a", session_files, pending)
@@ -0,0 +1,32 @@
+import duckdb
+import pytest
+from helpers.export import copy_statement
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1 AS x",
+    "SELECT 1 AS x;",
+    "SELECT 1 AS x; -- trailing comment",
+    "SELECT 1 AS x -- comment before the semicolon\n;",
+    "-- leading comment\nSELECT 1 AS x /* ; */ ;\n",
+])
+def test_copy_statement_writes_the_query_result(tmp_path, sql):
+    target = (tmp_path / "out.parquet").as_posix()
+    duckdb.connect().execute(copy_statement(sql, target, "Parquet", "zstd"))
+    assert duckdb.sql(f"SELECT x FROM read_parquet('{target}')").fetchall() == [(1,)]
+
+def test_copy_statement_keeps_semicolons_in_literals(tmp_path):
+    target = (tmp_path / "out.csv").as_posix()
+    duckdb.connect().execute(copy_statement("SELECT ';' AS s;", target, "CSV"))
+    assert duckdb.sql(f"SELECT s FROM read_csv('{target}')").fetchall() == [(";",)]
+
+def test_copy_statement_partitions_into_a_directory(tmp_path):
+    target = (tmp_path / "parts").as_posix()
+    sql = "SELECT range AS x, range % 2 AS k FROM range(4)"
+    duckdb.connect().execute(copy_statement(sql, target, "Parquet", partition_by=["k"]))
+    assert sorted(p.name for p in (tmp_path / "parts").iterdir()) == ["k=0", "k=1"]
+
+@pytest.mark.parametrize("sql", ["SELECT 1; SELECT 2", "CREATE TABLE t (x INT)"])
+def test_copy_statement_rejects_anything_but_one_select(tmp_path, sql):
+    with pytest.raises(ValueError):
+        copy_statement(sql, (tmp_path / "out.csv").as_posix(), "CSV")
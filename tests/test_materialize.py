@@ -0,0 +1,92 @@
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from helpers import materialize as mz
+from helpers.data_loading import partitioned_parquet_reference
+
+
+def state(template="t", sources=None, listings=None):
+    return {"template": template, "sources": sources or {}, "listings": listings or {}}
+
+def test_appended_files_reports_only_new_files():
+    old = state(listings={"d": {"a.parquet": [1, 10]}})
+    new = state(listings={"d": {"a.parquet": [1, 10], "b.parquet": [2, 20]}})
+    assert mz.appended_files(old, new) == {"d": ["b.parquet"]}
+    assert mz.appended_files(new, new) == {}
+
+@pytest.mark.parametrize("new", [
+    state(template="changed", listings={"d": {"a.parquet": [1, 10]}}),
+    state(listings={"d": {"a.parquet": [5, 10]}}),
+    state(listings={"d": {}}),
+    state(sources={"x": {"hash": "h"}}, listings={"d": {"a.parquet": [1, 10]}}),
+])
+def test_anything_but_appends_needs_a_full_refresh(new):
+    assert mz.appended_files(state(listings={"d": {"a.parquet": [1, 10]}}), new) is None
+
+def test_directory_listing_skips_files_that_are_not_parquet(tmp_path):
+    pq.write_table(pa.table({"x": [1]}), tmp_path / "part-0.parquet")
+    (tmp_path / "_SUCCESS").write_text("")
+    (tmp_path / ".part-0.parquet.crc").write_text("")
+    assert list(mz.directory_listing(tmp_path)) == [(tmp_path / "part-0.parquet").as_posix()]
+
+def test_incremental_refresh_reads_only_appended_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "source"
+    source.mkdir()
+    pq.write_table(pa.table({"x": [1, 2]}), source / "a.parquet")
+    (source / "_SUCCESS").write_text("")
+    files = [{"Alias": "src", "Reference": f"read_parquet('{source.as_posix()}/*.parquet')", "Type": "Directory", "Path": source.as_posix()}]
+    aliases = {"src": files[0]["Reference"]}
+    saved = {"big": "SELECT x FROM {{src}} WHERE x > 1"}
+    cursor = duckdb.connect().cursor()
+
+    meta = mz.refresh_materialized(cursor, "big", saved, aliases, files, {"incremental": True})
+    assert meta["last_refresh"] == "full"
+    pq.write_table(pa.table({"x": [3, 4]}), source / "b.parquet")
+    (source / "b.parquet.crc").write_text("")
+    meta = mz.refresh_materialized(cursor, "big", saved, aliases, files, meta)
+    assert meta["last_refresh"] == "incremental"
+    assert sorted(x for (x,) in cursor.sql(f"SELECT x FROM {mz.materialized_reference('big')}").fetchall()) == [2, 3, 4]
+    assert mz.refresh_materialized(cursor, "big", saved, aliases, files, meta) is meta
+
+def test_files_reference_reuses_the_source_options():
+    source = "read_parquet('/d/**/*.parquet', hive_partitioning = true, hive_types = {'day': BIGINT})"
+    assert mz.files_reference(["/d/day=1/a's.parquet"], source) == \
+        "read_parquet(['/d/day=1/a''s.parquet'], hive_partitioning = true, hive_types = {'day': BIGINT})"
+    assert mz.files_reference(["/d/a.parquet"], "read_parquet('/d/*.parquet')").endswith(mz.DEFAULT_PARQUET_OPTIONS + ")")
+
+def test_referenced_materializations_follow_saved_queries():
+    saved = {"top": "SELECT * FROM {{mid}}", "mid": "SELECT 1"}
+    assert mz.referenced_materializations("SELECT * FROM {{top}}", saved, {"mid": {}}) == ["mid"]
+
+def test_failed_full_refresh_keeps_the_previous_materialization(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cursor = duckdb.connect().cursor()
+    saved = {"q": "SELECT 1 AS x"}
+    materialized = {"q": {}}
+    mz.refresh_stale(cursor, ["q"], saved, {}, [], materialized)
+    previous = materialized["q"]
+    saved["q"] = "SELECT error('boom') AS x"
+    with pytest.raises(duckdb.Error):
+        mz.refresh_stale(cursor, ["q"], saved, {}, [], materialized)
+    assert materialized["q"] is previous
+    assert cursor.sql(f"SELECT x FROM {mz.materialized_reference('q')}").fetchall() == [(1,)]
+    assert sorted(p.name for p in (tmp_path / mz.MATERIALIZED_DIR).iterdir()) == [mz.materialized_path("q").name]
+
+def test_incremental_refresh_keeps_partition_types_and_quoted_paths(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = tmp_path / "it's"
+    (source / "day=01").mkdir(parents=True)
+    pq.write_table(pa.table({"x": [1]}), source / "day=01" / "a.parquet")
+    files = [{"Alias": "src", "Reference": partitioned_parquet_reference(source), "Type": "Directory", "Path": source.as_posix()}]
+    aliases = {"src": files[0]["Reference"]}
+    saved = {"q": "SELECT x, day FROM {{src}}"}
+    cursor = duckdb.connect().cursor()
+    meta = mz.refresh_materialized(cursor, "q", saved, aliases, files, {"incremental": True})
+    (source / "day=02").mkdir()
+    pq.write_table(pa.table({"x": [2]}), source / "day=02" / "b.parquet")
+    meta = mz.refresh_materialized(cursor, "q", saved, aliases, files, meta)
+    assert meta["last_refresh"] == "incremental"
+    rows = cursor.sql(f"SELECT x, typeof(day) FROM {mz.materialized_reference('q')} ORDER BY x").fetchall()
+    assert rows == [(1, "BIGINT"), (2, "BIGINT")]
@@ -0,0 +1,46 @@
+import gc
+import os
+import pyarrow as pa
+from helpers.memory_manager import LAST_USED, SpillDirectory, SpilledTable, enforce_budget, resident_bytes
+from helpers.parsed_store import ParsedStore
+
+
+def entries(n, rows=1000):
+    return [{"Alias": f"t{i}", "df": pa.table({"x": list(range(rows))}), LAST_USED: i} for i in range(n)]
+
+def test_least_recently_used_tables_spill_past_the_budget(tmp_path):
+    session = entries(3)
+    size = session[0]["df"].get_total_buffer_size()
+    result = enforce_budget(session, budget=size, directory=tmp_path)
+    assert result["spilled_now"] == 2 and result["resident"] == size
+    assert [type(e["df"]) for e in session] == [SpilledTable, SpilledTable, pa.Table]
+    assert session[0]["df"].to_arrow()["x"].to_pylist() == list(range(1000))
+
+def test_spill_file_goes_with_its_entry(tmp_path):
+    session = entries(2)
+    enforce_budget(session, budget=0, directory=tmp_path)
+    paths = [e["df"].path for e in session]
+    assert all(os.path.exists(p) for p in paths)
+    # reloaded into memory, then dropped
+    session[0]["df"] = session[0]["df"].to_arrow()
+    session.pop()
+    gc.collect()
+    assert not any(os.path.exists(p) for p in paths)
+
+def test_session_spill_directory_is_removed_with_the_session(tmp_path):
+    directory = SpillDirectory(tmp_path)
+    session = entries(1)
+    enforce_budget(session, budget=0, directory=directory.path)
+    assert len(os.listdir(directory.path)) == 1
+    del directory
+    gc.collect()
+    assert os.listdir(tmp_path) == []
+
+def test_tables_read_from_the_parsed_store_count_against_the_budget(tmp_path):
+    store = ParsedStore(tmp_path / "store")
+    store.put("abc", pa.table({"x": list(range(1000))}), "csv", "utf-8")
+    data, _, _ = store.get("abc")
+    entry = {"Alias": "t", "File Hash": "abc", "df": data, LAST_USED: 0}
+    assert resident_bytes(entry) == data.get_total_buffer_size() > 0
+    result = enforce_budget([entry], budget=0, directory=tmp_path / "spill")
+    assert result["spilled_now"] == 1 and isinstance(entry["df"], SpilledTable)
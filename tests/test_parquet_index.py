@@ -0,0 +1,97 @@
+import datetime
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from helpers.parquet_index import ParquetIndex, prune_query, simple_predicates
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """Three files with disjoint id, day and ts ranges, registered as one directory entry."""
+    root = tmp_path / "data"
+    root.mkdir()
+    for i in range(3):
+        pq.write_table(pa.table({
+            "id": [i * 10, i * 10 + 9],
+            "name": [f"n{i}a", f"n{i}b"],
+            "day": [datetime.date(2024, 3, 1 + i)] * 2,
+            "ts": [datetime.datetime(2024, 3, 1 + i, 10)] * 2,
+        }), root / f"part-{i}.parquet")
+    reference = f"read_parquet('{root.as_posix()}/*.parquet')"
+    files = [{"Alias": "t", "Reference": reference, "Type": "Directory", "Path": root.as_posix()}]
+    return files, reference, ParquetIndex(tmp_path / "index.json")
+
+
+def run(sql):
+    return sorted(duckdb.sql(sql).fetchall())
+
+
+def test_simple_predicates():
+    sql = "SELECT * FROM read_parquet('x.parquet') WHERE id >= 10 AND 5 > id AND name = 'a' AND id + 1 = 2"
+    assert simple_predicates(sql) == [("id", ">=", 10), ("id", "<", 5), ("name", "=", "a")]
+
+def test_no_predicates_through_derived_tables():
+    assert simple_predicates("SELECT * FROM (SELECT * FROM read_parquet('x.parquet')) WHERE id = 1") == []
+
+@pytest.mark.parametrize("where, files_read", [
+    ("id = 15", 1),
+    ("id > 15", 2),
+    ("name = 'n2a'", 1),
+    ("day = '2024-03-02'", 1),
+    ("day >= DATE '2024-03-02'", 2),
+    ("ts = '2024-03-01 10:00:00'", 1),
+    ("ts > '2024-03-02'", 2),
+    ("ts = '2024-03-01T10:00:00'", 1),
+])
+def test_pruned_queries_return_the_same_rows(dataset, where, files_read):
+    files, reference, index = dataset
+    sql = f"SELECT id FROM {reference} WHERE {where}"
+    pruned = prune_query(sql, files, index)
+    assert run(pruned) == run(sql)
+    assert pruned.count(".parquet'") == files_read
+
+def test_timestamp_literals_are_compared_as_timestamps(dataset):
+    # footer statistics once compared as ISO strings ('...T10:00:00') against the literal's
+    # space separator, which pruned away the file holding the matching row
+    files, reference, index = dataset
+    sql = f"SELECT id FROM {reference} WHERE ts = '2024-03-02 10:00:00'"
+    assert run(prune_query(sql, files, index)) == run(sql) == [(10,), (19,)]
+
+def test_literals_of_another_type_do_not_prune(dataset):
+    files, reference, index = dataset
+    for where in ["id = '15'", "name = 5", "ts = '2024-03-01 10:00:00+01'", "day = '2024-03-01 00:00:00'"]:
+        sql = f"SELECT id FROM {reference} WHERE {where}"
+        assert prune_query(sql, files, index) == sql
+
+@pytest.mark.parametrize("sql", [
+    "SELECT count(*) AS n, (SELECT count(*) FROM {ref}) AS total FROM {ref} WHERE id >= 15",
+    "WITH saved AS (SELECT * FROM {ref}) SELECT count(*), (SELECT count(*) FROM saved) FROM {ref} WHERE id >= 15",
+    "SELECT count(*) FROM (SELECT * FROM {ref}) WHERE id >= 15 AND id IN (SELECT id FROM {ref})",
+])
+def test_references_outside_the_filtered_scan_are_not_narrowed(dataset, sql):
+    files, reference, index = dataset
+    sql = sql.format(ref=reference)
+    assert prune_query(sql, files, index) == sql
+
+def test_subquery_totals_survive_pruning(dataset):
+    files, reference, index = dataset
+    sql = f"SELECT count(*) AS n, (SELECT count(*) FROM {reference}) AS total FROM {reference} WHERE id >= 15"
+    assert run(prune_query(sql, files, index)) == run(sql) == [(3, 6)]
+
+def test_index_from_an_older_version_is_rebuilt(tmp_path, dataset):
+    files, reference, _ = dataset
+    index_file = tmp_path / "old.json"
+    index_file.write_text('{"/some/file.parquet": {"mtime": 0, "size": 0}}')
+    index = ParquetIndex(index_file)
+    assert index.summary(files[0])["rows"] == 6
+    assert "/some/file.parquet" not in index._files
+
+def test_summary_includes_hive_partition_columns(tmp_path):
+    root = tmp_path / "hive"
+    for year in (2023, 2024):
+        (root / f"year={year}").mkdir(parents=True)
+        pq.write_table(pa.table({"amount": [1.0]}), root / f"year={year}" / "part-0.parquet")
+    summary = ParquetIndex(tmp_path / "index.json").summary({"Type": "Directory", "Path": root.as_posix()})
+    assert summary["columns"] == {"amount": "double", "year": "BIGINT"}
+    assert summary["files"] == 2 and summary["rows"] == 2
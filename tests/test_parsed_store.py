@@ -0,0 +1,33 @@
+import shutil
+import pyarrow as pa
+from helpers.parsed_store import ParsedStore
+
+
+def test_round_trip(tmp_path):
+    store = ParsedStore(tmp_path)
+    store.put("ab" * 32, pa.table({"x": [1, 2]}), "csv", "utf-8")
+    data, file_type, encoding = store.get("ab" * 32)
+    assert data.column("x").to_pylist() == [1, 2]
+    assert (file_type, encoding) == ("csv", "utf-8")
+    assert ParsedStore(tmp_path).has_table("ab" * 32, "data")
+
+def test_workbook_entries_keep_every_sheet(tmp_path):
+    store = ParsedStore(tmp_path)
+    store.put("cd" * 32, {"Sheet 1": pa.table({"a": [1]}), "Sheet/2": pa.table({"b": [2]})}, "xlsx", "")
+    data, _, _ = store.get("cd" * 32)
+    assert set(data) == {"Sheet 1", "Sheet/2"}
+    assert store.get_table("cd" * 32, "Sheet/2").column("b").to_pylist() == [2]
+
+def test_eviction_keeps_store_under_max_bytes(tmp_path):
+    store = ParsedStore(tmp_path, max_bytes=1)
+    store.put("aa" * 32, pa.table({"x": list(range(100))}), "csv", "utf-8")
+    store.put("bb" * 32, pa.table({"x": list(range(100))}), "csv", "utf-8")
+    assert "aa" * 32 not in store
+
+def test_files_removed_after_lookup_are_a_miss(tmp_path):
+    store = ParsedStore(tmp_path)
+    store.put("ef" * 32, pa.table({"x": [1]}), "csv", "utf-8")
+    # what a concurrent eviction leaves behind: the entry was looked up, its files are gone
+    shutil.rmtree(store._entry_dir("ef" * 32))
+    assert store.get("ef" * 32) is None
+    assert store.get_table("ef" * 32, "data") is None
@@ -0,0 +1,63 @@
+import duckdb
+import pyarrow as pa
+from helpers.preview_cache import PreviewCache, preview_key
+
+
+def test_directory_entries_are_keyed_without_walking_their_files(tmp_path, monkeypatch):
+    (tmp_path / "part=1").mkdir()
+    (tmp_path / "part=1" / "a.parquet").write_bytes(b"")
+    file_info = {"Alias": "d", "Reference": f"read_parquet('{tmp_path}/**/*.parquet')", "Path": str(tmp_path)}
+    monkeypatch.setattr("pathlib.Path.rglob", lambda *args: (_ for _ in ()).throw(AssertionError("walked")))
+    assert preview_key(file_info) == preview_key(file_info)
+
+def test_changed_file_gets_a_new_key(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_text("x\n1\n")
+    file_info = {"Alias": "a", "Reference": f"read_csv('{path}')", "Path": str(path)}
+    before = preview_key(file_info)
+    path.write_text("x\n1\n2\n")
+    assert preview_key(file_info) != before
+
+def test_reuploaded_arrow_table_reuses_its_preview():
+    con = duckdb.connect()
+    cache = PreviewCache()
+
+    def entry():
+        table = pa.table({"x": [1, 2]})
+        return {"Alias": "t", "Reference": "t", "df": table, "File Hash": "abc", "File Name": "t.csv"}
+
+    def cursor_factory(file_info):
+        def factory():
+            cursor = con.cursor()
+            cursor.register("t", file_info["df"])
+            return cursor
+        return factory
+
+    first = entry()
+    future = cache.get(cursor_factory(first), first)
+    preview, schema = future.result()
+    assert preview.num_rows == 2
+    second = entry()
+    assert cache.get(cursor_factory(second), second) is future
+
+def test_failed_previews_are_retried():
+    con = duckdb.connect()
+    cache = PreviewCache()
+    file_info = {"Alias": "t", "Reference": "t", "File Hash": "abc", "File Name": "t.csv"}
+    failed = cache.get(con.cursor, file_info)
+    assert isinstance(failed.exception(), duckdb.Error)
+    con.execute("CREATE TABLE t AS SELECT 1 AS x")
+    retried = cache.get(con.cursor, file_info)
+    assert retried is not failed
+    assert retried.result()[0].num_rows == 1
+
+def test_previews_are_computed_inline_without_threads(monkeypatch):
+    monkeypatch.setattr("helpers.preview_cache.THREADS_AVAILABLE", False)
+    con = duckdb.connect()
+    con.execute("CREATE TABLE t AS SELECT 1 AS x")
+    cache = PreviewCache()
+    file_info = {"Alias": "t", "Reference": "t", "File Hash": "abc", "File Name": "t.csv"}
+    cache.prefetch(con.cursor, [file_info])
+    assert not cache._futures
+    future = cache.get(con.cursor, file_info)
+    assert future.done() and future.result()[0].num_rows == 1
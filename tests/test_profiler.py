@@ -0,0 +1,81 @@
+import threading
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pytest
+from helpers import profiler
+
+
+@profiler.profiled()
+def work(n):
+    profiler.count("items", n)
+    return n * 2
+
+@profiler.profiled("named stage")
+def failing():
+    raise ValueError("boom")
+
+def test_stages_and_counters_are_recorded():
+    profile = profiler.start_rerun("page")
+    try:
+        assert work(3) == 6
+        work(4)
+        with profiler.stage("block"):
+            pass
+        with pytest.raises(ValueError):
+            failing()
+    finally:
+        assert profiler.finish_rerun() is profile
+    assert profile.stages["test_profiler.work"][0] == 2
+    # a stage that raises is still timed
+    assert profile.stages["named stage"][0] == 1 and profile.stages["block"][0] == 1
+    assert profile.counters == {"items": 7}
+    assert profile.seconds is not None and profiler.current() is None
+    breakdown = profile.breakdown()
+    assert list(breakdown.columns) == ["Stage", "Calls", "ms", "% of rerun"] and len(breakdown) == 3
+    assert profile.to_dict()["stages"]["test_profiler.work"]["calls"] == 2
+
+def test_nothing_is_recorded_outside_a_rerun():
+    assert profiler.current() is None
+    assert work(1) == 2
+    with profiler.stage("block"):
+        profiler.count("items")
+    assert profiler.finish_rerun() is None
+
+def test_timings_are_recorded_per_thread():
+    profiles = {}
+    barrier = threading.Barrier(2)
+
+    def rerun(name, calls):
+        profile = profiler.start_rerun(name)
+        barrier.wait()  # both reruns are being profiled at once
+        for _ in range(calls):
+            work(1)
+        barrier.wait()
+        profiles[name] = profiler.finish_rerun()
+
+    threads = [threading.Thread(target=rerun, args=(name, calls)) for name, calls in [("a", 2), ("b", 5)]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert profiles["a"].stages["test_profiler.work"][0] == 2 and profiles["a"].counters == {"items": 2}
+    assert profiles["b"].stages["test_profiler.work"][0] == 5 and profiles["b"].counters == {"items": 5}
+    assert profiler.current() is None
+
+def test_session_state_sizes_count_shared_objects_once():
+    table = pa.table({"x": list(range(1000))})
+    sizes = profiler.session_state_sizes({"a": table, "b": [table], "df": pd.DataFrame({"x": range(10)})})
+    by_key = dict(zip(sizes["Key"], sizes["bytes"]))
+    assert by_key["a"] == table.get_total_buffer_size()
+    assert by_key["b"] < table.get_total_buffer_size()
+    assert sizes["Key"].iloc[0] == "a"
+
+def test_duckdb_memory_closes_its_cursor():
+    con = duckdb.connect()
+    con.execute("CREATE TABLE t AS SELECT range AS x FROM range(100000)")
+    cursor = con.cursor()
+    memory = profiler.duckdb_memory(cursor)
+    assert list(memory.columns) == ["tag", "memory_usage_bytes", "temporary_storage_bytes"]
+    with pytest.raises(duckdb.Error):
+        cursor.execute("SELECT 1")
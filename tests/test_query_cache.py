@@ -0,0 +1,75 @@
+import threading
+import pyarrow as pa
+import pytest
+from helpers.query_cache import QueryResultCache, normalize_sql, is_cacheable, source_fingerprints
+
+
+def test_normalize_sql_drops_only_outer_whitespace_and_the_terminator():
+    assert normalize_sql("  SELECT *\n  FROM t ; -- done\n") == "SELECT *\n  FROM t"
+    assert QueryResultCache.make_key("select 1;") == QueryResultCache.make_key("  select 1 ")
+
+def test_whitespace_inside_literals_splits_cache_keys():
+    assert QueryResultCache.make_key("SELECT * FROM t WHERE s = 'a  b'") != \
+        QueryResultCache.make_key("SELECT * FROM t WHERE s = 'a b'")
+
+def test_plain_reads_are_cacheable():
+    assert is_cacheable("SELECT a, count(*) FROM t GROUP BY a")
+    assert is_cacheable("WITH x AS (SELECT 1) SELECT * FROM x")
+
+@pytest.mark.parametrize("sql", [
+    "CREATE TABLE t AS SELECT 1",
+    "SET threads = 2",
+    "SELECT 1; DELETE FROM t",
+    "not sql at all",
+])
+def test_statements_other_than_reads_are_not_cacheable(sql):
+    assert not is_cacheable(sql)
+
+@pytest.mark.parametrize("sql", [
+    "SELECT now()",
+    "SELECT * FROM t WHERE d = current_date",
+    "SELECT * FROM t WHERE ts > CURRENT_TIMESTAMP - INTERVAL 1 DAY",
+    "SELECT random() FROM t",
+    "SELECT uuid(), gen_random_uuid()",
+    "SELECT 1; SELECT today()",
+])
+def test_non_deterministic_reads_are_not_cacheable(sql):
+    assert not is_cacheable(sql)
+
+def test_columns_named_like_functions_stay_cacheable():
+    assert is_cacheable("SELECT random_id, uuid_text FROM t")
+
+def test_source_fingerprints_match_aliases_as_words():
+    files = [{"Alias": "sales", "Reference": "read_parquet('x')", "File Hash": "h"},
+             {"Alias": "sales_2023", "Reference": "y", "File Hash": "g"}]
+    assert set(source_fingerprints("SELECT * FROM sales", files)) == {"sales"}
+
+def test_sheets_of_one_workbook_have_different_fingerprints():
+    first = {"Alias": "s", "Reference": "s", "File Hash": "h", "File Name": "book.xlsx--first"}
+    second = {**first, "File Name": "book.xlsx--second"}
+    assert source_fingerprints("SELECT * FROM s", [first]) != source_fingerprints("SELECT * FROM s", [second])
+
+def test_sizes_are_read_under_the_lock(tmp_path):
+    cache = QueryResultCache(tmp_path / "cache")
+    cache.put("SELECT 1", {}, pa.table({"x": [1]}))
+    with cache._lock:
+        done = []
+        thread = threading.Thread(target=lambda: done.append(cache.memory_bytes()))
+        thread.start()
+        thread.join(0.2)
+        assert not done  # waits for the writer
+    thread.join()
+    assert done[0] > 0
+
+def test_changed_sources_invalidate_results(tmp_path):
+    cache = QueryResultCache(tmp_path / "cache")
+    table = pa.table({"x": [1]})
+    cache.put("SELECT 1", {"t": {"hash": "a"}}, table)
+    assert cache.get("SELECT 1;", {"t": {"hash": "a"}}) is table
+    assert cache.get("SELECT 1", {"t": {"hash": "b"}}) is None
+
+def test_results_past_the_memory_budget_spill_to_disk(tmp_path):
+    cache = QueryResultCache(tmp_path / "cache", max_memory_bytes=0)
+    cache.put("SELECT 1", {}, pa.table({"x": [1, 2, 3]}))
+    assert cache.stats["spills"] == 1
+    assert cache.get("SELECT 1", {}).column("x").to_pylist() == [1, 2, 3]
@@ -0,0 +1,63 @@
+import time
+import duckdb
+import pyarrow as pa
+from helpers import query_runner
+from helpers.query_runner import QueryHandle, DONE, FAILED, CANCELLED, TIMED_OUT
+
+SLOW_QUERY = "SELECT count(*) FROM range(1000000000000) a WHERE a.range % 7 = 3"
+
+
+def wait(handle, seconds=30):
+    deadline = time.perf_counter() + seconds
+    while handle.running and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    return handle
+
+
+def test_result_and_callback():
+    finished = []
+    handle = wait(QueryHandle(duckdb.connect().cursor(), "SELECT 42 AS x", on_done=finished.append))
+    assert handle.status == DONE
+    assert handle.result.column("x").to_pylist() == [42]
+    assert finished == [handle]
+
+def test_errors_are_reported():
+    handle = wait(QueryHandle(duckdb.connect().cursor(), "SELECT * FROM missing"))
+    assert handle.status == FAILED and "missing" in handle.error
+
+def test_cancel_interrupts_a_running_query():
+    handle = QueryHandle(duckdb.connect().cursor(), SLOW_QUERY)
+    time.sleep(0.2)
+    handle.cancel()
+    assert wait(handle).status == CANCELLED
+
+def test_timeout_interrupts_a_running_query():
+    handle = wait(QueryHandle(duckdb.connect().cursor(), SLOW_QUERY, timeout=0.2))
+    assert handle.status == TIMED_OUT
+
+def test_cancel_after_completion_leaves_the_result():
+    handle = wait(QueryHandle(duckdb.connect().cursor(), "SELECT 1"))
+    handle.cancel()
+    assert handle.status == DONE
+
+def test_runs_synchronously_without_threads(monkeypatch):
+    monkeypatch.setattr(query_runner, "THREADS_AVAILABLE", False)
+    handle = QueryHandle(duckdb.connect().cursor(), "SELECT 1 AS x")
+    assert not handle.running
+    assert handle.status == DONE and handle.progress() == 1.0
+
+def test_prepare_runs_before_the_query_on_the_worker_cursor():
+    def prepare(cursor):
+        cursor.execute("CREATE TABLE prepared AS SELECT 7 AS x")
+    handle = wait(QueryHandle(duckdb.connect().cursor(), "SELECT * FROM prepared", prepare=prepare))
+    assert handle.status == DONE and handle.result.column("x").to_pylist() == [7]
+
+def test_prepare_can_answer_the_query():
+    handle = wait(QueryHandle(duckdb.connect().cursor(), "SELECT * FROM missing", prepare=lambda cursor: pa.table({"x": [1]})))
+    assert handle.status == DONE and handle.result.column("x").to_pylist() == [1]
+
+def test_prepare_failures_fail_the_handle():
+    def prepare(cursor):
+        raise ValueError("Circular reference between saved queries: a -> a")
+    handle = wait(QueryHandle(duckdb.connect().cursor(), None, prepare=prepare))
+    assert handle.status == FAILED and "Circular" in handle.error
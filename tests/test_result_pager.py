@@ -0,0 +1,35 @@
+import duckdb
+import pytest
+from helpers.result_pager import ResultPager
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    con.execute("CREATE TABLE t AS SELECT range AS x FROM range(25)")
+    return con
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM t",
+    "SELECT * FROM t;",
+    "SELECT * FROM t; -- all rows",
+    "SELECT * FROM t -- all rows\n;",
+])
+def test_total_rows_counts_queries_with_terminators_and_comments(con, sql):
+    pager = ResultPager(con.cursor, sql, page_size=10)
+    assert pager.total_rows == 25
+    assert pager.page_count == 3
+
+def test_pages_stream_forward_and_back(con):
+    pager = ResultPager(con.cursor, "SELECT x FROM t ORDER BY x", page_size=10)
+    assert pager.page(1)["x"].to_pylist() == list(range(10, 20))
+    assert pager.page(2)["x"].to_pylist() == list(range(20, 25))
+    assert pager.page(0)["x"].to_pylist() == list(range(10))
+    assert pager.page(5).num_rows == 0
+    assert pager.fetch_all().num_rows == 25
+
+def test_a_read_result_is_counted_without_another_query(con):
+    pager = ResultPager(con.cursor, "SELECT x FROM t LIMIT 5", page_size=10)
+    pager.page(0)
+    pager.cursor_factory = None  # a count query would fail now
+    assert pager.total_rows == 5
@@ -0,0 +1,37 @@
+import duckdb
+import pytest
+from helpers.script_api import ScriptWorkspace, run_script
+
+
+@pytest.fixture
+def workspace():
+    con = duckdb.connect()
+    con.execute("CREATE TABLE sales AS SELECT range AS id, range % 3 AS region, range * 10 AS amount FROM range(10)")
+    saved = {"big_sales": "SELECT * FROM {{sales}} WHERE amount > 50"}
+    return ScriptWorkspace(con.cursor(), {"sales": "sales"}, saved)
+
+def test_relations_chain_before_running(workspace):
+    relation = workspace.table("big_sales").aggregate("count(*) AS n")
+    assert isinstance(relation, duckdb.DuckDBPyRelation)
+    assert relation.fetchall() == [(4,)]
+    assert workspace.sql("SELECT sum(amount) FROM {{sales}} WHERE region = 0").fetchone() == (180,)
+
+def test_aliases_and_expansion(workspace):
+    assert workspace.aliases == ["big_sales", "sales"]
+    assert "WHERE amount > 50" in workspace.expand("SELECT * FROM {{big_sales}}")
+    with pytest.raises(ValueError):
+        workspace.table("nowhere")
+
+def test_arrow_streams_batches(workspace):
+    reader = workspace.arrow("SELECT * FROM {{sales}}", batch_size=4)
+    assert sum(batch.num_rows for batch in reader) == 10
+
+def test_cursor_is_closed_with_the_workspace(workspace):
+    with workspace:
+        run_script(lambda ws: ws.table("sales").fetchall(), workspace)
+    with pytest.raises(duckdb.Error):
+        workspace.sql("SELECT 1")
+
+def test_run_script_passes_the_workspace_only_when_asked(workspace):
+    assert run_script(lambda: "no args", workspace) == "no args"
+    assert run_script(lambda ws: ws is workspace, workspace)
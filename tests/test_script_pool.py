@@ -0,0 +1,64 @@
+import pyarrow as pa
+import pytest
+from helpers.script_pool import DONE, FAILED, KILLED, ScriptProcessPool, resource
+from helpers.script_registry import ScriptRegistry
+
+
+def run_script(tmp_path, source, inputs=None, **limits):
+    script = tmp_path / "script.py"
+    script.write_text(source)
+    run = ScriptProcessPool(root=tmp_path / "runs", max_workers=1).submit(script, inputs or {}, **limits)
+    assert run.wait(60)
+    return run
+
+def test_compute_runs_in_a_child_process(tmp_path):
+    run = run_script(tmp_path, (
+        "import os\n"
+        "def compute(inputs):\n"
+        "    t = inputs['t']\n"
+        "    return {'doubled': t.set_column(0, 'x', [[v * 2 for v in t['x'].to_pylist()]]),\n"
+        "            'pid': __import__('pandas').DataFrame({'pid': [os.getpid()]})}\n"
+    ), {"t": pa.table({"x": [1, 2]})})
+    assert run.status == DONE, run.error
+    outputs = dict(run.output_tables())
+    assert outputs["doubled"]["x"].to_pylist() == [2, 4]
+    assert outputs["pid"]["pid"][0].as_py() != __import__("os").getpid()
+
+def test_errors_in_compute_are_reported(tmp_path):
+    run = run_script(tmp_path, "def compute(inputs):\n    raise RuntimeError('boom')\n")
+    assert run.status == FAILED and "boom" in run.error
+
+@pytest.mark.skipif(resource is None, reason="RLIMIT_CPU is POSIX only")
+def test_cpu_limit_applies_to_code_run_at_import(tmp_path):
+    run = run_script(tmp_path, "while True:\n    pass\ndef compute(inputs):\n    return {}\n", cpu_seconds=1)
+    assert run.status == KILLED and "CPU time limit" in run.error
+
+def test_entry_points_are_read_without_running_the_script(tmp_path):
+    marker = tmp_path / "ran"
+    (tmp_path / "s.py").write_text(
+        f"open({str(marker)!r}, 'w').close()\n"
+        "from helpers.script_api import run_script as show\n"
+        "def compute(inputs):\n    return {}\n")
+    assert {"show", "compute"} <= ScriptRegistry(tmp_path).top_level_names("s")
+    assert not marker.exists()
+
+def test_run_directory_is_removed_once_outputs_are_read(tmp_path):
+    run = run_script(tmp_path, "def compute(inputs):\n    return inputs['t']\n", {"t": pa.table({"x": [1, 2]})})
+    assert run.status == DONE, run.error
+    assert not run.run_dir.exists()
+    assert dict(run.output_tables())["result"]["x"].to_pylist() == [1, 2]
+
+@pytest.mark.skipif(resource is None, reason="resource limits are POSIX only")
+def test_memory_limit_applies_inside_the_child(tmp_path):
+    run = run_script(tmp_path, "def compute(inputs):\n    return bytearray(512 * 1024 ** 2)\n",
+                     memory_bytes=256 * 1024 ** 2)
+    assert run.status == KILLED and "Memory limit" in run.error
+    assert not run.run_dir.exists()
+
+def test_runs_inline_without_threads(tmp_path, monkeypatch):
+    monkeypatch.setattr("helpers.query_runner.THREADS_AVAILABLE", False)
+    monkeypatch.setattr("helpers.script_pool.threading.Thread", None)
+    script = tmp_path / "script.py"
+    script.write_text("def compute(inputs):\n    return {}\n")
+    run = ScriptProcessPool(root=tmp_path / "runs", max_workers=1).submit(script, {})
+    assert not run.running and run.status == DONE, run.error
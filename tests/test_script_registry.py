@@ -0,0 +1,65 @@
+import os
+import pytest
+from helpers.script_registry import ScriptRegistry
+
+
+def write_script(registry, name, source):
+    path = registry.path(name)
+    path.write_text(source)
+    return path
+
+def counting_script(tmp_path, value):
+    # every execution of the module appends a line to runs.txt
+    return f"open({str(tmp_path / 'runs.txt')!r}, 'a').write('run\\n')\nVALUE = {value}\n"
+
+def runs(tmp_path):
+    return (tmp_path / "runs.txt").read_text().count("run")
+
+def test_list_scripts_reads_only_the_directory(tmp_path):
+    registry = ScriptRegistry(tmp_path / "scripts")
+    write_script(registry, "b", "raise RuntimeError('imported')")
+    write_script(registry, "a", "")
+    (registry.directory / "notes.txt").write_text("")
+    assert registry.list_scripts() == ["a", "b"]
+
+def test_modules_are_executed_only_when_their_content_changes(tmp_path):
+    registry = ScriptRegistry(tmp_path / "scripts")
+    path = write_script(registry, "s", counting_script(tmp_path, 1))
+    module = registry.load("s")
+    assert module.VALUE == 1 and registry.load("s") is module
+
+    # a touched file with the same content keeps its module
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert registry.load("s") is module
+    assert runs(tmp_path) == 1
+
+    write_script(registry, "s", counting_script(tmp_path, 22))
+    assert registry.load("s").VALUE == 22
+    assert runs(tmp_path) == 2
+
+def test_top_level_names_do_not_run_the_script(tmp_path):
+    registry = ScriptRegistry(tmp_path / "scripts")
+    write_script(registry, "s", (
+        "import pandas as pd\nimport os.path\nfrom json import loads\n"
+        "LIMIT: int = 3\nx = y = 1\n"
+        "def compute(workspace):\n    inner = 1\n"
+        "class Panel: pass\n"
+        "raise RuntimeError('executed')\n"
+    ))
+    assert registry.top_level_names("s") == {"pd", "os", "loads", "LIMIT", "x", "y", "compute", "Panel"}
+    assert "show" not in registry.top_level_names("s")
+
+def test_top_level_names_of_a_broken_script(tmp_path):
+    registry = ScriptRegistry(tmp_path / "scripts")
+    write_script(registry, "s", "def broken(:\n")
+    with pytest.raises(SyntaxError):
+        registry.top_level_names("s")
+
+def test_forget_reimports(tmp_path):
+    registry = ScriptRegistry(tmp_path / "scripts")
+    write_script(registry, "s", counting_script(tmp_path, 1))
+    module = registry.load("s")
+    registry.forget("s")
+    assert registry.load("s") is not module
+    assert runs(tmp_path) == 2
@@ -0,0 +1,40 @@
+import time
+import duckdb
+from helpers.shadow_parquet import ShadowTranscoder
+
+
+def wait_for_reference(transcoder, file_info, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        reference = transcoder.reference(file_info)
+        if reference is not None:
+            return reference
+        time.sleep(0.05)
+    raise AssertionError(transcoder.errors)
+
+def test_csv_is_read_from_its_shadow_copy_until_it_changes(tmp_path):
+    source = tmp_path / "a.csv"
+    source.write_text("x,y\n1,a\n2,b\n")
+    file_info = {"Type": "File", "File Type": "csv", "Path": str(source), "Reference": f"read_csv('{source}')"}
+    transcoder = ShadowTranscoder(root=tmp_path / "shadow")
+    assert transcoder.eligible(file_info)
+
+    reference = wait_for_reference(transcoder, file_info)
+    assert reference.startswith("read_parquet(")
+    assert duckdb.sql(f"SELECT count(*) FROM {reference}").fetchone() == (2,)
+
+    source.write_text("x,y\n1,a\n2,b\n3,c\n")
+    reference = wait_for_reference(transcoder, file_info)
+    assert duckdb.sql(f"SELECT count(*) FROM {reference}").fetchone() == (3,)
+    # a new transcoder starts from the persisted index
+    assert ShadowTranscoder(root=tmp_path / "shadow").reference(file_info) == reference
+
+def test_transcodes_inline_without_threads(tmp_path, monkeypatch):
+    monkeypatch.setattr("helpers.shadow_parquet.THREADS_AVAILABLE", False)
+    source = tmp_path / "a.csv"
+    source.write_text("x,y\n1,a\n2,b\n")
+    file_info = {"Type": "File", "File Type": "csv", "Path": str(source), "Reference": f"read_csv('{source}')"}
+    transcoder = ShadowTranscoder(root=tmp_path / "shadow")
+    reference = transcoder.reference(file_info)
+    assert duckdb.sql(f"SELECT count(*) FROM {reference}").fetchone() == (2,)
+    assert transcoder.pending == 0
@@ -0,0 +1,42 @@
+import duckdb
+import pytest
+from helpers.sql_templates import expand_sql_query, saved_query_order, template_aliases
+
+
+def test_template_aliases_in_order_of_first_use():
+    assert template_aliases("SELECT * FROM {{b}} JOIN {{a}} USING (id) JOIN {{b}} x USING (id)") == ["b", "a"]
+
+def test_saved_query_order_puts_dependencies_first():
+    saved = {"top": "SELECT * FROM {{mid}}", "mid": "SELECT * FROM {{base}}", "base": "SELECT 1", "unused": "SELECT 2"}
+    assert saved_query_order(["top"], saved) == ["base", "mid", "top"]
+
+def test_saved_query_order_names_the_cycle():
+    saved = {"a": "SELECT * FROM {{b}}", "b": "SELECT * FROM {{a}}"}
+    with pytest.raises(ValueError, match="a -> b -> a"):
+        saved_query_order(["a"], saved)
+
+def test_data_aliases_are_inlined():
+    assert expand_sql_query("SELECT * FROM {{t}}", {"t": "read_parquet('t.parquet')"}, {}) == \
+        "SELECT * FROM read_parquet('t.parquet')"
+
+def test_saved_queries_become_ctes_shared_when_used_twice():
+    sql = expand_sql_query(
+        "SELECT * FROM {{big}} a JOIN {{big}} b USING (x);",
+        {"t": "(SELECT 1 AS x)"}, {"big": "SELECT x FROM {{t}};"})
+    assert sql.startswith('WITH "big" AS MATERIALIZED (')
+    assert duckdb.sql(sql.rstrip(";")).fetchall() == [(1,)]
+
+def test_saved_queries_join_a_leading_with_clause():
+    sql = expand_sql_query("WITH y AS (SELECT * FROM {{s}}) SELECT * FROM y", {}, {"s": "SELECT 2 AS x"})
+    assert duckdb.sql(sql).fetchall() == [(2,)]
+
+def test_statements_without_with_inline_saved_queries():
+    sql = expand_sql_query("CREATE TABLE t AS SELECT * FROM {{s}}", {}, {"s": "SELECT 3 AS x;"})
+    assert sql == "CREATE TABLE t AS SELECT * FROM (SELECT 3 AS x)"
+
+def test_data_aliases_win_over_saved_queries_of_the_same_name():
+    assert expand_sql_query("SELECT * FROM {{t}}", {"t": "tbl"}, {"t": "SELECT 1"}) == "SELECT * FROM tbl"
+
+def test_unknown_alias_is_an_error():
+    with pytest.raises(ValueError, match="Unknown alias"):
+        expand_sql_query("SELECT * FROM {{nope}}", {}, {})
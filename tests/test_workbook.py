@@ -0,0 +1,50 @@
+import os
+import pandas as pd
+from helpers.parsed_store import ParsedStore
+from helpers.workbook import LazyWorkbook
+
+
+def write_workbook(path):
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        pd.DataFrame({"a": [1, 2, 3]}).to_excel(writer, sheet_name="first", index=False)
+        pd.DataFrame({"b": ["x", "y"]}).to_excel(writer, sheet_name="second", index=False)
+
+
+def test_sheets_are_parsed_on_use_and_previewed_in_part(tmp_path):
+    path = tmp_path / "book.xlsx"
+    write_workbook(path)
+    sheets = LazyWorkbook(str(path)).sheets(ParsedStore(tmp_path / "store"), "ab" * 32)
+    assert list(sheets) == ["first", "second"]
+    assert sheets["first"].head(2).column("a").to_pylist() == [1, 2]
+    assert not sheets["first"].materialized
+    assert sheets["first"].to_arrow().column("a").to_pylist() == [1, 2, 3]
+    assert sheets["first"].materialized
+
+def test_spool_file_is_removed_once_every_sheet_is_stored(tmp_path):
+    path = tmp_path / "book.xlsx"
+    write_workbook(path)
+    workbook = LazyWorkbook(str(path))
+    sheets = workbook.sheets(ParsedStore(tmp_path / "store"), "ab" * 32)
+    sheets["first"].to_arrow()
+    assert os.path.exists(path)
+    sheets["second"].to_arrow()
+    assert workbook.closed and not os.path.exists(path)
+    assert sheets["second"].head(1).column("b").to_pylist() == ["x"]
+
+def test_spool_file_is_removed_with_the_workbook(tmp_path):
+    path = tmp_path / "book.xlsx"
+    write_workbook(path)
+    sheets = LazyWorkbook(str(path)).sheets(ParsedStore(tmp_path / "store"), "ab" * 32)
+    del sheets
+    assert not os.path.exists(path)
+
+def test_workbook_already_in_the_store_is_closed_straight_away(tmp_path):
+    store = ParsedStore(tmp_path / "store")
+    path = tmp_path / "book.xlsx"
+    write_workbook(path)
+    for sheet in LazyWorkbook(str(path)).sheets(store, "ab" * 32).values():
+        sheet.to_arrow()
+    write_workbook(path)
+    workbook = LazyWorkbook(str(path))
+    workbook.sheets(store, "ab" * 32)
+    assert workbook.closed and not os.path.exists(path)
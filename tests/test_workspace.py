@@ -0,0 +1,28 @@
+import gc
+import duckdb
+from helpers.workspace import ConnectionPool, SessionLease
+
+
+def schemas(con):
+    return {name for (name,) in con.execute(
+        "SELECT schema_name FROM duckdb_schemas() WHERE starts_with(schema_name, 'session_')").fetchall()}
+
+def test_least_recently_active_session_is_closed():
+    con = duckdb.connect()
+    pool = ConnectionPool(con, max_connections=2)
+    a, _ = pool.connect("a")
+    pool.connect("b")
+    pool.connect("a")
+    pool.connect("c")
+    assert len(pool) == 2 and len(schemas(con)) == 2
+    assert pool.connect("a")[0] is a
+
+def test_discarded_lease_releases_the_session():
+    con = duckdb.connect()
+    pool = ConnectionPool(con)
+    session_state = {"connection_lease": SessionLease(pool, "a")}
+    pool.connect("a")
+    assert len(pool) == 1 and len(schemas(con)) == 1
+    session_state.clear()
+    gc.collect()
+    assert len(pool) == 0 and schemas(con) == set()